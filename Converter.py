@@ -1,7 +1,67 @@
-from PyQt5.QtWidgets import QWidget, QPushButton, QVBoxLayout, QApplication, QLabel
+import threading
+from PyQt5.QtWidgets import QWidget, QPushButton, QVBoxLayout, QApplication, QLabel, QMessageBox
 from PyQt5.QtGui import QPixmap
-from video_converter_pre import vc_pre
-from extract_tracks import AudioExtractor  # 假设音轨提取器在extract_tracks.py中定义
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
+
+# 各子工具（以及它们带进来的大部分 QtWidgets 和 vc_modules）在第一次点击按钮时才导入，
+# 主页先显示出来；logo、ffmpeg 能力检测和未完成任务的恢复都推迟到首次绘制之后
+
+LOGO_PATH = "assets/logo.png"  # 请确保logo.png在同目录下或写绝对路径
+
+
+def warm_up_capabilities():
+    # 在后台线程里提前做一次 ffmpeg 能力检测，打开转换窗口时就不用等
+    def run():
+        try:
+            from vc_modules.capabilities import get_capabilities
+            get_capabilities()
+        except Exception:
+            pass
+    threading.Thread(target=run, daemon=True).start()
+
+
+def stop_engine():
+    # 退出时结束引擎里还在运行的任务，不留下孤立的 ffmpeg 进程
+    from vc_modules.engine import stop_engine as stop
+    stop()
+
+
+class RecoverThread(QThread):
+    # 清理上次异常退出留下的临时文件，找出没有完成的任务
+    recovered = pyqtSignal(object)
+
+    def run(self):
+        try:
+            from vc_modules.journal import get_journal
+            journal = get_journal()
+            jobs = journal.recover() if journal is not None else []
+        except Exception:
+            jobs = []
+        # 监视文件夹的任务由 watch 重启后自己处理
+        self.recovered.emit([job for job in jobs if job.get('kind') != 'watch'])
+
+
+class ResumeThread(QThread):
+    finished = pyqtSignal(bool, str)
+    progress = pyqtSignal(str)
+
+    def __init__(self, jobs):
+        super().__init__()
+        self.jobs = jobs
+
+    def run(self):
+        from vc_modules.journal import resume_job
+        failed = []
+        for i, job in enumerate(self.jobs):
+            self.progress.emit(f"正在继续未完成的任务 {i + 1}/{len(self.jobs)}")
+            ok, info = resume_job(job)
+            if not ok:
+                failed.append(f"{job['output']}: {info.splitlines()[-1] if info else ''}")
+        if failed:
+            self.finished.emit(False, "\n".join(failed))
+        else:
+            self.finished.emit(True, f"{len(self.jobs)} 个任务已完成")
+
 
 class HomePage(QWidget):
     def __init__(self):
@@ -11,10 +71,8 @@ class HomePage(QWidget):
 
         self.layout = QVBoxLayout()
 
-        # 添加图片
+        # 添加图片，首次绘制之后再加载
         self.image_label = QLabel()
-        pixmap = QPixmap("assets/logo.png")  # 请确保logo.png在同目录下或写绝对路径
-        self.image_label.setPixmap(pixmap)
         self.image_label.setScaledContents(True)
         self.image_label.setFixedHeight(100)
         self.layout.addWidget(self.image_label)
@@ -31,24 +89,71 @@ class HomePage(QWidget):
         self.open_extractor_btn = QPushButton("音轨提取 Audio Track Extractor")
         self.open_extractor_btn.clicked.connect(self.open_extractor)
 
+        self.open_batch_btn = QPushButton("批量转换 Batch Converter")
+        self.open_batch_btn.clicked.connect(self.open_batch)
 
         self.layout.addWidget(self.open_converter_btn)
         self.layout.addWidget(self.open_extractor_btn)
+        self.layout.addWidget(self.open_batch_btn)
+
+        self.resume_label = QLabel("")
+        self.layout.addWidget(self.resume_label)
         self.layout.addStretch()
         self.setLayout(self.layout)
 
+        QTimer.singleShot(0, self.load_deferred)
+
+    def load_deferred(self):
+        self.image_label.setPixmap(QPixmap(LOGO_PATH))
+        warm_up_capabilities()
+        self.recover_thread = RecoverThread()
+        self.recover_thread.recovered.connect(self.on_recovered)
+        self.recover_thread.start()
+
+    def on_recovered(self, jobs):
+        if not jobs:
+            return
+        names = "\n".join(job['output'] for job in jobs[:10])
+        more = f"\n…共 {len(jobs)} 个" if len(jobs) > 10 else ""
+        reply = QMessageBox.question(self, "继续未完成的任务",
+                                     f"上次退出时有 {len(jobs)} 个任务没有完成：\n{names}{more}\n\n是否现在继续？")
+        if reply != QMessageBox.Yes:
+            from vc_modules.journal import get_journal
+            journal = get_journal()
+            for job in jobs:
+                journal.forget(job['id'])
+            return
+        self.resume_thread = ResumeThread(jobs)
+        self.resume_thread.progress.connect(self.resume_label.setText)
+        self.resume_thread.finished.connect(self.on_resume_finished)
+        self.resume_thread.start()
+
+    def on_resume_finished(self, success, info):
+        self.resume_label.setText("")
+        if success:
+            QMessageBox.information(self, "完成", info)
+        else:
+            QMessageBox.warning(self, "错误", f"以下任务仍然失败：\n{info}")
+
     def open_converter(self):
+        from video_converter_pre import vc_pre
         self.converter_window = vc_pre()
         self.converter_window.show()
 
     def open_extractor(self):
+        from extract_tracks import AudioExtractor
         self.extractor_window = AudioExtractor()
         self.extractor_window.show()
 
+    def open_batch(self):
+        from batch_converter import BatchConverter
+        self.batch_window = BatchConverter()
+        self.batch_window.show()
+
 if __name__ == "__main__":
     import sys
-    from PyQt5.QtCore import Qt
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(stop_engine)
     home = HomePage()
     home.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('assets', 'assets'), ('bin', 'bin')],
-    hiddenimports=[],
+    hiddenimports=['video_converter_pre', 'extract_tracks', 'batch_converter'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
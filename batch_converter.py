@@ -0,0 +1,198 @@
+import sys
+import os
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
+    QFileDialog, QComboBox, QMessageBox, QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PyQt5.QtCore import QObject, pyqtSignal
+from vc_modules.batch import BatchScheduler, job_threads, max_parallel_jobs
+from vc_modules.commands import convert_output_kwargs
+from vc_modules.engine import stop_engine
+from vc_modules.tracing import traced
+
+STATUS_TEXT = {
+    'queued': '等待中',
+    'running': '转换中',
+    'done': '完成',
+    'failed': '失败',
+    'cancelled': '已取消',
+}
+
+
+class BatchSignals(QObject):
+    # 调度器在工作线程里回调，通过信号转回界面线程
+    job_updated = pyqtSignal(object)
+    all_finished = pyqtSignal()
+
+
+class BatchConverter(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("批量视频格式转换")
+        self.resize(800, 600)
+
+        self.supported_formats = ["mp4", "avi", "mov", "mkv", "flv", "wmv"]
+        self.core_count = os.cpu_count() or 1
+        self.input_files = []
+        self.scheduler = None
+        self.rows = {}
+
+        self.signals = BatchSignals()
+        self.signals.job_updated.connect(self.on_job_updated)
+        self.signals.all_finished.connect(self.on_all_finished)
+
+        self.add_btn = QPushButton("添加文件")
+        self.add_btn.clicked.connect(self.add_files)
+        self.clear_btn = QPushButton("清空列表")
+        self.clear_btn.clicked.connect(self.clear_files)
+
+        self.format_label = QLabel("选择输出格式")
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(self.supported_formats)
+        self.format_combo.currentTextChanged.connect(self.update_parallel_label)
+
+        self.threads_label = QLabel("每个任务线程数")
+        self.threads_combo = QComboBox()
+        self.threads_combo.addItems([str(i) for i in range(1, self.core_count + 1)])
+        self.threads_combo.setCurrentText(str(min(4, self.core_count)))
+        self.threads_combo.currentTextChanged.connect(self.update_parallel_label)
+
+        self.parallel_label = QLabel("")
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["文件", "状态", "耗时", "速度"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        self.total_label = QLabel("")
+
+        self.start_btn = QPushButton("开始批量转换")
+        self.start_btn.clicked.connect(self.start_batch)
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_batch)
+
+        file_line = QHBoxLayout()
+        file_line.addWidget(self.add_btn)
+        file_line.addWidget(self.clear_btn)
+
+        format_line = QHBoxLayout()
+        format_line.addWidget(self.format_label)
+        format_line.addWidget(self.format_combo)
+
+        threads_line = QHBoxLayout()
+        threads_line.addWidget(self.threads_label)
+        threads_line.addWidget(self.threads_combo)
+
+        button_line = QHBoxLayout()
+        button_line.addWidget(self.start_btn)
+        button_line.addWidget(self.cancel_btn)
+
+        layout = QVBoxLayout()
+        layout.addLayout(file_line)
+        layout.addLayout(format_line)
+        layout.addLayout(threads_line)
+        layout.addWidget(self.parallel_label)
+        layout.addWidget(self.table)
+        layout.addWidget(self.total_label)
+        layout.addLayout(button_line)
+        self.setLayout(layout)
+
+        self.update_parallel_label()
+
+    def update_parallel_label(self, *_):
+        output_kwargs = convert_output_kwargs(self.format_combo.currentText(), self.threads_combo.currentText())
+        weight = job_threads(output_kwargs, self.core_count)
+        parallel = max_parallel_jobs(weight, self.core_count)
+        self.threads_combo.setEnabled('threads' in output_kwargs)
+        self.parallel_label.setText(f"{self.core_count} 个核心，同时运行 {parallel} 个任务")
+
+    def add_files(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "选择视频文件", "", "视频文件 (*.mp4 *.avi *.mov *.mkv *.flv *.wmv)")
+        for f in files:
+            if f in self.input_files:
+                continue
+            self.input_files.append(f)
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.table.setItem(row, 0, QTableWidgetItem(os.path.basename(f)))
+            self.table.setItem(row, 1, QTableWidgetItem(STATUS_TEXT['queued']))
+            self.table.setItem(row, 2, QTableWidgetItem(""))
+            self.table.setItem(row, 3, QTableWidgetItem(""))
+
+    def clear_files(self):
+        if self.scheduler is not None:
+            return
+        self.input_files = []
+        self.rows = {}
+        self.table.setRowCount(0)
+        self.total_label.setText("")
+
+    def start_batch(self):
+        if not self.input_files:
+            QMessageBox.warning(self, "警告", "请先添加视频文件！")
+            return
+        output_format = self.format_combo.currentText()
+        threads = self.threads_combo.currentText()
+        self.scheduler = BatchScheduler(
+            self.core_count,
+            on_update=self.signals.job_updated.emit,
+            on_finished=self.signals.all_finished.emit,
+        )
+        self.rows = {}
+        for row, f in enumerate(self.input_files):
+            job = self.scheduler.add(f, output_format, threads)
+            self.rows[id(job)] = row
+            self.table.item(row, 1).setText(STATUS_TEXT['queued'])
+            self.table.item(row, 2).setText("")
+            self.table.item(row, 3).setText("")
+        self.start_btn.setEnabled(False)
+        self.add_btn.setEnabled(False)
+        self.clear_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.scheduler.start()
+
+    def cancel_batch(self):
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+
+    @traced(cat='ui')
+    def on_job_updated(self, job):
+        row = self.rows.get(id(job))
+        if row is None:
+            return
+        status_text = STATUS_TEXT.get(job.status, job.status)
+        if job.cached:
+            status_text += "（缓存）"
+        if job.status == 'running' and job.progress_text:
+            status_text += f" {job.progress_text}"
+        self.table.item(row, 1).setText(status_text)
+        if job.status == 'failed':
+            self.table.item(row, 1).setToolTip(job.error[-2000:])
+        if job.ended is not None:
+            self.table.item(row, 2).setText(f"{job.elapsed:.1f}s")
+            self.table.item(row, 3).setText(f"{job.throughput:.1f} MB/s" if job.status == 'done' else "")
+        finished = sum(1 for j in self.scheduler.jobs if j.ended is not None)
+        self.total_label.setText(
+            f"已完成 {finished}/{len(self.scheduler.jobs)}，总吞吐 {self.scheduler.total_throughput:.1f} MB/s"
+        )
+
+    @traced(cat='ui')
+    def on_all_finished(self):
+        failed = [j for j in self.scheduler.jobs if j.status == 'failed']
+        self.start_btn.setEnabled(True)
+        self.add_btn.setEnabled(True)
+        self.clear_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.scheduler = None
+        if failed:
+            QMessageBox.warning(self, "完成", f"批量转换结束，{len(failed)} 个文件失败（鼠标悬停在状态上查看原因）")
+        else:
+            QMessageBox.information(self, "成功", "批量转换全部完成！")
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    app.aboutToQuit.connect(stop_engine)
+    window = BatchConverter()
+    window.show()
+    sys.exit(app.exec_())
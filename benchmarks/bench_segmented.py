@@ -0,0 +1,68 @@
+# 对比单进程 -threads N 与分段并行转码的耗时
+# 用法：python benchmarks/bench_segmented.py --duration 300 --formats avi wmv --json result.json
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from vc_modules.commands import build_convert_cmd, convert_output_kwargs  # noqa: E402
+from vc_modules.binaries import get_bin_path  # noqa: E402
+from vc_modules.segmented import convert_segmented  # noqa: E402
+
+
+def make_source(path, duration):
+    # 用 lavfi 离线生成测试素材：720p 彩色测试图 + 正弦波音频，2 秒一个关键帧
+    cmd = [get_bin_path('ffmpeg'), '-y', '-v', 'error',
+           '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duration}',
+           '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+           '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60', '-c:a', 'aac', path]
+    subprocess.run(cmd, check=True)
+
+
+def time_single(src, out, fmt, threads):
+    cmd = build_convert_cmd(get_bin_path('ffmpeg'), src, out, convert_output_kwargs(fmt, threads))
+    start = time.perf_counter()
+    subprocess.run(cmd[:1] + ['-y', '-v', 'error'] + cmd[1:], check=True)
+    return time.perf_counter() - start
+
+
+def time_segmented(src, out, fmt, workers):
+    start = time.perf_counter()
+    ok, info = convert_segmented(src, out, fmt, {}, workers)
+    if not ok:
+        raise RuntimeError(info)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分段并行转码基准测试')
+    parser.add_argument('--duration', type=int, default=300, help='测试素材时长（秒）')
+    parser.add_argument('--formats', nargs='+', default=['avi', 'wmv'])
+    parser.add_argument('--cores', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--json', default=None, help='结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    results = {'host': platform.node(), 'cores': args.cores, 'duration': args.duration, 'runs': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'source.mkv')
+        make_source(src, args.duration)
+        for fmt in args.formats:
+            single = time_single(src, os.path.join(tmp, f'single.{fmt}'), fmt, args.cores)
+            segmented = time_segmented(src, os.path.join(tmp, f'segmented.{fmt}'), fmt, args.cores)
+            run = {'format': fmt, 'single_s': round(single, 2), 'segmented_s': round(segmented, 2),
+                   'speedup': round(single / segmented, 2) if segmented else None}
+            results['runs'].append(run)
+            print(f"{fmt}: 单进程 {single:.1f}s  分段并行 {segmented:.1f}s  加速 {run['speedup']}x")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+# 探测、重新打包、音轨提取和格式转换的性能基准
+# 测试素材由 ffmpeg 的 lavfi 离线生成（testsrc2 画面、多条 sine 音轨、多条 srt 字幕），参数相同则结果可复现
+# 用法：python benchmarks/bench_suite.py --duration 60 --json result.json
+#       python benchmarks/bench_suite.py --baseline result.json --tolerance 0.15
+# 每个用例在独立的子进程中运行，峰值内存互不影响；与基线相比变慢超过容差时退出码为 1
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from vc_modules.binaries import get_bin_path  # noqa: E402
+
+MB = 1024 * 1024
+CONTAINERS = ['mkv', 'mp4', 'avi']
+CASES = ['probe', 'subidx', 'remux', 'extract', 'convert']
+
+# 每种容器素材里的编码：avi 放不下 aac 和字幕
+MEDIA_CODECS = {
+    'mkv': ['-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-c:s', 'srt'],
+    'mp4': ['-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-c:s', 'mov_text'],
+    'avi': ['-c:v', 'mpeg4', '-q:v', '5', '-c:a', 'libmp3lame'],
+}
+
+
+def write_srt(path, duration, index):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(int(duration // 2)):
+            start, end = i * 2, i * 2 + 1
+            f.write(f"{i + 1}\n00:{start // 60:02d}:{start % 60:02d},000 --> 00:{end // 60:02d}:{end % 60:02d},500\n")
+            f.write(f"字幕 {index} 第 {i + 1} 句\n\n")
+
+
+def make_media(media_dir, container, duration, audio_tracks, subtitle_tracks, size):
+    # 同样的参数生成同样的文件名，已经存在就直接复用
+    name = f"bench_{size}_{duration}s_a{audio_tracks}_s{subtitle_tracks}.{container}"
+    path = os.path.join(media_dir, name)
+    if os.path.exists(path):
+        return path
+    os.makedirs(media_dir, exist_ok=True)
+    cmd = [get_bin_path('ffmpeg'), '-y', '-v', 'error',
+           '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate=30:duration={duration}']
+    for i in range(audio_tracks):
+        cmd += ['-f', 'lavfi', '-i', f'sine=frequency={440 + i * 110}:sample_rate=48000:duration={duration}']
+    subs = subtitle_tracks if container != 'avi' else 0
+    for i in range(subs):
+        srt = os.path.join(media_dir, f"bench_{duration}s_{i}.srt")
+        write_srt(srt, duration, i)
+        cmd += ['-i', srt]
+    for i in range(1 + audio_tracks + subs):
+        cmd += ['-map', str(i)]
+    cmd += MEDIA_CODECS[container] + ['-g', '60', path + '.part.' + container]
+    subprocess.run(cmd, check=True)
+    os.replace(path + '.part.' + container, path)
+    return path
+
+
+def peak_rss_mb(who):
+    # Linux 上 ru_maxrss 单位是 KB，macOS 上是字节
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / (MB if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_ffmpeg_timed(cmd, input_file):
+    from vc_modules.progress import media_duration, run_ffmpeg_with_progress
+    duration = media_duration(input_file)
+    start = time.perf_counter()
+    returncode, stderr = run_ffmpeg_with_progress(cmd, duration)
+    wall = time.perf_counter() - start
+    if returncode != 0:
+        raise RuntimeError(stderr.summary())
+    return wall, duration
+
+
+def case_probe(media, out_dir, repeat):
+    # 对应 vc_pre.update_track_lists：冷探测（关掉内存缓存和媒体库索引）加 summary()
+    from vc_modules.probe import clear_cache, probe
+    times = []
+    for _ in range(repeat):
+        clear_cache()
+        start = time.perf_counter()
+        probe(media).summary()
+        times.append(time.perf_counter() - start)
+    return {'wall_s': statistics.median(times)}
+
+
+def case_subidx(media, out_dir, repeat):
+    # 对应原来的 _stream_subidx：-map 0:a:N 的序号换算，现在由 ProbeResult.subidx 完成
+    from vc_modules.probe import probe
+    info = probe(media)
+    streams = [(s.get('index', -1), s.get('codec_type', '')) for s in info.streams]
+    loops = 20000
+    start = time.perf_counter()
+    for _ in range(loops):
+        for idx, typ in streams:
+            info.subidx(idx, typ)
+    wall = time.perf_counter() - start
+    return {'wall_s': wall, 'ops_per_s': round(loops * len(streams) / wall)}
+
+
+def case_remux(media, out_dir, repeat):
+    # 对应 vc_multi 的重新打包：全部轨道打包成 mkv
+    from vc_modules.commands import build_multi_remux_cmd, default_remux_selection
+    from vc_modules.probe import probe
+    info = probe(media)
+    output = os.path.join(out_dir, 'remux.mkv')
+    videos, audios, subtitles = default_remux_selection(info, 'mkv')
+    cmd = build_multi_remux_cmd(get_bin_path('ffmpeg'), media, output, info, videos, audios, subtitles, [], 'mkv')
+    wall, duration = run_ffmpeg_timed(cmd, media)
+    return {'wall_s': wall, 'duration': duration}
+
+
+def case_extract(media, out_dir, repeat):
+    # 对应 ExtractTask：所有音轨一次导出为 m4a
+    from vc_modules.commands import build_multi_extract_cmd, extract_output_path
+    from vc_modules.probe import probe
+    info = probe(media)
+    tracks = [(i, extract_output_path(media, i, 'm4a', out_dir), s.get('codec_name', ''))
+              for i, s in enumerate(info.streams_of('audio'))]
+    cmd = build_multi_extract_cmd(get_bin_path('ffmpeg'), media, tracks, info.format.get('format_name', ''))
+    wall, duration = run_ffmpeg_timed(cmd, media)
+    return {'wall_s': wall, 'duration': duration}
+
+
+def case_convert(media, out_dir, repeat):
+    # 对应 ConvertTask：转换为 mp4
+    from vc_modules.commands import build_convert_cmd, convert_output_kwargs
+    output = os.path.join(out_dir, 'convert.mp4')
+    cmd = build_convert_cmd(get_bin_path('ffmpeg'), media, output, convert_output_kwargs('mp4', os.cpu_count()))
+    wall, duration = run_ffmpeg_timed(cmd, media)
+    return {'wall_s': wall, 'duration': duration}
+
+
+def child(case, media, out_dir, repeat):
+    # 子进程中只跑一个用例，峰值内存只算这一个
+    os.makedirs(out_dir, exist_ok=True)
+    result = globals()[f'case_{case}'](media, out_dir, repeat)
+    size = os.path.getsize(media)
+    wall = result['wall_s']
+    result['mb_per_s'] = round(size / MB / wall, 2) if wall else None
+    if result.get('duration'):
+        result['realtime'] = round(result['duration'] / wall, 2)
+    result['wall_s'] = round(wall, 4)
+    result['peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_SELF)
+    result['child_peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    print(json.dumps(result))
+
+
+def run_case(case, media, out_dir, repeat):
+    env = dict(os.environ, CONVERTER_INDEX='off', CONVERTER_LOG_DIR='off')
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', case, media, out_dir, str(repeat)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode(errors='ignore')[-2000:])
+    return json.loads(proc.stdout.decode(errors='ignore').strip().splitlines()[-1])
+
+
+def ffmpeg_version():
+    try:
+        out = subprocess.run([get_bin_path('ffmpeg'), '-version'], stdout=subprocess.PIPE, timeout=10).stdout
+        return out.decode(errors='ignore').splitlines()[0]
+    except (OSError, IndexError, subprocess.TimeoutExpired):
+        return ''
+
+
+def compare(results, baseline, tolerance):
+    # 按 (用例, 容器) 对比耗时，返回变慢的条目
+    old = {(r['case'], r['container']): r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        b = old.get((r['case'], r['container']))
+        if b is None or not b.get('wall_s'):
+            continue
+        ratio = r['wall_s'] / b['wall_s']
+        mark = ''
+        if ratio > 1 + tolerance:
+            mark = '  变慢'
+            regressions.append(r)
+        elif ratio < 1 - tolerance:
+            mark = '  变快'
+        print(f"  {r['case']:8s} {r['container']:4s} {b['wall_s']:.3f}s -> {r['wall_s']:.3f}s  ({ratio:.2f}x){mark}")
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))
+        return 0
+
+    parser = argparse.ArgumentParser(description='探测/重新打包/提取/转换性能基准')
+    parser.add_argument('--duration', type=int, default=60, help='测试素材时长（秒）')
+    parser.add_argument('--size', default='1280x720', help='测试素材分辨率')
+    parser.add_argument('--audio-tracks', type=int, default=3)
+    parser.add_argument('--subtitle-tracks', type=int, default=2)
+    parser.add_argument('--containers', nargs='+', default=CONTAINERS, choices=CONTAINERS)
+    parser.add_argument('--cases', nargs='+', default=CASES, choices=CASES)
+    parser.add_argument('--repeat', type=int, default=5, help='probe 用例的重复次数，取中位数')
+    parser.add_argument('--media-dir', default=os.path.join(ROOT, 'benchmarks', '.media'),
+                        help='测试素材目录，生成一次后复用')
+    parser.add_argument('--json', default=None, help='结果写入 JSON 文件')
+    parser.add_argument('--baseline', default=None, help='与之前保存的 JSON 结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='允许比基线慢的比例')
+    args = parser.parse_args()
+
+    report = {
+        'host': platform.node(), 'python': platform.python_version(), 'cores': os.cpu_count(),
+        'ffmpeg': ffmpeg_version(),
+        'params': {'duration': args.duration, 'size': args.size, 'audio_tracks': args.audio_tracks,
+                   'subtitle_tracks': args.subtitle_tracks},
+        'results': [],
+    }
+    out_root = os.path.join(args.media_dir, 'out')
+    for container in args.containers:
+        media = make_media(args.media_dir, container, args.duration, args.audio_tracks,
+                           args.subtitle_tracks, args.size)
+        for case in args.cases:
+            result = run_case(case, media, os.path.join(out_root, f'{container}_{case}'), args.repeat)
+            result.update({'case': case, 'container': container, 'input_mb': round(os.path.getsize(media) / MB, 2)})
+            report['results'].append(result)
+            extra = f"  {result['realtime']}x 实时" if 'realtime' in result else ''
+            print(f"{case:8s} {container:4s} {result['wall_s']:.3f}s  {result['mb_per_s']} MB/s{extra}  "
+                  f"峰值内存 {result['peak_rss_mb']} MB / ffmpeg {result['child_peak_rss_mb']} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != report['params']:
+            print("警告：基线的素材参数不同，结果不可比")
+        print("与基线对比：")
+        if compare(report['results'], baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# 测量 Converter.py 的启动耗时：各模块导入时间（python -X importtime）和主页首次绘制时间
+# 用法：python benchmarks/startup_timing.py --runs 5 --json startup.json
+#       python benchmarks/startup_timing.py --baseline startup.json --tolerance 0.2
+# 与基线相比首次绘制变慢超过容差时退出码为 1，可以放进发布前的检查里
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 子工具模块：主页不应在首次绘制前导入它们
+SUB_TOOL_MODULES = ['video_converter_pre', 'extract_tracks', 'batch_converter']
+
+
+def child():
+    # 在子进程中运行：启动主页，首次绘制后记录时间并退出
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    import Converter
+    imported = time.perf_counter()
+
+    app = QApplication(sys.argv)
+    home = Converter.HomePage()
+    result = {'import_ms': (imported - started) * 1000}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and 'first_paint_ms' not in result:
+                result['first_paint_ms'] = (time.perf_counter() - started) * 1000
+                result['loaded_before_paint'] = [m for m in SUB_TOOL_MODULES if m in sys.modules]
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    watcher = PaintWatcher()
+    home.installEventFilter(watcher)
+    home.show()
+    QTimer.singleShot(10000, app.quit)
+    app.exec_()
+
+    # 首次点击按钮时才付出的导入成本
+    result['lazy_import_ms'] = {}
+    for name in SUB_TOOL_MODULES:
+        t = time.perf_counter()
+        __import__(name)
+        result['lazy_import_ms'][name] = (time.perf_counter() - t) * 1000
+    print(json.dumps(result))
+
+
+def parse_importtime(stderr):
+    # 形如 "import time:       123 |       4567 |   PyQt5.QtWidgets"，只取顶层导入（名称前没有缩进的）
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        name = parts[2].rstrip()
+        if name.startswith('  '):
+            continue
+        try:
+            modules[name.strip()] = int(parts[1]) / 1000
+        except ValueError:
+            continue
+    return modules
+
+
+def run_once():
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child'],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, timeout=60)
+    wall = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode(errors='ignore')[-2000:])
+    lines = [line for line in proc.stdout.decode(errors='ignore').splitlines() if line.startswith('{')]
+    result = json.loads(lines[-1])
+    result['process_wall_ms'] = wall
+    result['modules_ms'] = parse_importtime(proc.stderr.decode(errors='ignore'))
+    return result
+
+
+def summarize(runs):
+    def median(key):
+        return round(statistics.median(r[key] for r in runs if key in r), 1)
+    modules = {}
+    for name in runs[0]['modules_ms']:
+        modules[name] = round(statistics.median(r['modules_ms'].get(name, 0) for r in runs), 1)
+    lazy = {}
+    for name in SUB_TOOL_MODULES:
+        lazy[name] = round(statistics.median(r['lazy_import_ms'].get(name, 0) for r in runs), 1)
+    return {
+        'first_paint_ms': median('first_paint_ms'),
+        'import_ms': median('import_ms'),
+        'process_wall_ms': median('process_wall_ms'),
+        'loaded_before_paint': runs[-1].get('loaded_before_paint', []),
+        'modules_ms': dict(sorted(modules.items(), key=lambda kv: -kv[1])),
+        'lazy_import_ms': lazy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Converter.py 启动耗时测量')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--runs', type=int, default=5, help='重复次数，取中位数')
+    parser.add_argument('--top', type=int, default=15, help='显示导入最慢的前 N 个模块')
+    parser.add_argument('--json', default=None, help='结果写入 JSON 文件')
+    parser.add_argument('--baseline', default=None, help='与之前保存的 JSON 结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许比基线慢的比例')
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return 0
+
+    summary = summarize([run_once() for _ in range(max(1, args.runs))])
+    summary['host'] = platform.node()
+    summary['python'] = platform.python_version()
+
+    print(f"首次绘制 {summary['first_paint_ms']:.1f} ms（导入 Converter {summary['import_ms']:.1f} ms，"
+          f"进程总耗时 {summary['process_wall_ms']:.1f} ms）")
+    if summary['loaded_before_paint']:
+        print(f"警告：首次绘制前已导入子工具 {', '.join(summary['loaded_before_paint'])}")
+    print("导入最慢的模块：")
+    for name, ms in list(summary['modules_ms'].items())[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    print("首次点击时的延迟导入：")
+    for name, ms in summary['lazy_import_ms'].items():
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        limit = baseline['first_paint_ms'] * (1 + args.tolerance)
+        print(f"基线首次绘制 {baseline['first_paint_ms']:.1f} ms，本次 {summary['first_paint_ms']:.1f} ms")
+        if summary['first_paint_ms'] > limit or summary['loaded_before_paint']:
+            print("启动变慢，超出容差")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# 命令行入口：converter convert|remux|extract|probe
+# 只依赖 vc_modules 里的纯 Python 部分，不导入 PyQt5，可以在没有图形界面的渲染机上批量使用
+import os
+import sys
+import glob
+import json
+import argparse
+
+
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for f in matches:
+            if os.path.isfile(f) and f not in files:
+                files.append(f)
+    return files
+
+
+def run_tasks(tasks, jobs=0, slot=None):
+    # tasks: [(描述, 协程函数)]，协程返回 (成功, 信息)；全部提交给异步引擎，
+    # 同时运行的数量由引擎里 slot 类的名额决定，jobs 不为 0 时覆盖默认名额
+    from vc_modules.engine import get_engine
+    engine = get_engine(**({slot: jobs} if slot and jobs else {}))
+    futures = [(desc, engine.submit(fn())) for desc, fn in tasks]
+    failed = 0
+    try:
+        for desc, future in futures:
+            try:
+                ok, info = future.result()
+            except Exception as e:
+                ok, info = False, str(e)
+            if ok:
+                print(f"[完成] {desc} -> {info}")
+            else:
+                failed += 1
+                print(f"[失败] {desc}: {info}", file=sys.stderr)
+    except KeyboardInterrupt:
+        # 结束所有 ffmpeg 进程组，未完成的临时文件由任务日志删除
+        engine.stop()
+        raise
+    return 1 if failed else 0
+
+
+async def run_ffmpeg(cmd, input_file, output_file, slot, kind='cli', extra_outputs=()):
+    from vc_modules.engine import get_engine
+    from vc_modules.progress import format_progress
+    name = os.path.basename(input_file)
+
+    def on_progress(p):
+        if not p.done:
+            print(f"[进度] {name}: {format_progress(p)}", file=sys.stderr)
+
+    # 先查输出缓存，同样的输入和参数不再重复编码；
+    # 再记入任务日志，ffmpeg 写临时文件，成功后才改名
+    ok, info, stderr = await get_engine().run_job(kind, cmd, output_file, input_file, slot=slot,
+                                                  on_progress=on_progress, interval=5.0,
+                                                  extra_outputs=extra_outputs)
+    if ok:
+        info = ", ".join([info] + list(extra_outputs))
+        return True, info if stderr is not None else f"{info}（缓存）"
+    # 有识别出的错误时给出摘要，否则给最后一行
+    if stderr is not None and stderr.counts:
+        return False, "; ".join(f"{desc} ×{n}" for desc, n in stderr.counts.items())
+    return False, (stderr.last_line() if stderr is not None else '') or info
+
+
+def cmd_probe(args):
+    # 所有文件同时交给引擎探测（受 probe 名额限制），按输入顺序输出
+    from vc_modules.engine import get_engine
+    engine = get_engine()
+    status = 0
+    futures = [(f, engine.submit_probe(f)) for f in expand_inputs(args.inputs)]
+    for f, future in futures:
+        try:
+            info = future.result()
+        except Exception as e:
+            print(f"[失败] {f}: {e}", file=sys.stderr)
+            status = 1
+            continue
+        if args.json:
+            print(json.dumps({'file': f, 'summary': info.summary(), 'streams': info.streams}, ensure_ascii=False))
+            continue
+        summary = info.summary()
+        print(f"{f}: {summary['width']}x{summary['height']} {summary['pix_fmt']} "
+              f"{summary['duration']}s {summary['bit_rate']}bps")
+        for stream in info.streams:
+            lang = stream.get('tags', {}).get('language', '')
+            print(f"  #{stream.get('index', -1)} {stream.get('codec_type', '')} "
+                  f"{stream.get('codec_name', '')} {lang}".rstrip())
+    return status
+
+
+def cmd_convert(args):
+    from vc_modules.commands import (
+        build_convert_cmd, build_rendition_cmd, convert_output_kwargs, convert_output_path, parse_rendition,
+        rendition_output_path
+    )
+    from vc_modules.batch import job_threads, max_parallel_jobs
+    from vc_modules.binaries import get_bin_path
+    from vc_modules.engine import ENCODE, get_engine
+    ffmpeg_path = get_bin_path('ffmpeg')
+    output_kwargs = convert_output_kwargs(args.format, args.threads)
+    jobs = args.jobs or max_parallel_jobs(job_threads(output_kwargs))
+    try:
+        extras = [parse_rendition(text) for text in args.also or []]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    async def convert_renditions(f):
+        # 主输出和 --also 的版本由一个 ffmpeg 写出，只解码一次
+        renditions = [(convert_output_path(f, args.format, args.output_dir), args.format, None)]
+        for fmt, height in extras:
+            output_file = rendition_output_path(f, fmt, height, args.output_dir)
+            if output_file not in [r[0] for r in renditions]:
+                renditions.append((output_file, fmt, height))
+        info = await get_engine().probe(f)
+        cmd = build_rendition_cmd(ffmpeg_path, f, info, renditions, args.threads)
+        outputs = [r[0] for r in renditions]
+        return await run_ffmpeg(cmd, f, outputs[0], ENCODE, extra_outputs=outputs[1:])
+
+    tasks = []
+    for f in expand_inputs(args.inputs):
+        if extras:
+            tasks.append((f, lambda f=f: convert_renditions(f)))
+            continue
+        output_file = convert_output_path(f, args.format, args.output_dir)
+        cmd = build_convert_cmd(ffmpeg_path, f, output_file, output_kwargs)
+        tasks.append((f, lambda cmd=cmd, f=f, out=output_file: run_ffmpeg(cmd, f, out, ENCODE)))
+    return run_tasks(tasks, jobs, ENCODE)
+
+
+def cmd_remux(args):
+    from vc_modules.commands import build_remux_cmd, default_remux_selection, remux_output_path
+    from vc_modules.binaries import get_bin_path
+    from vc_modules.engine import IO, get_engine
+    ffmpeg_path = get_bin_path('ffmpeg')
+    target_fmt = args.format.lower()
+
+    async def remux_one(f):
+        info = await get_engine().probe(f)
+        videos, audios, subtitles = default_remux_selection(info, target_fmt)
+        videos = args.video if args.video is not None else videos
+        audios = args.audio if args.audio is not None else audios
+        subtitles = args.subtitle if args.subtitle is not None else subtitles
+        output_file = remux_output_path(f, target_fmt, args.output_dir)
+        cmd = build_remux_cmd(ffmpeg_path, f, output_file, info, videos, audios, subtitles, target_fmt)
+        return await run_ffmpeg(cmd, f, output_file, IO)
+
+    tasks = [(f, lambda f=f: remux_one(f)) for f in expand_inputs(args.inputs)]
+    return run_tasks(tasks, args.jobs, IO)
+
+
+def cmd_extract(args):
+    from vc_modules.commands import build_multi_extract_cmd, extract_output_path
+    from vc_modules.binaries import get_bin_path
+    from vc_modules.engine import IO, get_engine
+    ffmpeg_path = get_bin_path('ffmpeg')
+
+    async def extract_one(f):
+        # 所有音轨一次读取输入文件同时导出
+        info = await get_engine().probe(f)
+        audio_tracks = info.streams_of('audio')
+        track_idxs = args.track if args.track is not None else list(range(len(audio_tracks)))
+        tracks = []
+        for track_index in track_idxs:
+            if track_index >= len(audio_tracks):
+                return False, f"没有第 {track_index} 条音轨"
+            output_file = extract_output_path(f, track_index, args.format, args.output_dir)
+            tracks.append((track_index, output_file, audio_tracks[track_index].get('codec_name', '').lower()))
+        if not tracks:
+            return False, "未检测到音轨"
+        cmd = build_multi_extract_cmd(ffmpeg_path, f, tracks, info.format.get('format_name', ''))
+        outputs = [t[1] for t in tracks]
+        return await run_ffmpeg(cmd, f, outputs[0], IO, extra_outputs=outputs[1:])
+
+    tasks = [(f, lambda f=f: extract_one(f)) for f in expand_inputs(args.inputs)]
+    return run_tasks(tasks, args.jobs, IO)
+
+
+def cmd_watch(args):
+    import threading
+    from vc_modules.watch import WatchFolder
+    watcher = WatchFolder(args.input_dir, args.output_dir, args.format, action=args.action, rule=args.tracks,
+                          languages=args.lang, threads=args.threads, jobs=args.jobs or 1, settle=args.settle,
+                          poll_interval=args.interval, use_inotify=not args.poll)
+    stop = threading.Event()
+    try:
+        watcher.run(stop)
+    except KeyboardInterrupt:
+        stop.set()
+    return 0
+
+
+async def resume_one(job):
+    # 按记录的命令重新运行，沿用原来的任务编号；不查输出缓存
+    from vc_modules.engine import ENCODE, get_engine
+    ok, info, _ = await get_engine().run_job(job['kind'], job['cmd'], job['output'], slot=ENCODE,
+                                             use_cache=False, params=job.get('params'), job_id=job['id'],
+                                             extra_outputs=job.get('extra_outputs', ()))
+    return ok, info
+
+
+def cmd_resume(args):
+    # 继续上次异常退出时没有完成的任务（监视文件夹的任务由 watch 重启后自己处理）
+    from vc_modules.engine import ENCODE
+    from vc_modules.journal import get_journal
+    journal = get_journal()
+    if journal is None:
+        print("任务日志已关闭（CONVERTER_JOURNAL=off）", file=sys.stderr)
+        return 1
+    jobs = [job for job in journal.recover() if job.get('kind') != 'watch']
+    if not jobs:
+        print("没有未完成的任务")
+        return 0
+    for job in jobs:
+        print(f"[未完成] {job['output']}")
+    if args.list:
+        return 0
+    if args.discard:
+        for job in jobs:
+            journal.forget(job['id'])
+        print(f"已放弃 {len(jobs)} 个任务")
+        return 0
+    tasks = [(job['output'], lambda job=job: resume_one(job)) for job in jobs]
+    return run_tasks(tasks, args.jobs, ENCODE)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='converter', description='视频格式转换、重新打包和音轨提取（命令行版）')
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='把各阶段耗时写成 Chrome trace JSON（也可以设置 CONVERTER_TRACE）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用输出缓存（也可以设置 CONVERTER_OUTPUT_CACHE=off）')
+    parser.add_argument('--background', action='store_true',
+                        help='作为后台任务运行：降低 CPU 和磁盘优先级，机器繁忙时暂缓启动新任务'
+                             '（也可以设置 CONVERTER_PRIORITY=background；watch 总是后台运行）')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(p):
+        p.add_argument('inputs', nargs='+', help='输入文件，支持通配符')
+        p.add_argument('-j', '--jobs', type=int, default=0, help='同时运行的任务数（默认按任务类型：转换按核心数，打包和提取 2 个）')
+        p.add_argument('-o', '--output-dir', default=None, help='输出目录（默认与输入文件相同）')
+
+    p = sub.add_parser('probe', help='显示轨道信息')
+    p.add_argument('inputs', nargs='+')
+    p.add_argument('--json', action='store_true', help='每个文件输出一行 JSON')
+    p.set_defaults(func=cmd_probe)
+
+    p = sub.add_parser('convert', help='视频格式转换')
+    add_common(p)
+    p.add_argument('-f', '--format', required=True, choices=["mp4", "avi", "mov", "mkv", "flv", "wmv"])
+    p.add_argument('-t', '--threads', type=int, default=None, help='每个任务的 ffmpeg -threads')
+    p.add_argument('--also', nargs='+', default=None, metavar='FORMAT[:HEIGHT]',
+                   help='同一次解码同时输出的其他版本，如 --also mkv mp4:720（能复制的轨道直接复制）')
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser('remux', help='选择轨道重新打包')
+    add_common(p)
+    p.add_argument('-f', '--format', required=True, choices=["mp4", "avi", "mov", "mkv", "wmv"])
+    p.add_argument('--video', type=int, nargs='*', default=None, help='视频轨道的流序号（#idx）')
+    p.add_argument('--audio', type=int, nargs='*', default=None, help='音频轨道的流序号（#idx）')
+    p.add_argument('--subtitle', type=int, nargs='*', default=None, help='字幕轨道的流序号（#idx）')
+    p.set_defaults(func=cmd_remux)
+
+    p = sub.add_parser('extract', help='提取音轨')
+    add_common(p)
+    p.add_argument('--track', type=int, nargs='+', default=None, help='要提取的音轨序号（从 0 开始，默认全部），一次读取同时导出')
+    p.add_argument('-f', '--format', default='mp3', choices=["mp3", "aac", "wav", "flac", "m4a", "ogg"])
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser('watch', help='监视文件夹，新文件拷贝完成后自动处理')
+    p.add_argument('input_dir', help='监视的文件夹（包括子文件夹）')
+    p.add_argument('-o', '--output-dir', required=True, help='输出目录，保持输入的子目录结构')
+    p.add_argument('-f', '--format', required=True, choices=["mp4", "avi", "mov", "mkv", "flv", "wmv"])
+    p.add_argument('--action', default='convert', choices=['convert', 'remux'], help='转换或重新打包')
+    p.add_argument('--tracks', default='all', choices=['all', 'first'], help='重新打包时的轨道选择规则')
+    p.add_argument('--lang', nargs='+', default=None, help='只保留这些语言的音轨和字幕（如 jpn chi）')
+    p.add_argument('-t', '--threads', type=int, default=None, help='每个任务的 ffmpeg -threads')
+    p.add_argument('-j', '--jobs', type=int, default=1, help='同时处理的文件数')
+    p.add_argument('--settle', type=float, default=5.0, help='文件大小和修改时间保持不变多少秒后才处理')
+    p.add_argument('--interval', type=float, default=2.0, help='检查间隔（秒）')
+    p.add_argument('--poll', action='store_true', help='不用 inotify，定时扫描（网络共享上更可靠）')
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser('resume', help='继续上次异常退出时未完成的任务')
+    p.add_argument('--list', action='store_true', help='只列出，不运行')
+    p.add_argument('--discard', action='store_true', help='放弃这些任务')
+    p.add_argument('-j', '--jobs', type=int, default=1, help='同时运行的任务数')
+    p.set_defaults(func=cmd_resume)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.no_cache:
+        os.environ['CONVERTER_OUTPUT_CACHE'] = 'off'
+    if args.background:
+        os.environ['CONVERTER_PRIORITY'] = 'background'
+    if args.trace:
+        from vc_modules.tracing import enable
+        enable(args.trace)
+    if getattr(args, 'output_dir', None):
+        os.makedirs(args.output_dir, exist_ok=True)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
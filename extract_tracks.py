@@ -1,53 +1,35 @@
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout,
-    QFileDialog, QComboBox, QMessageBox
+    QFileDialog, QComboBox, QMessageBox, QListWidget, QListWidgetItem, QProgressBar
 )
-from PyQt5.QtCore import QThread, pyqtSignal
-import subprocess, json
-def get_bin_path(bin_name):
-    import sys, os
-    if getattr(sys, 'frozen', False):
-        return os.path.join(sys._MEIPASS, 'bin', bin_name)
-    else:
-        return os.path.join(os.path.dirname(__file__), 'bin', bin_name)
+from PyQt5.QtCore import Qt
+from vc_modules.binaries import get_bin_path
+from vc_modules.probe import probe
+from vc_modules.commands import build_multi_extract_cmd, extract_output_path
+from vc_modules.engine import IO, get_engine, stop_engine
+from vc_modules.engine_qt import EngineTask
+from vc_modules.tracing import traced
 import os
 
-class ExtractThread(QThread):
-    finished = pyqtSignal(bool, str)
-
-    def __init__(self, input_file, track_index, output_file, output_format):
-        super().__init__()
+class ExtractTask(EngineTask):
+    def __init__(self, input_file, tracks, output_format):
+        super().__init__(tracks[0][1])
         self.input_file = input_file
-        self.track_index = track_index
-        self.output_file = output_file
+        self.tracks = tracks  # [(音轨序号, 输出文件, 源编码)]
         self.output_format = output_format
 
-    def run(self):
-        try:
-            ffmpeg_path = get_bin_path('ffmpeg')
-            # 增加分析参数，提升兼容性
-            cmd = [
-                ffmpeg_path, '-y', '-analyzeduration', '100M', '-probesize', '100M',
-                '-i', self.input_file,
-                '-map', f'0:a:{self.track_index}',
-                '-vn'
-            ]
-            # 判断是否需要转码（如用户选的不是源音轨编码）
-            ext = os.path.splitext(self.output_file)[1].lower().replace('.', '')
-            # 常见无损格式直接copy，否则转码
-            if ext in ('wav', 'flac', 'm4a', 'aac', 'ogg'):
-                cmd += ['-acodec', 'copy']
-            else:
-                cmd += ['-acodec', ext]
-            cmd += [self.output_file]
-            ret = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if ret.returncode == 0:
-                self.finished.emit(True, self.output_file)
-            else:
-                self.finished.emit(False, ret.stderr.decode(errors='ignore'))
-        except Exception as e:
-            self.finished.emit(False, str(e))
+    async def run(self):
+        # 所有选中的音轨一次读取输入文件同时导出；每个文件都先写临时文件，全部成功后一起改名
+        engine = get_engine()
+        source_format = (await engine.probe(self.input_file)).format.get('format_name', '')
+        cmd = build_multi_extract_cmd(get_bin_path('ffmpeg'), self.input_file, self.tracks, source_format)
+        outputs = [t[1] for t in self.tracks]
+        ok, info, stderr = await engine.run_job('extract', cmd, outputs[0], self.input_file, slot=IO,
+                                                on_progress=self.report, extra_outputs=outputs[1:])
+        if ok and stderr is None:
+            self.progress.emit(100.0, "已使用缓存的结果")
+        return ok, "\n".join(outputs) if ok else info
 
 class AudioExtractor(QWidget):
     def __init__(self):
@@ -64,8 +46,9 @@ class AudioExtractor(QWidget):
         self.select_btn = QPushButton("选择文件")
         self.select_btn.clicked.connect(self.select_file)
 
-        self.track_label = QLabel("选择音轨")
-        self.track_combo = QComboBox()
+        self.track_label = QLabel("选择音轨（可多选）")
+        self.track_list = QListWidget()
+        self.track_list.setSelectionMode(QListWidget.MultiSelection)
 
         self.format_label = QLabel("选择导出格式")
         self.format_combo = QComboBox()
@@ -74,14 +57,20 @@ class AudioExtractor(QWidget):
         self.extract_btn = QPushButton("开始提取")
         self.extract_btn.clicked.connect(self.extract_audio)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_label = QLabel("")
+
         layout = QVBoxLayout()
         layout.addWidget(self.label)
         layout.addWidget(self.select_btn)
         layout.addWidget(self.track_label)
-        layout.addWidget(self.track_combo)
+        layout.addWidget(self.track_list)
         layout.addWidget(self.format_label)
         layout.addWidget(self.format_combo)
         layout.addWidget(self.extract_btn)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_label)
         layout.addStretch()
         self.setLayout(layout)
 
@@ -93,23 +82,23 @@ class AudioExtractor(QWidget):
             self.list_audio_tracks()
 
     def list_audio_tracks(self):
-        # 使用 bin/ffprobe 获取音轨信息
-        ffprobe_path = get_bin_path('ffprobe')
-        cmd = [ffprobe_path, '-v', 'error', '-show_streams', '-print_format', 'json', self.input_file]
+        # 使用共享的探测缓存获取音轨信息
         try:
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            probe = json.loads(result.stdout.decode(errors='ignore'))
-            self.audio_tracks = [
-                stream for stream in probe['streams'] if stream['codec_type'] == 'audio'
-            ]
-            self.track_combo.clear()
+            self.audio_tracks = probe(self.input_file).streams_of('audio')
+            self.track_list.clear()
             for idx, track in enumerate(self.audio_tracks):
                 lang = track.get('tags', {}).get('language', '未知')
                 codec = track.get('codec_name', '未知')
                 desc = f"音轨{idx+1} - {codec} ({lang})"
-                self.track_combo.addItem(desc, idx)
-            if not self.audio_tracks:
-                self.track_combo.addItem("未检测到音轨")
+                item = QListWidgetItem(desc)
+                item.setData(Qt.UserRole, idx)
+                self.track_list.addItem(item)
+            if self.audio_tracks:
+                self.track_list.item(0).setSelected(True)
+            else:
+                item = QListWidgetItem("未检测到音轨")
+                item.setFlags(item.flags() & ~Qt.ItemIsSelectable & ~Qt.ItemIsEnabled)
+                self.track_list.addItem(item)
         except Exception as e:
             err_msg = str(e)
             if hasattr(e, 'stderr') and e.stderr:
@@ -120,19 +109,32 @@ class AudioExtractor(QWidget):
         if not self.input_file or not self.audio_tracks:
             QMessageBox.warning(self, "警告", "请先选择包含音轨的视频文件！")
             return
-        track_index = self.track_combo.currentData()
-        if track_index is None:
+        track_idxs = sorted(item.data(Qt.UserRole) for item in self.track_list.selectedItems())
+        if not track_idxs:
             QMessageBox.warning(self, "警告", "请选择有效的音轨！")
             return
         output_format = self.format_combo.currentText()
-        base, _ = os.path.splitext(self.input_file)
-        output_file = f"{base}_track{track_index+1}.{output_format}"
+        tracks = []
+        for track_index in track_idxs:
+            output_file = extract_output_path(self.input_file, track_index, output_format)
+            src_codec = self.audio_tracks[track_index].get('codec_name', '').lower()
+            tracks.append((track_index, output_file, src_codec))
 
         self.extract_btn.setEnabled(False)
-        self.thread = ExtractThread(self.input_file, track_index, output_file, output_format)
-        self.thread.finished.connect(self.on_extract_finished)
-        self.thread.start()
-
+        self.task = ExtractTask(self.input_file, tracks, output_format)
+        self.task.finished.connect(self.on_extract_finished)
+        self.task.progress.connect(self.on_progress)
+        self.progress_bar.setValue(0)
+        self.progress_label.setText("")
+        self.task.start()
+
+    @traced(cat='ui')
+    def on_progress(self, percent, text):
+        if percent >= 0:
+            self.progress_bar.setValue(int(percent))
+        self.progress_label.setText(text)
+
+    @traced(cat='ui')
     def on_extract_finished(self, success, info):
         self.extract_btn.setEnabled(True)
         if success:
@@ -142,6 +144,7 @@ class AudioExtractor(QWidget):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(stop_engine)
     window = AudioExtractor()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,207 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import CancelledError
+
+from vc_modules.commands import build_convert_cmd, convert_output_kwargs, convert_output_path
+from vc_modules.binaries import get_bin_path
+from vc_modules.progress import format_progress
+from vc_modules.journal import JournaledJob
+from vc_modules.scheduler import BACKGROUND
+
+# 批量转换队列：按 CPU 核心数和每个任务的 -threads 决定同时跑几个 ffmpeg。
+# 每个任务交给引擎作为后台任务运行，和其他窗口的任务共用编码名额：ffmpeg 以较低优先级启动，
+# 前台任务可以暂停它，机器忙时暂缓启动；输出缓存、临时文件和任务日志也由引擎处理
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def job_threads(output_kwargs, cpu_count=None):
+    cpu_count = cpu_count or os.cpu_count() or 1
+    try:
+        threads = int(output_kwargs.get('threads', 0))
+    except (TypeError, ValueError):
+        threads = 0
+    if threads > 0:
+        return min(threads, cpu_count)
+    # 未指定 -threads 时（硬件编码路径），CPU 只负责解码和封装，按四分之一核心估算
+    return max(1, cpu_count // 4)
+
+
+def max_parallel_jobs(threads_per_job, cpu_count=None):
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // max(1, int(threads_per_job)))
+
+
+class BatchJob:
+    def __init__(self, input_file, output_file, output_kwargs):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.output_kwargs = output_kwargs
+        self.status = QUEUED
+        self.error = ''
+        self.started = None
+        self.ended = None
+        try:
+            self.input_size = os.path.getsize(input_file)
+        except OSError:
+            self.input_size = 0
+        self.future = None  # 引擎里运行的任务（concurrent.futures.Future）
+        self.percent = -1.0
+        self.progress_text = ''
+        self.cached = False  # 结果直接取自输出缓存
+        self.cmd = None
+        self.journal = None  # JournaledJob，负责临时文件和任务日志
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.monotonic()) - self.started
+
+    @property
+    def throughput(self):
+        # 按输入文件大小计算的处理速度 (MB/s)
+        elapsed = self.elapsed
+        if not elapsed or self.cached or self.status not in (DONE, RUNNING):
+            return 0.0
+        return self.input_size / elapsed / (1024 * 1024)
+
+
+class BatchScheduler:
+    def __init__(self, cpu_count=None, on_update=None, on_finished=None):
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.on_update = on_update
+        self.on_finished = on_finished
+        self.jobs = []
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._used_threads = 0
+        self._running = 0
+        self._cancelled = False
+        self._dispatcher = None
+        self.started = None
+        self.ended = None
+
+    def add(self, input_file, output_format, threads=None, output_dir=None):
+        output_kwargs = convert_output_kwargs(output_format, threads)
+        job = BatchJob(input_file, convert_output_path(input_file, output_format, output_dir), output_kwargs)
+        # 加入队列时就记入任务日志，崩溃后还没开始的任务也能继续
+        job.cmd = build_convert_cmd(get_bin_path('ffmpeg'), input_file, job.output_file, output_kwargs)
+        job.journal = JournaledJob('batch', job.cmd, job.output_file)
+        with self._cond:
+            self.jobs.append(job)
+            self._pending.append(job)
+            self._cond.notify_all()
+        return job
+
+    def start(self):
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        self._cancelled = False
+        self.started = time.monotonic()
+        self.ended = None
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def cancel(self):
+        with self._cond:
+            self._cancelled = True
+            while self._pending:
+                job = self._pending.popleft()
+                job.status = CANCELLED
+                job.journal.finish(False, cancelled=True)
+                self._notify(job)
+            for job in self.jobs:
+                if job.status == RUNNING and job.future is not None:
+                    job.future.cancel()
+            self._cond.notify_all()
+
+    def wait(self):
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+
+    @property
+    def total_throughput(self):
+        done_bytes = sum(job.input_size for job in self.jobs if job.status == DONE and not job.cached)
+        if self.started is None:
+            return 0.0
+        elapsed = (self.ended or time.monotonic()) - self.started
+        return done_bytes / elapsed / (1024 * 1024) if elapsed else 0.0
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            self.on_update(job)
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                # 有空闲核心就启动下一个任务；至少保证一个任务在跑
+                while not self._cancelled and self._pending:
+                    job = self._pending[0]
+                    weight = job_threads(job.output_kwargs, self.cpu_count)
+                    if self._running and self._used_threads + weight > self.cpu_count:
+                        break
+                    self._pending.popleft()
+                    self._used_threads += weight
+                    self._running += 1
+                    threading.Thread(target=self._run_job, args=(job, weight), daemon=True).start()
+                if self._running == 0 and (self._cancelled or not self._pending):
+                    break
+                self._cond.wait()
+        self.ended = time.monotonic()
+        if self.on_finished is not None:
+            self.on_finished()
+
+    def _run_job(self, job, weight):
+        job.status = RUNNING
+        job.started = time.monotonic()
+        self._notify(job)
+        try:
+            self._run_ffmpeg(job)
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            job.journal.finish(False, error=job.error)
+        job.ended = time.monotonic()
+        self._notify(job)
+        with self._cond:
+            self._used_threads -= weight
+            self._running -= 1
+            self._cond.notify_all()
+
+    def _run_ffmpeg(self, job):
+        from vc_modules.engine import ENCODE, get_engine  # engine 依赖本模块的 max_parallel_jobs
+
+        def on_progress(p):
+            job.percent = p.percent
+            job.progress_text = format_progress(p)
+            self._notify(job)
+
+        # 沿用加入队列时的任务号，引擎的记录接着这条写
+        engine = get_engine()
+        job.future = engine.submit(engine.run_job('batch', job.cmd, job.output_file, job.input_file, slot=ENCODE,
+                                                  on_progress=on_progress, interval=1.0, job_id=job.journal.id,
+                                                  priority=BACKGROUND))
+        if self._cancelled:
+            job.future.cancel()
+        try:
+            ok, info, stderr = job.future.result()
+        except CancelledError:
+            job.status = CANCELLED
+            job.error = "已取消"
+            return
+        if ok:
+            job.status = DONE
+            if stderr is None:
+                # 直接用了输出缓存，引擎没有写任务日志
+                job.cached = True
+                job.journal.skip()
+        else:
+            job.status = CANCELLED if self._cancelled else FAILED
+            job.error = info
@@ -0,0 +1,50 @@
+import os
+import sys
+import shutil
+import threading
+
+# 统一查找 ffmpeg / ffprobe：
+# 1. 环境变量 CONVERTER_BIN_DIR 指定的目录
+# 2. PyInstaller 打包后的 bin/
+# 3. 源码目录下的 bin/（以及旧版 video_converter 使用的 assets/）
+# 4. 系统 PATH
+
+_found = {}
+_lock = threading.Lock()
+
+
+def _app_root():
+    if getattr(sys, 'frozen', False):
+        return sys._MEIPASS
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _candidates(bin_name):
+    names = [bin_name + '.exe', bin_name] if os.name == 'nt' else [bin_name]
+    dirs = []
+    if os.environ.get('CONVERTER_BIN_DIR'):
+        dirs.append(os.environ['CONVERTER_BIN_DIR'])
+    dirs.append(os.path.join(_app_root(), 'bin'))
+    dirs.append(os.path.join(_app_root(), 'assets'))
+    for d in dirs:
+        for name in names:
+            yield os.path.join(d, name)
+
+
+def get_bin_path(bin_name):
+    with _lock:
+        if bin_name in _found:
+            return _found[bin_name]
+    path = None
+    for candidate in _candidates(bin_name):
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            path = os.path.normpath(candidate)
+            break
+    if path is None:
+        path = shutil.which(bin_name)
+    if path is None:
+        # 找不到时仍返回打包目录下的默认位置，让调用方按原来的方式报错
+        return os.path.normpath(os.path.join(_app_root(), 'bin', bin_name))
+    with _lock:
+        _found[bin_name] = path
+    return path
@@ -0,0 +1,152 @@
+import os
+import json
+import threading
+import subprocess
+
+from vc_modules.binaries import get_bin_path
+
+# ffmpeg 能力检测：-encoders / -hwaccels / -version 只查询一次，
+# 结果按二进制文件的路径、大小和修改时间缓存到磁盘，换了 ffmpeg 才会重新检测
+
+# 按速度从快到慢排列的 H.264 编码器；都不可用时退回 libx264
+HARDWARE_H264_ENCODERS = ['h264_videotoolbox', 'h264_nvenc', 'h264_qsv', 'h264_amf']
+SOFTWARE_H264_ENCODER = 'libx264'
+SOFTWARE_H264_PRESET = 'veryfast'
+
+_caps = None
+_lock = threading.Lock()
+
+
+def default_cache_path():
+    path = os.environ.get('CONVERTER_CAPS_CACHE')
+    if path:
+        return path
+    return os.path.join(os.path.expanduser('~'), '.converter', 'capabilities.json')
+
+
+def _run(ffmpeg_path, *args):
+    result = subprocess.run([ffmpeg_path, '-hide_banner', *args], stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
+    return result.stdout.decode(errors='ignore')
+
+
+def parse_encoders(text):
+    # 形如 " V....D libx264   libx264 H.264 ..."，第一列是类型标志
+    encoders = {}
+    started = False
+    for line in text.splitlines():
+        if line.strip().startswith('------'):
+            started = True
+            continue
+        parts = line.split()
+        if not started or len(parts) < 2 or len(parts[0]) != 6:
+            continue
+        kind = {'V': 'video', 'A': 'audio', 'S': 'subtitle'}.get(parts[0][0])
+        if kind:
+            encoders[parts[1]] = kind
+    return encoders
+
+
+def parse_hwaccels(text):
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return [line for line in lines if not line.lower().startswith('hardware acceleration methods')]
+
+
+def _encoder_works(ffmpeg_path, encoder):
+    # 编码器出现在列表里不代表本机有对应硬件，用一帧空白画面试编码确认
+    cmd = [ffmpeg_path, '-hide_banner', '-v', 'error', '-f', 'lavfi', '-i', 'color=black:s=256x256:d=0.1',
+           '-frames:v', '1', '-c:v', encoder, '-f', 'null', '-']
+    try:
+        return subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, timeout=20).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def detect(ffmpeg_path):
+    encoders = parse_encoders(_run(ffmpeg_path, '-encoders'))
+    version = (_run(ffmpeg_path, '-version').splitlines() or [''])[0]
+    hwaccels = parse_hwaccels(_run(ffmpeg_path, '-hwaccels'))
+    usable_hw = [e for e in HARDWARE_H264_ENCODERS if e in encoders and _encoder_works(ffmpeg_path, e)]
+    return {'version': version, 'encoders': encoders, 'hwaccels': hwaccels, 'hardware_h264': usable_hw}
+
+
+def _binary_key(ffmpeg_path):
+    st = os.stat(ffmpeg_path)
+    return [os.path.abspath(ffmpeg_path), st.st_size, st.st_mtime_ns]
+
+
+def _load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, data):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # 缓存写不进去只影响下次启动速度
+
+
+def get_capabilities():
+    global _caps
+    with _lock:
+        if _caps is not None:
+            return _caps
+        ffmpeg_path = get_bin_path('ffmpeg')
+        try:
+            key = _binary_key(ffmpeg_path)
+        except OSError:
+            _caps = {'version': '', 'encoders': {}, 'hwaccels': [], 'hardware_h264': []}
+            return _caps
+        cache_path = default_cache_path()
+        cached = _load_cache(cache_path)
+        if cached.get('key') == key:
+            _caps = cached['caps']
+            return _caps
+        try:
+            caps = detect(ffmpeg_path)
+        except (OSError, subprocess.TimeoutExpired):
+            caps = {'version': '', 'encoders': {}, 'hwaccels': [], 'hardware_h264': []}
+        else:
+            _save_cache(cache_path, {'key': key, 'caps': caps})
+        _caps = caps
+        return _caps
+
+
+def cached_capabilities():
+    # 只读内存和磁盘缓存，不运行 ffmpeg；还没检测过（或换了 ffmpeg）时返回 None，界面线程用它。
+    # 不拿 _lock：后台预热检测时会一直拿着锁试编码
+    caps = _caps
+    if caps is not None:
+        return caps
+    try:
+        key = _binary_key(get_bin_path('ffmpeg'))
+    except OSError:
+        return None
+    cached = _load_cache(default_cache_path())
+    return cached['caps'] if cached.get('key') == key else None
+
+
+def has_encoder(name):
+    return name in get_capabilities()['encoders']
+
+
+def hardware_h264_encoder():
+    usable = get_capabilities()['hardware_h264']
+    return usable[0] if usable else None
+
+
+def pick_h264_encoder():
+    # 返回 (编码器, 是否硬件编码)
+    hardware = hardware_h264_encoder()
+    if hardware:
+        return hardware, True
+    return SOFTWARE_H264_ENCODER, False
@@ -0,0 +1,266 @@
+import os
+
+from vc_modules.capabilities import SOFTWARE_H264_PRESET, pick_h264_encoder
+from vc_modules.planner import BSF, COPY, UNSUPPORTED, codec_args, plan_codec, plan_stream
+from vc_modules.segmented import DEFAULT_VIDEO_ENCODERS
+from vc_modules.tracing import traced
+
+# ffmpeg 命令行构建，不依赖 Qt，界面和批量任务共用
+
+
+def convert_output_kwargs(output_format, threads=None):
+    # mp4/mov 使用本机可用的最快 H.264 编码器：有硬件编码器用硬件，否则 libx264 + 较快的预设
+    output_kwargs = {}
+    if output_format in ["mp4", "mov"]:
+        vcodec, hardware = pick_h264_encoder()
+        if hardware:
+            return {'vcodec': vcodec}
+        output_kwargs = {'vcodec': vcodec, 'preset': SOFTWARE_H264_PRESET}
+    if threads:
+        output_kwargs['threads'] = threads
+    return output_kwargs
+
+
+def convert_output_path(input_file, output_format, output_dir=None):
+    base, _ = os.path.splitext(input_file)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return f"{base}_converted.{output_format}"
+
+
+def build_convert_cmd(ffmpeg_path, input_file, output_file, output_kwargs):
+    cmd = [ffmpeg_path, '-i', input_file]
+    # 添加输出参数
+    if 'vcodec' in output_kwargs:
+        cmd += ['-vcodec', output_kwargs['vcodec']]
+    if 'preset' in output_kwargs:
+        cmd += ['-preset', output_kwargs['preset']]
+    if 'threads' in output_kwargs:
+        cmd += ['-threads', str(output_kwargs['threads'])]
+    cmd += [output_file]
+    return cmd
+
+
+RENDITION_HEIGHTS = [1080, 720, 480]
+
+
+def rendition_output_path(input_file, output_format, height=None, output_dir=None):
+    # 原始分辨率和普通转换同名，缩小的版本加上高度，如 a_720p.mp4
+    if not height:
+        return convert_output_path(input_file, output_format, output_dir)
+    base, _ = os.path.splitext(input_file)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return f"{base}_{height}p.{output_format}"
+
+
+def parse_rendition(text):
+    # "mp4" 或 "mp4:720"，返回 (格式, 高度或 None)
+    fmt, _, height = text.partition(':')
+    try:
+        return fmt.lower(), int(height.lower().rstrip('p')) if height else None
+    except ValueError:
+        raise ValueError(f"无法识别的输出：{text}，应为 格式 或 格式:高度")
+
+
+@traced('plan', cat='plan')
+def build_rendition_cmd(ffmpeg_path, input_file, info, renditions, threads=None):
+    # renditions: [(输出文件, 格式, 高度或 None)]。一个 ffmpeg 只解码一次：
+    # 需要编码的视频按分辨率 split 成几路、scale 后分别编码；原始分辨率且目标容器放得下源编码的输出直接复制视频。
+    # 每个输出带第一条音轨，能复制就复制
+    videos = [r for r in info.records_of('video') if not r.is_picture]
+    if not videos:
+        raise ValueError("没有可转换的视频轨道")
+    stream = info.stream(videos[0].index)
+    v_spec = f'0:v:{info.subidx(videos[0].index, "video")}'
+    audio = (info.streams_of('audio') or [None])[0]
+    source_format = info.format.get('format_name', '')
+    try:
+        source_height = int(stream.get('height') or 0)
+    except (TypeError, ValueError):
+        source_height = 0
+
+    video_maps = {}   # 输出序号 -> -map 的来源
+    video_codecs = {}
+    encoded = {}      # 高度（None 为原始分辨率）-> [输出序号]
+    for i, (_, fmt, height) in enumerate(renditions):
+        if height and source_height and height >= source_height:
+            height = None  # 不放大
+        plan = plan_stream(stream, fmt, source_format)
+        if height is None and plan.action in (COPY, BSF):
+            video_maps[i] = v_spec
+            video_codecs[i] = plan.args(0)
+            continue
+        encoded.setdefault(height, []).append(i)
+        output_kwargs = convert_output_kwargs(fmt, threads)
+        args = ['-c:v:0', output_kwargs.get('vcodec') or DEFAULT_VIDEO_ENCODERS.get(fmt, 'libx264')]
+        if 'preset' in output_kwargs:
+            args += ['-preset:v:0', output_kwargs['preset']]
+        if 'threads' in output_kwargs:
+            args += ['-threads', str(output_kwargs['threads'])]
+        video_codecs[i] = args
+
+    filters = []
+    if len(encoded) == 1 and None in encoded and len(encoded[None]) == 1:
+        video_maps[encoded[None][0]] = v_spec  # 只有一路原始分辨率的编码，不需要滤镜
+    elif encoded:
+        branches = [f'[{v_spec}]']
+        if len(encoded) > 1:
+            branches = [f'[b{j}]' for j in range(len(encoded))]
+            filters.append(f'[{v_spec}]split={len(encoded)}' + ''.join(branches))
+        for branch, (height, idxs) in zip(branches, encoded.items()):
+            steps = [f'scale=-2:{height}'] if height else []
+            if len(idxs) > 1:
+                steps.append(f'split={len(idxs)}')
+            filters.append(branch + (','.join(steps) or 'null') + ''.join(f'[v{i}]' for i in idxs))
+            for i in idxs:
+                video_maps[i] = f'[v{i}]'
+
+    cmd = [ffmpeg_path, '-y', '-i', input_file]
+    if filters:
+        cmd += ['-filter_complex', ';'.join(filters)]
+    for i, (output_file, fmt, _) in enumerate(renditions):
+        cmd += ['-map', video_maps[i]] + video_codecs[i]
+        if audio is not None:
+            plan = plan_stream(audio, fmt, source_format)
+            if plan.action != UNSUPPORTED:
+                cmd += ['-map', '0:a:0'] + plan.args(0)
+        cmd += [output_file]
+    return cmd
+
+
+SINGLE_TRACK_FORMATS = ["avi", "wmv"]
+MULTI_TRACK_FORMATS = ["mp4", "mov", "mkv"]
+
+
+def remux_output_path(input_file, target_format, output_dir=None):
+    suffix = "_single" if target_format.lower() in SINGLE_TRACK_FORMATS else "_remux"
+    base = os.path.splitext(input_file)[0]
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return f"{base}{suffix}.{target_format}"
+
+
+def extract_output_path(input_file, track_index, output_format, output_dir=None):
+    base, _ = os.path.splitext(input_file)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return f"{base}_track{track_index+1}.{output_format}"
+
+
+def default_remux_selection(info, target_format):
+    # 命令行未指定轨道时的默认选择，与界面中可选的轨道一致
+    target_fmt = target_format.lower()
+    source_format = info.format.get('format_name', '')
+    videos = [r.index for r in info.records_of('video') if not r.is_picture]
+    audios = [s.get('index', -1) for s in info.streams_of('audio')]
+    if target_fmt in SINGLE_TRACK_FORMATS:
+        return videos[:1], audios[:1], []
+    subtitles = [
+        s.get('index', -1) for s in info.streams_of('subtitle')
+        if plan_stream(s, target_fmt, source_format).action != UNSUPPORTED
+    ]
+    return videos, audios, subtitles
+
+
+def _check_plans(plans, target_format):
+    for plan in plans:
+        if plan.action == UNSUPPORTED:
+            raise ValueError(f"{plan.source_codec or '未知'} 轨道无法放入 {target_format}，请取消选择")
+
+
+def _trim_input_args(trim):
+    # trim 为 (开始秒, 结束秒或 None)；-ss 放在每个 -i 前面，所有输入一起偏移，选中的轨道保持同步
+    if not trim or not trim[0]:
+        return []
+    return ['-ss', f'{trim[0]:.3f}']
+
+
+def _trim_output_args(trim):
+    if not trim:
+        return []
+    args = ['-t', f'{trim[1] - trim[0]:.3f}'] if trim[1] is not None else []
+    return args + ['-avoid_negative_ts', 'make_zero']
+
+
+@traced('plan', cat='plan')
+def build_single_remux_cmd(ffmpeg_path, input_file, output_file, info, v_idx, a_idx, target_format,
+                           trim=None, video_input=None):
+    # video_input: 替换视频轨道的输入参数（如智能剪切拼好的视频），已经剪切过，不再加 -ss
+    source_format = info.format.get('format_name', '')
+    plans = [plan_stream(info.stream(v_idx) or {'codec_type': 'video'}, target_format, source_format),
+             plan_stream(info.stream(a_idx) or {'codec_type': 'audio'}, target_format, source_format)]
+    _check_plans(plans, target_format)
+    cmd = [ffmpeg_path, '-y'] + _trim_input_args(trim) + ['-i', input_file]
+    if video_input:
+        cmd += video_input + ['-map', '1:v:0']
+    else:
+        cmd += ['-map', f'0:v:{info.subidx(v_idx, "video")}']
+    cmd += ['-map', f'0:a:{info.subidx(a_idx, "audio")}']
+    cmd += codec_args(plans)
+    cmd += _trim_output_args(trim)
+    cmd += [output_file]
+    return cmd
+
+
+@traced('plan', cat='plan')
+def build_multi_remux_cmd(ffmpeg_path, input_file, output_file, info, video_idxs, audio_idxs,
+                          subtitle_idxs, custom_subs, target_format, trim=None, video_input=None):
+    # custom_subs: [(path, codec)]，codec 为 text/pgs/vobsub
+    # video_input 只能替换一条视频轨道，放在所有输入的最后
+    if video_input and len(video_idxs) != 1:
+        raise ValueError("替换视频时只能选择一个视频轨道")
+    source_format = info.format.get('format_name', '')
+    stream_args = []
+    plans = []
+    for idx, typ, spec in ([(i, 'video', 'v') for i in video_idxs] + [(i, 'audio', 'a') for i in audio_idxs]
+                           + [(i, 'subtitle', 's') for i in subtitle_idxs]):
+        if typ == 'video' and video_input:
+            stream_args += ['-map', f'{len(custom_subs) + 1}:v:0']
+        else:
+            stream_args += ['-map', f'0:{spec}:{info.subidx(idx, typ)}']
+        plans.append(plan_stream(info.stream(idx) or {'codec_type': typ}, target_format, source_format))
+    input_files = [input_file] + [c[0] for c in custom_subs]
+    for i, (f, codec) in enumerate(custom_subs):
+        stream_args += ['-map', f'{i+1}:0']
+        plans.append(plan_codec('subtitle', codec, target_format))
+    _check_plans(plans, target_format)
+
+    cmd = [ffmpeg_path, '-y']
+    for f in input_files:
+        cmd += _trim_input_args(trim) + ['-i', f]
+    if video_input:
+        cmd += video_input
+    cmd += stream_args
+    cmd += codec_args(plans)
+    cmd += _trim_output_args(trim)
+    cmd += [output_file]
+    return cmd
+
+
+def build_remux_cmd(ffmpeg_path, input_file, output_file, info, video_idxs, audio_idxs, subtitle_idxs,
+                    target_format, trim=None, video_input=None):
+    # 按目标格式选择单轨道或多轨道打包；单轨道格式取第一条视频和音频
+    if target_format.lower() in SINGLE_TRACK_FORMATS:
+        if not video_idxs or not audio_idxs:
+            raise ValueError("需要一个视频轨道和一个音频轨道")
+        return build_single_remux_cmd(ffmpeg_path, input_file, output_file, info, video_idxs[0], audio_idxs[0],
+                                      target_format, trim, video_input)
+    return build_multi_remux_cmd(ffmpeg_path, input_file, output_file, info, video_idxs, audio_idxs,
+                                 subtitle_idxs, [], target_format, trim, video_input)
+
+
+@traced('plan', cat='plan')
+def build_multi_extract_cmd(ffmpeg_path, input_file, tracks, source_format=''):
+    # tracks: [(音轨序号, 输出文件, 源编码)]，一次读取输入，同时写出多个音轨
+    # 每条音轨单独判断：目标容器能直接放下源编码就复制，否则转码
+    # 增加分析参数，提升兼容性
+    cmd = [
+        ffmpeg_path, '-y', '-analyzeduration', '100M', '-probesize', '100M',
+        '-i', input_file,
+    ]
+    for track_index, output_file, src_codec in tracks:
+        ext = os.path.splitext(output_file)[1].lower().replace('.', '')
+        plan = plan_codec('audio', src_codec, ext, source_format)
+        cmd += ['-map', f'0:a:{track_index}', '-vn'] + plan.args(0) + [output_file]
+    return cmd
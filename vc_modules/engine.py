@@ -0,0 +1,427 @@
+import os
+import time
+import heapq
+import signal
+import asyncio
+import itertools
+import threading
+import subprocess
+
+from vc_modules import output_cache
+from vc_modules import probe as probe_module
+from vc_modules.batch import max_parallel_jobs
+from vc_modules.journal import JournaledJob
+from vc_modules.progress import Progress, new_process_group_kwargs, with_progress
+from vc_modules.scheduler import INTERACTIVE, BACKGROUND, Admission, default_priority, launch_args
+from vc_modules.stderr_log import StderrCapture, job_log_path
+from vc_modules.tracing import async_span, command_line
+
+# 异步任务引擎：一个后台线程运行 asyncio 事件循环，ffprobe/ffmpeg 都用 asyncio.create_subprocess_exec 启动，
+# 几百个探测和任务同时排队也只占这一个线程。并发数按资源分类限制：
+#   probe  探测，进程很轻，可以同时开很多
+#   encode 转码，吃 CPU，默认按核心数
+#   io     重新打包、提取音轨，主要是磁盘读写，同时开多了反而互相拖慢
+# submit() 返回 concurrent.futures.Future，界面（engine_qt 把结果转成 Qt 信号）和命令行用同一套接口；
+# Future.cancel() 会结束对应的 ffmpeg 进程组，未完成的临时文件由任务日志删除。
+# 各类名额可以用 CONVERTER_PROBE_SLOTS / CONVERTER_ENCODE_SLOTS / CONVERTER_IO_SLOTS 覆盖。
+# 名额按优先级分配，前台任务可以暂停后台任务，后台任务的启动受准入控制（见 scheduler.py）。
+
+PROBE = 'probe'
+ENCODE = 'encode'
+IO = 'io'
+
+DEFAULT_PROBE_SLOTS = 16
+DEFAULT_IO_SLOTS = 2
+TERMINATE_TIMEOUT = 5
+CAN_SUSPEND = os.name == 'posix' and hasattr(signal, 'SIGSTOP')
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def default_limits():
+    limits = {PROBE: DEFAULT_PROBE_SLOTS, ENCODE: max_parallel_jobs(max(1, (os.cpu_count() or 1) // 4)),
+              IO: DEFAULT_IO_SLOTS}
+    for name in limits:
+        try:
+            value = int(os.environ.get(f'CONVERTER_{name.upper()}_SLOTS', 0))
+        except ValueError:
+            value = 0
+        if value > 0:
+            limits[name] = value
+    return limits
+
+
+class Lease:
+    # 一个任务占用的名额；attach() 记下 ffmpeg 进程后，后台任务可以被暂停让出名额
+    __slots__ = ('slot', 'priority', 'proc', 'suspended')
+
+    def __init__(self, slot, priority):
+        self.slot = slot
+        self.priority = priority
+        self.proc = None
+        self.suspended = False
+
+    def attach(self, proc):
+        self.proc = proc
+        self.slot._preempt()
+
+    def _signal(self, sig):
+        try:
+            os.killpg(self.proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def suspend(self):
+        self._signal(signal.SIGSTOP)
+        self.suspended = True
+
+    def resume(self):
+        self._signal(signal.SIGCONT)
+        self.suspended = False
+
+
+class _LeaseContext:
+    def __init__(self, slot, priority):
+        self.slot = slot
+        self.priority = priority
+        self.lease = None
+
+    async def __aenter__(self):
+        self.lease = await self.slot.acquire(self.priority)
+        return self.lease
+
+    async def __aexit__(self, *exc):
+        self.slot.release(self.lease)
+        return False
+
+
+class Slot:
+    # 按优先级分配的名额，带计数供界面和命令行显示排队情况。
+    # 前台任务等待时，暂停一个正在运行的后台 ffmpeg（不计入名额），前台任务结束后再继续
+    def __init__(self, limit):
+        self.limit = limit
+        self._holders = []
+        self._waiters = []  # 堆：(优先级, 序号, Future, Lease)
+        self._seq = itertools.count()
+
+    @property
+    def active(self):
+        return sum(1 for lease in self._holders if not lease.suspended)
+
+    @property
+    def suspended(self):
+        return sum(1 for lease in self._holders if lease.suspended)
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def lease(self, priority=INTERACTIVE):
+        return _LeaseContext(self, priority)
+
+    async def acquire(self, priority=INTERACTIVE):
+        lease = Lease(self, priority)
+        if not self._waiters and self.active < self.limit:
+            self._holders.append(lease)
+            return lease
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, lease))
+        self._preempt()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(lease)  # 已经分到名额时才被取消
+            else:
+                self._waiters = [w for w in self._waiters if w[3] is not lease]
+                heapq.heapify(self._waiters)
+            raise
+        return lease
+
+    def release(self, lease):
+        if lease in self._holders:
+            self._holders.remove(lease)
+        if lease.suspended:
+            lease.resume()  # 被取消时也要先让进程继续，才能响应 SIGTERM
+        self._dispatch()
+
+    def _preempt(self):
+        # 排在最前面的是前台任务且没有空名额时，暂停一个后台任务
+        if not CAN_SUSPEND:
+            return
+        while self._waiters and self.active >= self.limit:
+            priority = self._waiters[0][0]
+            victims = [lease for lease in self._holders
+                       if lease.priority > priority and lease.proc is not None and not lease.suspended
+                       and lease.proc.returncode is None]
+            if not victims:
+                break
+            victims[-1].suspend()  # 最后启动的最先让出
+            self._dispatch()
+
+    def _dispatch(self):
+        # 有空名额时，优先级高的等待者先分配；同优先级里被暂停的任务先继续
+        while self.active < self.limit:
+            suspended = [lease for lease in self._holders if lease.suspended]
+            waiter = self._waiters[0] if self._waiters else None
+            if suspended and (waiter is None or suspended[0].priority <= waiter[0]):
+                suspended[0].resume()
+                continue
+            if waiter is None:
+                break
+            heapq.heappop(self._waiters)
+            _, _, future, lease = waiter
+            if future.done():
+                continue
+            self._holders.append(lease)
+            future.set_result(None)
+
+
+async def _drain_stderr(stream, capture):
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        capture.feed(chunk)
+    capture.close()
+
+
+async def _terminate(proc, timeout=TERMINATE_TIMEOUT):
+    # 先 SIGTERM 整个进程组让 ffmpeg 正常收尾，超时再强制结束
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGTERM)
+            if CAN_SUSPEND:
+                os.killpg(proc.pid, signal.SIGCONT)  # 被暂停的后台任务要继续运行才能处理 SIGTERM
+        else:
+            proc.terminate()
+        await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+        await proc.wait()
+    except ProcessLookupError:
+        pass
+
+
+class Engine:
+    def __init__(self, **limits):
+        self.limits = default_limits()
+        self.limits.update({name: value for name, value in limits.items() if value})
+        self.slots = {}
+        self.admission = Admission()
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        return self.start()._loop
+
+    def start(self):
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name='engine', daemon=True)
+                self._thread.start()
+                ready.wait()
+        return self
+
+    def _run(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.slots = {name: Slot(limit) for name, limit in self.limits.items()}
+        self._loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+            # 停止时取消还没完成的任务，让它们结束子进程、删除临时文件
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+
+    def submit(self, coro):
+        # 可以在任何线程调用，返回 concurrent.futures.Future
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def submit_probe(self, path):
+        return self.submit(self.probe(path))
+
+    def submit_job(self, kind, cmd, output_file, **kwargs):
+        return self.submit(self.run_job(kind, cmd, output_file, **kwargs))
+
+    def stats(self):
+        stats = {name: {'limit': slot.limit, 'active': slot.active, 'waiting': slot.waiting,
+                        'suspended': slot.suspended}
+                 for name, slot in self.slots.items()}
+        stats['admission'] = self.admission.stats()
+        return stats
+
+    async def run_blocking(self, func, *args, slot=None, priority=INTERACTIVE):
+        # 没有异步版本的阻塞函数放到线程池里运行，slot 不为空时先占名额（线程里的进程不能被暂停）
+        loop = asyncio.get_running_loop()
+        if slot is None:
+            return await loop.run_in_executor(None, func, *args)
+        async with self.slots[slot].lease(priority):
+            return await loop.run_in_executor(None, func, *args)
+
+    async def run_process(self, cmd, slot=PROBE, span_name='process', **span_args):
+        # 运行一个输出不多的短进程（ffprobe、截图等），返回 (退出码, stdout, stderr)；被取消时直接杀掉
+        async with self.slots[slot].lease():
+            with async_span(span_name, cat='process', cmd=command_line(cmd), **span_args) as s:
+                proc = await asyncio.create_subprocess_exec(*cmd, stdin=subprocess.DEVNULL,
+                                                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                try:
+                    out, err = await proc.communicate()
+                finally:
+                    if proc.returncode is None:
+                        proc.kill()
+                        await proc.wait()
+                s['returncode'] = proc.returncode
+        return proc.returncode, out, err
+
+    async def probe(self, path):
+        # 和 probe.probe() 共用内存缓存、媒体库索引和统计
+        start = time.perf_counter()
+        result, _, key, st = await self.run_blocking(probe_module.lookup, path)
+        if result is not None:
+            return result
+        cmd = probe_module.ffprobe_cmd(key[0])
+        returncode, out, err = await self.run_process(cmd, slot=PROBE, span_name='ffprobe', file=key[0])
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd, out, err)
+        info = probe_module.parse_ffprobe_output(key[0], out)
+        return await self.run_blocking(probe_module.remember, key, st, info, (time.perf_counter() - start) * 1000)
+
+    async def duration(self, input_file):
+        try:
+            return float((await self.probe(input_file)).format.get('duration', 0)) or None
+        except Exception:
+            return None
+
+    async def run_ffmpeg(self, cmd, duration=None, on_progress=None, interval=0.5, log_path=None, lease=None):
+        # 与 progress.run_ffmpeg_with_progress 相同：返回 (退出码, StderrCapture)，on_progress 最多每 interval 秒回调一次。
+        # lease 为占用的名额：后台任务降低优先级启动，进程记在名额上以便被前台任务暂停
+        input_file = cmd[cmd.index('-i') + 1] if '-i' in cmd[:-1] else ''
+        priority = lease.priority if lease is not None else INTERACTIVE
+        with async_span('ffmpeg', cat='process', file=input_file, cmd=command_line(cmd), priority=priority) as s:
+            launch_cmd, kwargs = launch_args(with_progress(cmd), new_process_group_kwargs(), priority)
+            proc = await asyncio.create_subprocess_exec(*launch_cmd, stdin=subprocess.DEVNULL,
+                                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+            if lease is not None:
+                lease.attach(proc)
+            capture = StderrCapture(log_path)
+            drain = asyncio.ensure_future(_drain_stderr(proc.stderr, capture))
+            progress = Progress(duration)
+            last_emit = 0.0
+            try:
+                async for raw in proc.stdout:
+                    key, sep, value = raw.decode(errors='ignore').strip().partition('=')
+                    if not sep or not progress.update(key, value):
+                        continue
+                    now = time.monotonic()
+                    if on_progress is not None and (progress.done or now - last_emit >= interval):
+                        last_emit = now
+                        on_progress(progress)
+                await proc.wait()
+            finally:
+                if proc.returncode is None:
+                    await _terminate(proc)
+                await drain
+            s['returncode'] = proc.returncode
+            s['stderr_lines'] = capture.total_lines
+        return proc.returncode, capture
+
+    async def run_job(self, kind, cmd, output_file, input_file=None, slot=ENCODE, duration=None, on_progress=None,
+                      interval=0.5, single_output=True, use_cache=True, log_path=None, params=None, job_id=None,
+                      priority=None, extra_outputs=()):
+        # 返回 (成功, 输出文件或错误信息, StderrCapture)；StderrCapture 为 None 表示直接用了输出缓存。
+        # 单输出的任务先查输出缓存，再记入任务日志，ffmpeg 写临时文件，成功后才改名；
+        # 被取消时结束 ffmpeg、删除临时文件后抛出 CancelledError。
+        # priority 默认取 CONVERTER_PRIORITY；后台任务先经过准入控制再排队等名额。
+        # extra_outputs 为同一条命令写出的其他文件（一次解码多种输出），各自查缓存，全部命中才跳过
+        if priority is None:
+            priority = default_priority()
+        if input_file is None:
+            inputs = output_cache.input_files(cmd)
+            input_file = inputs[0] if inputs else ''
+        outputs = [output_file] + list(extra_outputs)
+        keys = []
+        if single_output and use_cache:
+            keys = [await self.run_blocking(output_cache.cache_key, cmd, o, outputs) for o in outputs]
+            if await self.run_blocking(output_cache.fetch_all, keys, outputs):
+                return True, output_file, None
+        if duration is None and input_file:
+            duration = await self.duration(input_file)
+        if log_path is None:
+            log_path = job_log_path(output_file)
+        journal = (JournaledJob(kind, cmd, output_file, params, job_id=job_id, extra_outputs=extra_outputs)
+                   if single_output else None)
+        if journal is not None:
+            cmd = journal.cmd
+        admitted = False
+        try:
+            if priority == BACKGROUND:
+                await self.admission.wait()
+                admitted = True
+            async with self.slots[slot].lease(priority) as lease:
+                if journal is not None:
+                    journal.running()
+                returncode, stderr = await self.run_ffmpeg(cmd, duration, on_progress, interval, log_path, lease)
+        except asyncio.CancelledError:
+            if journal is not None:
+                journal.finish(False, cancelled=True)
+            raise
+        except Exception as e:
+            if journal is not None:
+                journal.finish(False, error=str(e))
+            raise
+        finally:
+            if admitted:
+                self.admission.done()
+        error = '' if returncode == 0 else stderr.summary()
+        if journal is not None:
+            ok, error = journal.finish(returncode == 0, error=error)
+        else:
+            ok = returncode == 0
+        if not ok:
+            return False, error, stderr
+        for key, o in zip(keys, outputs):
+            if key is not None:
+                await self.run_blocking(output_cache.store, key, o)
+        return True, output_file, stderr
+
+
+def stop_engine():
+    # 程序退出时调用：取消还没完成的任务，结束 ffmpeg（暂停的后台任务先恢复）、删除临时文件并记入任务日志。
+    # ffmpeg 在单独的进程组里运行，不停止引擎的话退出后会继续运行；引擎没启动过时什么也不做
+    with _engine_lock:
+        engine = _engine
+    if engine is not None:
+        engine.stop()
+
+
+def get_engine(**limits):
+    # 第一次调用时按 limits 创建并启动；之后的调用忽略 limits
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = Engine(**limits)
+        return _engine.start()
@@ -0,0 +1,235 @@
+import time
+import asyncio
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from vc_modules.engine import ENCODE, get_engine
+from vc_modules.media_index import list_media
+from vc_modules.progress import format_progress
+from vc_modules.thumbnails import video_strip
+from vc_modules.trim import run_trim
+
+# 把引擎里的协程包装成界面熟悉的接口：start()/cancel()/wait() 加 finished、progress 信号。
+# 信号在引擎线程里发出，Qt 自动排队到界面线程执行槽函数。
+
+
+class EngineTask(QObject):
+    finished = pyqtSignal(bool, str)
+    progress = pyqtSignal(float, str)
+
+    def __init__(self, output_file=''):
+        super().__init__()
+        self.output_file = output_file
+        self.cancelled = False
+        self.future = None
+        self._stopped = threading.Event()
+
+    async def run(self):
+        # 子类实现，返回 (成功, 信息)
+        raise NotImplementedError
+
+    async def _main(self):
+        try:
+            ok, info = await self.run()
+        except asyncio.CancelledError:
+            self._stopped.set()
+            self.finished.emit(False, "已取消")
+            raise
+        except Exception as e:
+            ok, info = False, str(e)
+        self._stopped.set()
+        self.finished.emit(ok, info)
+
+    def start(self):
+        self.future = get_engine().submit(self._main())
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def isRunning(self):
+        return self.future is not None and not self._stopped.is_set()
+
+    def wait(self, timeout=None):
+        # Future 取消后立即算完成，这里等协程真正结束（ffmpeg 已退出、临时文件已删除）
+        if self.future is None:
+            return True
+        return self._stopped.wait(timeout)
+
+    def report(self, p):
+        self.progress.emit(p.percent, format_progress(p))
+
+
+class JobTask(EngineTask):
+    # 一个 ffmpeg 任务，占用 slot 类的名额运行；priority 为 None 时取默认优先级
+    def __init__(self, kind, cmd, output_file, duration=None, slot=ENCODE, priority=None):
+        super().__init__(output_file)
+        self.kind = kind
+        self.cmd = cmd
+        self.duration = duration
+        self.slot = slot
+        self.priority = priority
+
+    async def run(self):
+        ok, info, stderr = await get_engine().run_job(self.kind, self.cmd, self.output_file, slot=self.slot,
+                                                      duration=self.duration, on_progress=self.report,
+                                                      priority=self.priority)
+        if ok and stderr is None:
+            self.progress.emit(100.0, "已使用缓存的结果")
+        return ok, info
+
+
+class TrimTask(EngineTask):
+    # 剪切打包，build_cmd(trim, video_input) 由窗口按选中的轨道生成命令
+    def __init__(self, info, output_file, build_cmd, target_format, video_idx, start, end, mode):
+        super().__init__(output_file)
+        self.info = info
+        self.build_cmd = build_cmd
+        self.target_format = target_format
+        self.video_idx = video_idx
+        self.start_time = start
+        self.end_time = end
+        self.mode = mode
+
+    async def run(self):
+        return await run_trim(get_engine(), self.info, self.output_file, self.build_cmd, self.target_format,
+                              self.video_idx, self.start_time, self.end_time, self.mode,
+                              on_progress=self.report, on_status=lambda text: self.progress.emit(-1.0, text))
+
+
+def probe_error_text(e):
+    err_msg = str(e)
+    if hasattr(e, 'stderr') and e.stderr:
+        err_msg += f"\nffprobe stderr:\n{e.stderr.decode(errors='ignore') if hasattr(e.stderr, 'decode') else str(e.stderr)}"
+    return err_msg
+
+
+class ProbeTask(QObject):
+    # 在引擎里探测，避免 ffprobe 卡住界面；被取消的探测不发任何信号
+    probed = pyqtSignal(int, object, float)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, generation, input_file):
+        super().__init__()
+        self.generation = generation
+        self.input_file = input_file
+        self.future = None
+        self._stopped = threading.Event()
+
+    async def _main(self):
+        start = time.perf_counter()
+        try:
+            info = await get_engine().probe(self.input_file)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed.emit(self.generation, probe_error_text(e))
+            return
+        finally:
+            self._stopped.set()
+        self.probed.emit(self.generation, info, (time.perf_counter() - start) * 1000)
+
+    def start(self):
+        self.future = get_engine().submit(self._main())
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+
+    def isRunning(self):
+        return self.future is not None and not self._stopped.is_set()
+
+
+class BulkProbeTask(QObject):
+    # 批量导入：先在线程池里展开文件夹，再把所有文件交给引擎探测（同时运行的 ffprobe 受 probe 名额限制），
+    # 每个文件探测完立即发出结果，界面边探测边显示
+    listed = pyqtSignal(object)          # [文件路径]
+    probed = pyqtSignal(str, object)     # 路径, ProbeResult
+    failed = pyqtSignal(str, str)        # 路径, 错误信息
+    done = pyqtSignal(int, int, float)   # 成功数, 失败数, 耗时（秒）
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = list(paths)
+        self.future = None
+        self._stopped = threading.Event()
+
+    async def _probe_one(self, path):
+        try:
+            return path, await get_engine().probe(path), None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return path, None, probe_error_text(e)
+
+    async def _main(self):
+        start = time.perf_counter()
+        engine = get_engine()
+        tasks = []
+        try:
+            files = await engine.run_blocking(list_media, self.paths)
+            self.listed.emit(files)
+            tasks = [asyncio.ensure_future(self._probe_one(path)) for path in files]
+            ok = bad = 0
+            for next_done in asyncio.as_completed(tasks):
+                path, info, error = await next_done
+                if info is not None:
+                    ok += 1
+                    info.records()  # 轨道显示文字在引擎线程里先算好，界面线程只追加
+                    self.probed.emit(path, info)
+                else:
+                    bad += 1
+                    self.failed.emit(path, error)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._stopped.set()
+        self.done.emit(ok, bad, time.perf_counter() - start)
+
+    def start(self):
+        self.future = get_engine().submit(self._main())
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+
+    def isRunning(self):
+        return self.future is not None and not self._stopped.is_set()
+
+
+class ThumbnailTask(QObject):
+    # 为一个文件的各条视频轨道生成预览条，每条轨道完成后立即发出
+    ready = pyqtSignal(int, object)   # 流序号, [jpg 数据]
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, info, stream_indexes):
+        super().__init__()
+        self.info = info
+        self.stream_indexes = list(stream_indexes)
+        self.future = None
+        self._stopped = threading.Event()
+
+    async def _strip(self, stream_index):
+        try:
+            self.ready.emit(stream_index, await video_strip(get_engine(), self.info, stream_index))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed.emit(stream_index, str(e))
+
+    async def _main(self):
+        try:
+            await asyncio.gather(*(self._strip(idx) for idx in self.stream_indexes))
+        finally:
+            self._stopped.set()
+
+    def start(self):
+        self.future = get_engine().submit(self._main())
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+
+    def isRunning(self):
+        return self.future is not None and not self._stopped.is_set()
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import uuid
+import threading
+
+from vc_modules.progress import media_duration, run_ffmpeg_with_progress
+from vc_modules.stderr_log import job_log_path
+
+# 任务日志（预写日志）：每个转换/打包任务开始前先记一条 queued，运行时 running，结束时 done/failed/cancelled，
+# 每条记录写入后立即 fsync。ffmpeg 总是写到同目录下的临时文件，成功后再原子改名为最终文件名，
+# 所以任何时候崩溃都不会留下看起来完整、实际只写了一半的输出。
+# 重启后 recover() 删除已经没有进程在写的临时文件，unfinished() 给出需要继续的任务。
+# 日志默认在 ~/.converter/journal.jsonl，CONVERTER_JOURNAL 可改路径或设为 off 关闭记录（临时文件+改名照常）。
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+UNFINISHED = (QUEUED, RUNNING)
+
+COMPACT_BYTES = 1024 * 1024
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def temp_output_path(output_file):
+    # 保留扩展名，ffmpeg 按扩展名选择封装格式；以点开头，文件管理器里默认隐藏
+    directory, name = os.path.split(output_file)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{stem}.partial{ext}")
+
+
+def temp_command(cmd, output_file):
+    # 把命令里的输出文件换成临时文件
+    tmp = temp_output_path(output_file)
+    return [tmp if arg == output_file else arg for arg in cmd], tmp
+
+
+def _temp_files(job):
+    return [job.get('tmp')] + [temp_output_path(o) for o in job.get('extra_outputs', [])]
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record(self, job_id, state, **fields):
+        fields.update({'id': job_id, 'state': state, 'ts': time.time()})
+        self._append(fields)
+
+    def replay(self):
+        # 每个任务取最后一条记录，字段按顺序合并
+        jobs = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 崩溃时写了一半的最后一行
+                    jobs.setdefault(record['id'], {}).update(record)
+        except OSError:
+            pass
+        return jobs
+
+    def unfinished(self, kinds=None):
+        return [job for job in self.replay().values()
+                if job['state'] in UNFINISHED and (kinds is None or job.get('kind') in kinds)]
+
+    def recover(self, kinds=None):
+        # 删除写了一半的临时文件（写它的进程已经不在了），返回未完成的任务。
+        # 同一个临时文件正被另一个还在运行的任务写时不删（如重启后的 watch 用新任务号重新处理同一个文件）
+        unfinished = []
+        jobs = self.unfinished()
+        live = {tmp for job in jobs if _pid_alive(job.get('pid', 0)) for tmp in _temp_files(job)}
+        for job in jobs:
+            if _pid_alive(job.get('pid', 0)) or (kinds is not None and job.get('kind') not in kinds):
+                continue
+            for tmp in _temp_files(job):
+                if tmp and tmp not in live and os.path.exists(tmp):
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+            unfinished.append(job)
+        self.compact()
+        return unfinished
+
+    def compact(self):
+        # 只保留未完成的任务，避免日志无限增长
+        try:
+            if os.path.getsize(self.path) < COMPACT_BYTES:
+                return
+        except OSError:
+            return
+        with self._lock:
+            jobs = self.replay()
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for job in jobs.values():
+                    if job['state'] in UNFINISHED:
+                        f.write(json.dumps(job, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def forget(self, job_id):
+        # 用户放弃继续的任务
+        self.record(job_id, CANCELLED)
+
+    def discard(self, kinds):
+        # 清理并关闭上次没有完成的某类任务，不再继续（监视文件夹重启后会重新处理这些文件）
+        jobs = self.recover(kinds)
+        for job in jobs:
+            self.forget(job['id'])
+        return jobs
+
+
+def get_journal():
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            path = os.environ.get('CONVERTER_JOURNAL')
+            if path and path.lower() == 'off':
+                _journal = False
+            else:
+                path = path or os.path.join(os.path.expanduser('~'), '.converter', 'journal.jsonl')
+                try:
+                    _journal = Journal(path)
+                except OSError:
+                    _journal = False
+        return _journal or None
+
+
+class JournaledJob:
+    """一个写输出文件的任务：cmd 写临时文件，finish() 成功时改名，失败或取消时删除临时文件。
+    extra_outputs 为同一条命令同时写出的其他文件，和 output_file 一起改名或删除。"""
+
+    def __init__(self, kind, cmd, output_file, params=None, job_id=None, extra_outputs=()):
+        self.kind = kind
+        self.output_file = output_file
+        self.cmd, self.tmp = temp_command(cmd, output_file)
+        self.extra = []  # [(临时文件, 输出文件)]
+        for extra in extra_outputs:
+            self.cmd, tmp = temp_command(self.cmd, extra)
+            self.extra.append((tmp, extra))
+        self.id = job_id or uuid.uuid4().hex
+        self.journal = get_journal()
+        fields = {'extra_outputs': list(extra_outputs)} if extra_outputs else {}
+        self._write(QUEUED, kind=kind, cmd=cmd, output=output_file, tmp=self.tmp, params=params or {}, **fields)
+
+    def _write(self, state, **fields):
+        if self.journal is None:
+            return
+        try:
+            self.journal.record(self.id, state, pid=os.getpid(), **fields)
+        except OSError:
+            pass  # 日志写不了不影响任务本身
+
+    def running(self):
+        self._write(RUNNING)
+
+    def finish(self, ok, cancelled=False, error=''):
+        files = self.extra + [(self.tmp, self.output_file)]
+        if ok:
+            try:
+                for tmp, output_file in files:
+                    os.replace(tmp, output_file)
+            except OSError as e:
+                ok, error = False, f"重命名输出文件失败：{e}"
+        if not ok:
+            for tmp, _ in files:
+                if os.path.exists(tmp):
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+        if ok:
+            self._write(DONE)
+        else:
+            self._write(CANCELLED if cancelled else FAILED, error=error[-500:])
+        return ok, error
+
+    def skip(self):
+        # 没有运行 ffmpeg 就完成了（如命中输出缓存）
+        self._write(DONE)
+
+
+def resume_job(job, on_progress=None, interval=1.0):
+    # 按记录的命令重新运行一个未完成的任务，返回 (成功, 信息)
+    journaled = JournaledJob(job['kind'], job['cmd'], job['output'], job.get('params'), job_id=job['id'],
+                             extra_outputs=job.get('extra_outputs', ()))
+    journaled.running()
+    inputs = [job['cmd'][i + 1] for i, arg in enumerate(job['cmd'][:-1]) if arg == '-i']
+    try:
+        returncode, stderr = run_ffmpeg_with_progress(journaled.cmd, media_duration(inputs[0]) if inputs else None,
+                                                      on_progress, interval=interval,
+                                                      log_path=job_log_path(job['output']))
+    except Exception as e:
+        return journaled.finish(False, error=str(e))
+    ok, error = journaled.finish(returncode == 0, error='' if returncode == 0 else stderr.summary())
+    return ok, job['output'] if ok else error
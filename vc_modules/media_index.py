@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 媒体库索引：把探测结果存进 SQLite，按 (路径, inode, 大小, 修改时间) 判断是否需要重新探测
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    bit_rate INTEGER,
+    width INTEGER,
+    height INTEGER,
+    pix_fmt TEXT,
+    color_depth TEXT,
+    probe_json TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+)
+'''
+
+
+def list_media(paths):
+    # 展开文件和文件夹（包括子文件夹），只保留视频文件；以点开头的隐藏文件和文件夹
+    # （如未完成的临时输出、分段转码和剪切的临时目录）跳过
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for name in sorted(names):
+                    if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS and not name.startswith('.'):
+                        files.append(os.path.join(root, name))
+        elif os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+
+def default_index_path():
+    path = os.environ.get('CONVERTER_INDEX')
+    if path:
+        return path
+    return os.path.join(os.path.expanduser('~'), '.converter', 'media_index.sqlite3')
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MediaIndex:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_index_path()
+        parent = os.path.dirname(self.db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, path, st=None):
+        path = os.path.abspath(path)
+        if st is None:
+            st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT inode, size, mtime_ns, probe_json FROM media WHERE path = ?', (path,)
+            ).fetchone()
+        if row is None or tuple(row[:3]) != (st.st_ino, st.st_size, st.st_mtime_ns):
+            return None
+        return json.loads(row[3])
+
+    def store(self, path, st, info, summary):
+        path = os.path.abspath(path)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    path, st.st_ino, st.st_size, st.st_mtime_ns,
+                    _to_float(summary.get('duration')), _to_int(summary.get('bit_rate')),
+                    _to_int(summary.get('width')), _to_int(summary.get('height')),
+                    summary.get('pix_fmt') or None, summary.get('color_depth') or None,
+                    json.dumps(info, ensure_ascii=False), time.time(),
+                )
+            )
+            self._conn.commit()
+
+    def remove(self, paths):
+        with self._lock:
+            self._conn.executemany('DELETE FROM media WHERE path = ?', [(p,) for p in paths])
+            self._conn.commit()
+
+    def _rows_under(self, folder):
+        prefix = os.path.join(folder, '')
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, inode, size, mtime_ns FROM media WHERE substr(path, 1, ?) = ?',
+                (len(prefix), prefix)
+            ).fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def rescan(self, folder, workers=8, progress=None, cancel_event=None):
+        # 增量扫描：只重新探测新增或有变化的文件，并行执行
+        from vc_modules.probe import ProbeResult, run_ffprobe
+
+        folder = os.path.abspath(folder)
+        known = self._rows_under(folder)
+        changed = []
+        seen = set()
+        # 和导入用同样的规则展开文件夹，隐藏的临时输出不进索引
+        for path in list_media([folder]):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen.add(path)
+            if known.get(path) != (st.st_ino, st.st_size, st.st_mtime_ns):
+                changed.append((path, st))
+
+        removed = [p for p in known if p not in seen]
+        if removed:
+            self.remove(removed)
+
+        failed = []
+        done = 0
+
+        def probe_one(path, st):
+            info = run_ffprobe(path, cancel_event)
+            self.store(path, st, info, ProbeResult(path, info).summary())
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(probe_one, path, st): path for path, st in changed}
+            for future in as_completed(futures):
+                done += 1
+                try:
+                    future.result()
+                except Exception:
+                    failed.append(futures[future])
+                if progress is not None:
+                    progress(done, len(changed))
+        return {'scanned': len(seen), 'probed': len(changed) - len(failed),
+                'failed': failed, 'removed': len(removed)}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    # 设置 CONVERTER_INDEX=off 可关闭索引；数据库打不开时也退回直接探测
+    global _index
+    if os.environ.get('CONVERTER_INDEX', '').lower() == 'off':
+        return None
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = MediaIndex()
+            except (OSError, sqlite3.Error):
+                _index = False
+        return _index or None
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='扫描文件夹并更新媒体库索引')
+    parser.add_argument('folders', nargs='+')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+    index = MediaIndex(args.db)
+    for folder in args.folders:
+        start = time.perf_counter()
+        stats = index.rescan(folder, workers=args.workers)
+        print(f"{folder}: 共 {stats['scanned']} 个文件，探测 {stats['probed']} 个，"
+              f"失败 {len(stats['failed'])} 个，移除 {stats['removed']} 条，"
+              f"耗时 {time.perf_counter() - start:.1f}s")
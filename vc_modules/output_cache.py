@@ -0,0 +1,239 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+# 输出结果缓存：按输入文件的内容指纹和 ffmpeg 命令的规范化哈希查找，
+# 同样的输入用同样的参数再转一次时，直接把上次的结果硬链接（跨分区时复制）过去，不再编码。
+# 存入缓存只用硬链接：输出和缓存目录不在同一个分区时不缓存，免得每个几 GB 的结果都在用户目录里再复制一份。
+# 条目和用户的输出是同一个文件，外部工具原地改了输出（写标签等）条目也跟着变，所以存入时在旁边的 .json
+# 记下大小、修改时间和指纹，取用前核对，对不上就丢掉；最近使用时间也记在 .json 上，不去改共用文件的时间。
+# 指纹只读文件大小和开头、中间、结尾三块数据，几 GB 的文件也只需要几毫秒。
+# 缓存目录默认 ~/.converter/output_cache，CONVERTER_OUTPUT_CACHE 可改路径或设为 off 关闭；
+# 总大小超过上限时按最近使用时间淘汰。
+
+SAMPLE_BYTES = 1024 * 1024
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def fingerprint(path, sample=SAMPLE_BYTES):
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str(size).encode())
+    with open(path, 'rb') as f:
+        offsets = [0] if size <= sample * 3 else [0, size // 2 - sample // 2, size - sample]
+        for offset in offsets:
+            f.seek(offset)
+            h.update(f.read(sample if size > sample * 3 else size))
+    return h.hexdigest()
+
+
+def input_files(cmd):
+    return [cmd[i + 1] for i, arg in enumerate(cmd[:-1]) if arg == '-i']
+
+
+def plan_hash(cmd, output_file, outputs=None):
+    # 去掉 ffmpeg 路径和 -y，输入输出路径换成占位符，只保留影响输出内容的部分。
+    # outputs 为同一条命令写出的全部文件（一次解码多种输出）：每个都换成按序号的占位符，
+    # 再记下 output_file 是第几个，其他输出放在哪里不影响哈希
+    inputs = input_files(cmd)
+    outputs = list(outputs or [output_file])
+    canonical = []
+    for arg in cmd[1:]:
+        if arg == '-y':
+            continue
+        if arg in inputs:
+            canonical.append(f'<in{inputs.index(arg)}>')
+        elif arg in outputs:
+            ext = os.path.splitext(arg)[1].lower()
+            canonical.append(f'<out{outputs.index(arg)}>{ext}' if len(outputs) > 1 else f'<out>{ext}')
+        else:
+            canonical.append(arg)
+    if len(outputs) > 1:
+        canonical.append(f'<this>{outputs.index(output_file)}')
+    return hashlib.blake2b(json.dumps(canonical).encode(), digest_size=20).hexdigest()
+
+
+class OutputCache:
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, cmd, output_file, outputs=None):
+        parts = [fingerprint(f) for f in input_files(cmd)] + [plan_hash(cmd, output_file, outputs)]
+        return hashlib.blake2b('|'.join(parts).encode(), digest_size=20).hexdigest()
+
+    def _entry(self, key, output_file):
+        return os.path.join(self.root, key + os.path.splitext(output_file)[1].lower())
+
+    def _valid(self, entry):
+        # 条目存在且存入后没有被改过；被改过或没有 .json 的条目删掉
+        if not os.path.exists(entry):
+            return False
+        try:
+            with open(entry + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            st = os.stat(entry)
+            if [st.st_size, st.st_mtime_ns] == [meta['size'], meta['mtime_ns']] and \
+                    fingerprint(entry) == meta['fingerprint']:
+                return True
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        self._remove(entry)
+        return False
+
+    def _remove(self, entry):
+        for path in (entry, entry + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def has(self, key, output_file):
+        return self._valid(self._entry(key, output_file))
+
+    def fetch(self, key, output_file):
+        # 命中时把缓存的结果放到 output_file，返回 True
+        entry = self._entry(key, output_file)
+        if not self._valid(entry):
+            return False
+        tmp = output_file + '.cache_tmp'
+        try:
+            # 输出已经是这个条目的硬链接时不用再放一次（同一文件的两个硬链接之间 rename 不会生效）
+            if not (os.path.exists(output_file) and os.path.samefile(entry, output_file)):
+                _link_or_copy(entry, tmp)
+                os.replace(tmp, output_file)
+            os.utime(entry + '.json')  # 更新最近使用时间，供 LRU 淘汰
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        return True
+
+    def store(self, key, output_file):
+        try:
+            size = os.path.getsize(output_file)
+        except OSError:
+            return
+        if size == 0 or size > self.max_bytes:
+            return
+        entry = self._entry(key, output_file)
+        tmp = entry + '.tmp'
+        try:
+            if os.path.exists(entry) and os.path.samefile(entry, output_file):
+                return
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            os.link(output_file, tmp)
+            st = os.stat(tmp)
+            meta = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'fingerprint': fingerprint(tmp)}
+            with open(tmp + '.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp + '.json', entry + '.json')
+            os.replace(tmp, entry)
+        except OSError:
+            if os.path.exists(tmp + '.json'):
+                os.remove(tmp + '.json')
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def entries(self):
+        # 最近使用时间取 .json 的修改时间，没有 .json 的条目（旧版本存的）排在最前面先淘汰
+        result = []
+        for name in os.listdir(self.root):
+            if name.endswith(('.tmp', '.json')):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                continue
+            try:
+                used = os.stat(path + '.json').st_mtime
+            except OSError:
+                used = 0.0
+            result.append((used, size, path))
+        return result
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+
+def _link_or_copy(src, dst):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def get_output_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            root = os.environ.get('CONVERTER_OUTPUT_CACHE')
+            if root and root.lower() == 'off':
+                _cache = False
+            else:
+                root = root or os.path.join(os.path.expanduser('~'), '.converter', 'output_cache')
+                try:
+                    max_bytes = int(float(os.environ.get('CONVERTER_OUTPUT_CACHE_MAX_GB', 0)) * 1024 ** 3)
+                except ValueError:
+                    max_bytes = 0
+                try:
+                    _cache = OutputCache(root, max_bytes or DEFAULT_MAX_BYTES)
+                except OSError:
+                    _cache = False
+        return _cache or None
+
+
+def cache_key(cmd, output_file, outputs=None):
+    # 缓存关闭或输入读不了时返回 None，调用方照常运行 ffmpeg
+    cache = get_output_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.key(cmd, output_file, outputs)
+    except OSError:
+        return None
+
+
+def fetch(key, output_file):
+    cache = get_output_cache()
+    return key is not None and cache is not None and cache.fetch(key, output_file)
+
+
+def fetch_all(keys, outputs):
+    # 一条命令的全部输出都在缓存里时才取出，只命中一部分时不动已有的文件
+    cache = get_output_cache()
+    if cache is None or not keys or any(k is None for k in keys):
+        return False
+    if not all(cache.has(k, o) for k, o in zip(keys, outputs)):
+        return False
+    return all([cache.fetch(k, o) for k, o in zip(keys, outputs)])
+
+
+def store(key, output_file):
+    cache = get_output_cache()
+    if key is not None and cache is not None:
+        cache.store(key, output_file)
@@ -0,0 +1,147 @@
+from vc_modules.capabilities import SOFTWARE_H264_PRESET, get_capabilities, pick_h264_encoder
+
+# 容器 × 编码 兼容性规划：对每条轨道决定直接复制、复制并加比特流过滤器，还是转码到指定编码。
+# 能复制的绝不转码。
+
+COPY = 'copy'
+BSF = 'bsf'
+TRANSCODE = 'transcode'
+UNSUPPORTED = 'unsupported'
+
+ANY = None  # 该类型的任何编码都可以直接复制
+
+TEXT_SUBTITLES = {'subrip', 'srt', 'ass', 'ssa', 'webvtt', 'mov_text', 'text'}
+
+# 各容器可以直接复制的编码
+CONTAINER_CODECS = {
+    'mp4': {
+        'video': {'h264', 'hevc', 'mpeg4', 'mpeg2video', 'av1', 'vp9', 'mjpeg'},
+        'audio': {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'opus', 'flac'},
+        'subtitle': {'mov_text'},
+    },
+    'mov': {
+        'video': {'h264', 'hevc', 'mpeg4', 'mpeg2video', 'prores', 'mjpeg'},
+        'audio': {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'pcm_s16le', 'pcm_s24le'},
+        'subtitle': {'mov_text'},
+    },
+    'mkv': {
+        'video': ANY,
+        'audio': ANY,
+        'subtitle': {'subrip', 'srt', 'ass', 'ssa', 'webvtt', 'text', 'hdmv_pgs_subtitle', 'pgssub', 'pgs',
+                     'dvd_subtitle', 'vobsub', 'dvb_subtitle'},
+    },
+    'avi': {
+        'video': {'mpeg4', 'msmpeg4v2', 'msmpeg4v3', 'xvid', 'divx', 'mjpeg'},
+        'audio': {'mp3', 'ac3'},
+        'subtitle': set(),
+    },
+    'wmv': {
+        'video': {'wmv1', 'wmv2', 'wmv3'},
+        'audio': {'wmav1', 'wmav2'},
+        'subtitle': set(),
+    },
+    'flv': {
+        'video': {'h264', 'flv1'},
+        'audio': {'aac', 'mp3'},
+        'subtitle': set(),
+    },
+    'mp3': {'audio': {'mp3'}},
+    'aac': {'audio': {'aac'}},
+    'm4a': {'audio': {'aac', 'alac'}},
+    'wav': {'audio': {'pcm_s16le', 'pcm_s24le', 'pcm_s32le', 'pcm_f32le', 'pcm_u8'}},
+    'flac': {'audio': {'flac'}},
+    'ogg': {'audio': {'vorbis', 'opus', 'flac'}},
+}
+
+# 需要转码时的目标编码器，按优先顺序，取第一个本机可用的
+TRANSCODE_ENCODERS = {
+    'avi': {'video': ['mpeg4'], 'audio': ['libmp3lame', 'mp3']},
+    'wmv': {'video': ['wmv2'], 'audio': ['wmav2']},
+    'flv': {'video': ['h264'], 'audio': ['aac']},
+    'mp4': {'video': ['h264'], 'audio': ['aac'], 'subtitle': ['mov_text']},
+    'mov': {'video': ['h264'], 'audio': ['aac'], 'subtitle': ['mov_text']},
+    'mkv': {'video': ['h264'], 'audio': ['aac'], 'subtitle': ['srt']},
+    'mp3': {'audio': ['libmp3lame', 'mp3']},
+    'aac': {'audio': ['aac']},
+    'm4a': {'audio': ['aac']},
+    'wav': {'audio': ['pcm_s16le']},
+    'flac': {'audio': ['flac']},
+    'ogg': {'audio': ['libvorbis', 'libopus', 'flac']},
+}
+
+# (源容器 format_name 中的关键字, 编码, 目标容器集合) -> 比特流过滤器
+BITSTREAM_FILTERS = [
+    (('mpegts', 'aac'), 'aac', {'mp4', 'mov', 'm4a', 'flv'}, 'aac_adtstoasc'),
+    (('avi',), 'mpeg4', {'mp4', 'mov', 'mkv'}, 'mpeg4_unpack_bframes'),
+]
+
+
+class StreamPlan:
+    def __init__(self, codec_type, source_codec, action, codec=None, bsf=None, options=None):
+        self.codec_type = codec_type
+        self.source_codec = source_codec
+        self.action = action
+        self.codec = codec
+        self.bsf = bsf
+        self.options = options or []  # [(选项名, 值)]，如 libx264 的 preset
+
+    def args(self, out_idx):
+        # out_idx 为该类型在输出文件中的序号，生成 -c:v:0 这样的按轨道参数
+        spec = f"{self.codec_type[0]}:{out_idx}"
+        if self.action in (COPY, BSF):
+            args = [f'-c:{spec}', 'copy']
+            if self.bsf:
+                args += [f'-bsf:{spec}', self.bsf]
+            return args
+        args = [f'-c:{spec}', self.codec]
+        for name, value in self.options:
+            args += [f'-{name}:{spec}', value]
+        return args
+
+    def __repr__(self):
+        return f"StreamPlan({self.codec_type}, {self.source_codec} -> {self.action} {self.codec or self.bsf or ''})"
+
+
+def _pick_encoder(candidates):
+    if candidates == ['h264']:
+        return pick_h264_encoder()[0]
+    encoders = get_capabilities()['encoders']
+    for name in candidates:
+        if name in encoders:
+            return name
+    return candidates[0]
+
+
+def plan_codec(codec_type, source_codec, target_format, source_format=''):
+    target = target_format.lower()
+    source_codec = (source_codec or '').lower()
+    allowed = CONTAINER_CODECS.get(target, {}).get(codec_type, set())
+    if allowed is ANY or source_codec in allowed:
+        for fmt_keys, codec, targets, bsf in BITSTREAM_FILTERS:
+            if codec == source_codec and target in targets and any(k in (source_format or '') for k in fmt_keys):
+                return StreamPlan(codec_type, source_codec, BSF, bsf=bsf)
+        return StreamPlan(codec_type, source_codec, COPY)
+    candidates = TRANSCODE_ENCODERS.get(target, {}).get(codec_type)
+    if not candidates:
+        return StreamPlan(codec_type, source_codec, UNSUPPORTED)
+    # 图形字幕无法转成文本字幕
+    if codec_type == 'subtitle' and source_codec not in TEXT_SUBTITLES:
+        return StreamPlan(codec_type, source_codec, UNSUPPORTED)
+    encoder = _pick_encoder(candidates)
+    options = [('preset', SOFTWARE_H264_PRESET)] if encoder == 'libx264' else []
+    return StreamPlan(codec_type, source_codec, TRANSCODE, codec=encoder, options=options)
+
+
+def plan_stream(stream, target_format, source_format=''):
+    return plan_codec(stream.get('codec_type', ''), stream.get('codec_name', ''), target_format, source_format)
+
+
+def codec_args(plans):
+    # 按 -map 的顺序传入各轨道的规划，返回编码参数
+    args = []
+    counters = {}
+    for plan in plans:
+        out_idx = counters.get(plan.codec_type, 0)
+        counters[plan.codec_type] = out_idx + 1
+        args += plan.args(out_idx)
+    return args
@@ -0,0 +1,235 @@
+import os
+import json
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+from vc_modules.binaries import get_bin_path
+from vc_modules.tracing import command_line, span
+
+
+# 每个文件一次 ffprobe，结果按 (路径, 大小, 修改时间) 缓存，LRU 淘汰。
+# 批量导入、批量打包和监视文件夹一次会涉及几百上千个文件，每条只有几 KB，默认多留一些；
+# CONVERTER_PROBE_CACHE 可以调整条数
+DEFAULT_CACHE_ENTRIES = 4096
+
+
+def _cache_entries():
+    try:
+        return max(1, int(os.environ.get('CONVERTER_PROBE_CACHE', DEFAULT_CACHE_ENTRIES)))
+    except ValueError:
+        return DEFAULT_CACHE_ENTRIES
+
+
+MAX_CACHE_ENTRIES = _cache_entries()
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# 探测耗时统计（毫秒），用来确认优化前后的效果
+_stats = {'probes': 0, 'cache_hits': 0, 'index_hits': 0, 'cancelled': 0, 'total_ms': 0.0, 'last_ms': 0.0}
+
+
+# 常见像素格式推断色深
+PIX_FMT_DEPTH = {
+    'yuv420p': '8', 'yuv422p': '8', 'yuv444p': '8',
+    'yuv420p10le': '10', 'yuv422p10le': '10', 'yuv444p10le': '10',
+    'yuv420p12le': '12', 'yuv422p12le': '12', 'yuv444p12le': '12',
+}
+
+
+class ProbeCancelled(Exception):
+    pass
+
+
+class ProbeResult:
+    """一次 ffprobe 的解析结果，预先算好每种轨道类型内的序号（即 -map 0:v:N 里的 N）。"""
+
+    def __init__(self, path, info):
+        self.path = path
+        self.streams = info.get('streams', [])
+        self.format = info.get('format', {})
+        self.by_type = {}   # codec_type -> [stream, ...]
+        self._by_index = {}  # index -> stream
+        self._subidx = {}    # index -> 类型内序号
+        self._records = None
+        for stream in self.streams:
+            typ = stream.get('codec_type', '')
+            same_type = self.by_type.setdefault(typ, [])
+            idx = stream.get('index', -1)
+            self._by_index[idx] = stream
+            self._subidx[idx] = len(same_type)
+            same_type.append(stream)
+
+    def records(self):
+        # 显示用的轨道记录，和探测结果一起缓存，重复打开同一个文件不再重新格式化
+        if self._records is None:
+            from vc_modules.streams import stream_records
+            self._records = stream_records(self.path, self.streams)
+        return self._records
+
+    def records_of(self, typ):
+        return [r for r in self.records() if r.codec_type == typ]
+
+    def streams_of(self, typ):
+        return self.by_type.get(typ, [])
+
+    def stream(self, idx):
+        return self._by_index.get(idx)
+
+    def codec_of(self, idx):
+        stream = self._by_index.get(idx)
+        if stream is None:
+            return None
+        return stream.get('codec_name', '').lower()
+
+    def subidx(self, idx, typ):
+        stream = self._by_index.get(idx)
+        if stream is None or stream.get('codec_type') != typ:
+            return 0
+        return self._subidx[idx]
+
+    def summary(self):
+        # 总比特率、时长，以及第一个视频流的分辨率、像素格式和色深
+        width = height = pix_fmt = color_depth = ''
+        video_streams = self.streams_of('video')
+        if video_streams:
+            stream = video_streams[0]
+            width = stream.get('width', '')
+            height = stream.get('height', '')
+            pix_fmt = stream.get('pix_fmt', '')
+            color_depth = stream.get('bits_per_raw_sample', '')
+        # 色彩深度补充（部分视频流可能没有 bits_per_raw_sample）
+        if not color_depth and pix_fmt:
+            color_depth = PIX_FMT_DEPTH.get(pix_fmt, '')
+        return {
+            'duration': self.format.get('duration', ''),
+            'bit_rate': self.format.get('bit_rate', ''),
+            'width': width,
+            'height': height,
+            'pix_fmt': pix_fmt,
+            'color_depth': color_depth,
+        }
+
+
+def _cache_key(path):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    return (path, st.st_size, st.st_mtime_ns), st
+
+
+def ffprobe_cmd(path):
+    return [get_bin_path('ffprobe'), '-v', 'error', '-show_streams', '-show_format', '-print_format', 'json', path]
+
+
+def parse_ffprobe_output(path, out):
+    with span('parse_json', cat='parse', file=path, bytes=len(out)) as s:
+        info = json.loads(out.decode(errors='ignore'))
+        s['streams'] = len(info.get('streams', []))
+    return info
+
+
+def run_ffprobe(path, cancel_event=None):
+    cmd = ffprobe_cmd(path)
+    with span('ffprobe', cat='process', file=path, cmd=command_line(cmd)) as s:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        while True:
+            try:
+                out, err = proc.communicate(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                # 用户已经换了文件，旧的探测直接杀掉
+                if cancel_event is not None and cancel_event.is_set():
+                    proc.kill()
+                    proc.communicate()
+                    raise ProbeCancelled(path)
+        s['returncode'] = proc.returncode
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, out, err)
+    return parse_ffprobe_output(path, out)
+
+
+def probe(path, cancel_event=None):
+    with span('probe', cat='probe', file=path) as s:
+        result, s['source'] = _probe(path, cancel_event)
+        s['streams'] = len(result.streams)
+    return result
+
+
+def _probe(path, cancel_event):
+    # 返回 (结果, 来源)，来源为 cache/index/ffprobe
+    start = time.perf_counter()
+    result, source, key, st = lookup(path)
+    if result is not None:
+        return result, source
+    try:
+        info = run_ffprobe(key[0], cancel_event)
+    except ProbeCancelled:
+        with _cache_lock:
+            _stats['cancelled'] += 1
+        raise
+    return remember(key, st, info, (time.perf_counter() - start) * 1000), 'ffprobe'
+
+
+def lookup(path):
+    # 只查内存缓存和媒体库索引，不启动 ffprobe；返回 (结果或 None, 来源, key, stat)
+    # 异步引擎用它和 remember() 自己调度 ffprobe 进程
+    start = time.perf_counter()
+    key, st = _cache_key(path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            _stats['cache_hits'] += 1
+            return cached, 'cache', key, st
+    # 内存里没有时先查磁盘上的媒体库索引，命中则完全跳过 ffprobe
+    from vc_modules.media_index import get_index
+    index = get_index()
+    info = index.lookup(key[0], st) if index is not None else None
+    if info is None:
+        return None, None, key, st
+    return remember(key, st, info, (time.perf_counter() - start) * 1000, from_index=True), 'index', key, st
+
+
+def remember(key, st, info, elapsed_ms, from_index=False):
+    # 把一次探测结果放进内存缓存，新探测的同时写入媒体库索引
+    result = ProbeResult(key[0], info)
+    if not from_index:
+        from vc_modules.media_index import get_index
+        index = get_index()
+        if index is not None:
+            try:
+                index.store(key[0], st, {'streams': result.streams, 'format': result.format}, result.summary())
+            except Exception:
+                pass  # 索引写入失败不影响本次探测
+    stat_name = 'index_hits' if from_index else 'probes'
+    with _cache_lock:
+        _stats[stat_name] += 1
+        if stat_name == 'probes':
+            _stats['total_ms'] += elapsed_ms
+        _stats['last_ms'] = elapsed_ms
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return result
+
+
+def invalidate(path):
+    path = os.path.abspath(path)
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == path]:
+            del _cache[key]
+
+
+def get_stats():
+    with _cache_lock:
+        stats = dict(_stats)
+    stats['avg_ms'] = stats['total_ms'] / stats['probes'] if stats['probes'] else 0.0
+    return stats
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
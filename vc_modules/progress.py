@@ -0,0 +1,157 @@
+import os
+import time
+import signal
+import threading
+import subprocess
+
+from vc_modules.stderr_log import StderrCapture
+from vc_modules.tracing import command_line, span
+
+# 解析 ffmpeg -progress 输出的 key=value 流，计算百分比、剩余时间和吞吐量
+
+MB = 1024 * 1024
+
+
+def with_progress(cmd):
+    # 在 ffmpeg 路径后面插入进度参数，进度写到 stdout，关掉 stderr 里的统计行
+    return cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+
+
+def media_duration(input_file):
+    from vc_modules.probe import probe
+    try:
+        return float(probe(input_file).format.get('duration', 0)) or None
+    except Exception:
+        return None
+
+
+class Progress:
+    def __init__(self, duration=None):
+        self.duration = duration
+        self.started = time.monotonic()
+        self.out_time = 0.0
+        self.fps = 0.0
+        self.speed = 0.0
+        self.total_size = 0
+        self.done = False
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def percent(self):
+        if self.done:
+            return 100.0
+        if not self.duration:
+            return -1.0
+        return max(0.0, min(99.9, self.out_time / self.duration * 100))
+
+    @property
+    def eta(self):
+        if not self.duration or self.done:
+            return None
+        speed = self.speed or (self.out_time / self.elapsed if self.elapsed else 0)
+        if speed <= 0:
+            return None
+        return max(0.0, (self.duration - self.out_time) / speed)
+
+    @property
+    def mb_per_s(self):
+        # 刚启动时耗时太短，算出来的速度没有意义
+        elapsed = self.elapsed
+        return self.total_size / elapsed / MB if elapsed >= 0.5 else 0.0
+
+    def update(self, key, value):
+        # 返回 True 表示一个完整的进度块结束
+        try:
+            if key == 'out_time_us':
+                self.out_time = int(value) / 1000000
+            elif key == 'fps':
+                self.fps = float(value)
+            elif key == 'speed':
+                self.speed = float(value.rstrip('x'))
+            elif key == 'total_size':
+                self.total_size = int(value)
+        except ValueError:
+            pass  # N/A 之类的值忽略
+        if key == 'progress':
+            self.done = value == 'end'
+            return True
+        return False
+
+
+def format_progress(p):
+    parts = []
+    if p.percent >= 0:
+        parts.append(f"{p.percent:.1f}%")
+    else:
+        parts.append(f"{p.out_time:.0f}s")
+    eta = p.eta
+    if eta is not None:
+        parts.append(f"剩余 {int(eta) // 60:02d}:{int(eta) % 60:02d}")
+    parts.append(f"{p.mb_per_s:.1f} MB/s")
+    if p.speed:
+        parts.append(f"{p.speed:.2f}x")
+    return "  ".join(parts)
+
+
+def _drain_stderr(stream, capture):
+    for chunk in iter(lambda: stream.read(65536), b''):
+        capture.feed(chunk)
+    capture.close()
+
+
+def run_ffmpeg_with_progress(cmd, duration=None, on_progress=None, interval=0.5, on_start=None, log_path=None,
+                             **popen_kwargs):
+    # 返回 (退出码, StderrCapture)；on_progress 最多每 interval 秒回调一次，结束时一定回调
+    # on_start 拿到子进程对象，用于取消；log_path 不为空时完整 stderr 写入轮转日志
+    input_file = cmd[cmd.index('-i') + 1] if '-i' in cmd[:-1] else ''
+    with span('ffmpeg', cat='process', file=input_file, cmd=command_line(cmd)) as s:
+        proc = subprocess.Popen(with_progress(cmd), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, **popen_kwargs)
+        if on_start is not None:
+            on_start(proc)
+        capture = StderrCapture(log_path)
+        reader = threading.Thread(target=_drain_stderr, args=(proc.stderr, capture), daemon=True)
+        reader.start()
+        progress = Progress(duration)
+        last_emit = 0.0
+        for raw in proc.stdout:
+            key, sep, value = raw.decode(errors='ignore').strip().partition('=')
+            if not sep or not progress.update(key, value):
+                continue
+            now = time.monotonic()
+            if on_progress is not None and (progress.done or now - last_emit >= interval):
+                last_emit = now
+                on_progress(progress)
+        proc.wait()
+        reader.join()
+        s['returncode'] = proc.returncode
+        s['stderr_lines'] = capture.total_lines
+    return proc.returncode, capture
+
+
+def new_process_group_kwargs():
+    # 让 ffmpeg 成为独立进程组的组长，取消时可以连同子进程一起结束
+    if os.name == 'posix':
+        return {'start_new_session': True}
+    return {'creationflags': getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0)}
+
+
+def terminate_process_group(proc, timeout=5):
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import subprocess
+
+# 任务优先级和后台任务的准入控制，异步引擎在分配名额和启动 ffmpeg 时使用。
+#   interactive  窗口里用户正在等的任务；名额不够时暂停（SIGSTOP）正在运行的后台任务让出名额
+#   background   批量、监视文件夹等任务；ffmpeg 以较低的 CPU（nice）和磁盘（ionice）优先级启动，
+#                机器负载、可用内存或磁盘队列超过阈值时暂缓启动新的后台任务
+# 至少允许一个后台任务运行，机器再忙也不会完全停下。
+# CONVERTER_PRIORITY 设置默认优先级；CONVERTER_MAX_LOAD（每核负载）、CONVERTER_MIN_FREE_MB、
+# CONVERTER_MAX_DISK_QUEUE 调整阈值，CONVERTER_ADMISSION=off 关闭准入控制。
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITIES = {'interactive': INTERACTIVE, 'background': BACKGROUND}
+
+BACKGROUND_NICE = 10
+# best-effort 里最低的一级，不会像 idle 那样被完全饿死；-t 让内核不支持 I/O 优先级时照样启动 ffmpeg
+BACKGROUND_IONICE = ['-t', '-c', '2', '-n', '7']
+
+DEFAULT_MAX_LOAD = 1.0       # 1 分钟平均负载 / 核心数
+DEFAULT_MIN_FREE_MB = 1024
+DEFAULT_MAX_DISK_QUEUE = 8   # 所有磁盘正在处理的 I/O 请求数
+ADMISSION_POLL = 2.0
+ADMISSION_SPACING = 5.0      # 两个后台任务至少间隔这么久启动，等负载反映出上一个任务
+
+_prefix = None
+
+
+def default_priority():
+    return PRIORITIES.get(os.environ.get('CONVERTER_PRIORITY', '').lower(), INTERACTIVE)
+
+
+def _env_number(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _background_prefix():
+    # nice/ionice 用 exec 启动 ffmpeg，进程号不变，取消时照样结束整个进程组
+    global _prefix
+    if _prefix is None:
+        _prefix = []
+        if os.name == 'posix' and shutil.which('nice'):
+            _prefix += ['nice', '-n', str(BACKGROUND_NICE)]
+        if sys.platform.startswith('linux') and shutil.which('ionice'):
+            _prefix += ['ionice'] + BACKGROUND_IONICE
+    return _prefix
+
+
+def launch_args(cmd, kwargs, priority):
+    # 返回降低优先级后的 (命令, Popen 参数)；前台任务原样返回
+    if priority != BACKGROUND:
+        return cmd, kwargs
+    if os.name == 'nt':
+        kwargs = dict(kwargs)
+        kwargs['creationflags'] = kwargs.get('creationflags', 0) | getattr(subprocess, 'BELOW_NORMAL_PRIORITY_CLASS', 0)
+        return cmd, kwargs
+    return _background_prefix() + list(cmd), kwargs
+
+
+def load_per_cpu():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def free_memory_mb():
+    # 只在 Linux 上读 MemAvailable，其他系统不参与判断
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def disk_queue_depth():
+    # /proc/diskstats 第 12 列是正在处理的 I/O 数；只统计 /sys/block 下的整块磁盘，分区不重复计算
+    try:
+        disks = {name for name in os.listdir('/sys/block') if not name.startswith(('loop', 'ram', 'zram'))}
+        total = 0
+        with open('/proc/diskstats', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) > 11 and parts[2] in disks:
+                    total += int(parts[11])
+        return total
+    except (OSError, ValueError):
+        return None
+
+
+class Admission:
+    def __init__(self):
+        self.enabled = os.environ.get('CONVERTER_ADMISSION', '').lower() != 'off'
+        self.max_load = _env_number('CONVERTER_MAX_LOAD', DEFAULT_MAX_LOAD)
+        self.min_free_mb = _env_number('CONVERTER_MIN_FREE_MB', DEFAULT_MIN_FREE_MB)
+        self.max_disk_queue = _env_number('CONVERTER_MAX_DISK_QUEUE', DEFAULT_MAX_DISK_QUEUE)
+        self.running = 0       # 已经放行、还没结束的后台任务
+        self.waiting = 0
+        self.reason = ''       # 最近一次暂缓的原因，供界面和命令行显示
+        self._last_admit = 0.0
+
+    def busy(self):
+        # 返回暂缓的原因，机器空闲时返回空字符串
+        load = load_per_cpu()
+        if load is not None and load > self.max_load:
+            return f"负载 {load:.2f}/核"
+        free_mb = free_memory_mb()
+        if free_mb is not None and free_mb < self.min_free_mb:
+            return f"可用内存 {free_mb:.0f} MB"
+        queue = disk_queue_depth()
+        if queue is not None and queue > self.max_disk_queue:
+            return f"磁盘队列 {queue}"
+        return ''
+
+    async def wait(self):
+        # 在事件循环里轮询，直到可以启动一个后台任务
+        self.waiting += 1
+        try:
+            while self.enabled and self.running > 0:
+                if time.monotonic() - self._last_admit >= ADMISSION_SPACING:
+                    self.reason = await asyncio.get_running_loop().run_in_executor(None, self.busy)
+                    if not self.reason:
+                        break
+                await asyncio.sleep(ADMISSION_POLL)
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        self._last_admit = time.monotonic()
+
+    def done(self):
+        self.running -= 1
+
+    def stats(self):
+        return {'running': self.running, 'waiting': self.waiting, 'reason': self.reason if self.waiting else ''}
@@ -0,0 +1,192 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from vc_modules.binaries import get_bin_path
+from vc_modules.progress import (
+    media_duration, new_process_group_kwargs, run_ffmpeg_with_progress, terminate_process_group
+)
+
+# 分段并行转码：按关键帧把视频无损切成若干段，多个 ffmpeg 进程同时编码，
+# 再用 concat 分离器无损拼接；音频在最后封装时单独处理一遍。
+# 适合 mpeg4/wmv2 这类多线程扩展性差的编码器。
+
+# 与 ffmpeg 对各容器默认选用的视频编码器保持一致，保证和单进程模式输出相同编码
+DEFAULT_VIDEO_ENCODERS = {
+    'avi': 'mpeg4',
+    'wmv': 'wmv2',
+    'flv': 'flv',
+    'mkv': 'libx264',
+    'mp4': 'libx264',
+    'mov': 'libx264',
+}
+
+MIN_SEGMENT_SECONDS = 10
+
+
+class SegmentCancelled(Exception):
+    pass
+
+
+def keyframe_times(input_file):
+    # 只读包头的 flags，不解码
+    cmd = [get_bin_path('ffprobe'), '-v', 'error', '-select_streams', 'v:0',
+           '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_file]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    times = []
+    for line in result.stdout.decode(errors='ignore').splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags:
+            try:
+                times.append(float(pts))
+            except ValueError:
+                continue
+    return sorted(times)
+
+
+def split_points(keyframes, duration, segments):
+    # 在每个等分点之后取第一个关键帧作为切分点
+    points = []
+    if segments < 2 or not duration:
+        return points
+    for i in range(1, segments):
+        target = duration * i / segments
+        for t in keyframes:
+            if t >= target:
+                if (not points or t - points[-1] >= MIN_SEGMENT_SECONDS) and duration - t >= MIN_SEGMENT_SECONDS:
+                    points.append(t)
+                break
+    return points
+
+
+def plan_segments(duration, workers):
+    # 段数取工作进程数的两倍，让先完成的进程可以接着处理剩下的段
+    if not duration:
+        return 1
+    return max(1, min(workers * 2, int(duration // MIN_SEGMENT_SECONDS)))
+
+
+def convert_segmented(input_file, output_file, output_format, output_kwargs, workers=None,
+                      on_progress=None, cancel_event=None):
+    ffmpeg_path = get_bin_path('ffmpeg')
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    duration = media_duration(input_file)
+    vcodec = output_kwargs.get('vcodec') or DEFAULT_VIDEO_ENCODERS.get(output_format, 'libx264')
+    points = split_points(keyframe_times(input_file), duration, plan_segments(duration, workers))
+
+    work_dir = tempfile.mkdtemp(prefix='.segments_', dir=os.path.dirname(os.path.abspath(output_file)))
+    procs = set()
+    cmds = []
+    lock = threading.Lock()
+    seg_done = {}
+    started = time.monotonic()
+    failed = threading.Event()    # 有一段失败，其余段停止
+    finished = threading.Event()
+
+    def stopping():
+        return failed.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+    def on_start(proc):
+        with lock:
+            procs.add(proc)
+            cancelled = stopping()
+        if cancelled:
+            terminate_process_group(proc)
+
+    def kill_all():
+        with lock:
+            for proc in procs:
+                terminate_process_group(proc)
+
+    def watch_cancel():
+        # 取消时立即结束正在运行的进程，不等当前这一步编完
+        while not finished.wait(0.2):
+            if cancel_event.is_set():
+                kill_all()
+                return
+
+    if cancel_event is not None:
+        threading.Thread(target=watch_cancel, daemon=True).start()
+
+    def run_step(cmd, key=None):
+        def progress(p):
+            # 各段已编码时长之和 / 总时长 = 总进度
+            if key is None or on_progress is None:
+                return
+            with lock:
+                seg_done[key] = p.out_time
+                total = sum(seg_done.values())
+            elapsed = time.monotonic() - started
+            percent = min(99.9, total / duration * 100) if duration else -1.0
+            text = f"{percent:.1f}%  分段并行 {len(seg_done)}/{len(cmds)}  {total / elapsed if elapsed else 0:.2f}x"
+            on_progress(percent, text)
+        if stopping():
+            raise SegmentCancelled()
+        returncode, stderr = run_ffmpeg_with_progress(cmd, duration, progress, on_start=on_start,
+                                                      **new_process_group_kwargs())
+        if stopping():
+            raise SegmentCancelled()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr.summary())
+
+    try:
+        # 1. 按关键帧无损切分视频流
+        split_pattern = os.path.join(work_dir, 'src_%04d.mkv')
+        cmd = [ffmpeg_path, '-y', '-i', input_file, '-map', '0:v:0', '-an', '-sn', '-c', 'copy']
+        if points:
+            cmd += ['-f', 'segment', '-segment_times', ','.join(f'{t:.6f}' for t in points),
+                    '-reset_timestamps', '1', split_pattern]
+        else:
+            cmd += [split_pattern % 0]
+        run_step(cmd)
+        sources = sorted(f for f in os.listdir(work_dir) if f.startswith('src_'))
+
+        # 2. 多进程并行编码各段
+        encoded = []
+        for name in sources:
+            out = os.path.join(work_dir, name.replace('src_', 'enc_'))
+            encoded.append(out)
+            cmd = [ffmpeg_path, '-y', '-i', os.path.join(work_dir, name), '-c:v', vcodec]
+            if output_kwargs.get('preset'):
+                cmd += ['-preset', output_kwargs['preset']]
+            cmds.append((name, cmd + ['-threads', '1', out]))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(run_step, cmd, name) for name, cmd in cmds]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            errors = [f.exception() for f in futures if f.done() and f.exception() is not None]
+            if errors:
+                # 优先报告真正失败的段，其他段是被连带结束的
+                raise next((e for e in errors if not isinstance(e, SegmentCancelled)), errors[0])
+        except BaseException:
+            # 一段失败时立即结束其他正在编码的段，排队的段不再启动，不用等全部编完
+            failed.set()
+            kill_all()
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        pool.shutdown(wait=True)
+
+        # 3. concat 无损拼接视频，同时一次性处理所有音轨
+        list_file = os.path.join(work_dir, 'list.txt')
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for path in encoded:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        cmd = [ffmpeg_path, '-y', '-f', 'concat', '-safe', '0', '-i', list_file, '-i', input_file,
+               '-map', '0:v:0', '-map', '1:a?', '-c:v', 'copy', output_file]
+        run_step(cmd)
+        return True, output_file
+    except SegmentCancelled:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return False, "已取消"
+    except subprocess.CalledProcessError as e:
+        return False, e.stderr or str(e)
+    finally:
+        finished.set()
+        kill_all()
+        shutil.rmtree(work_dir, ignore_errors=True)
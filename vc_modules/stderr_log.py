@@ -0,0 +1,157 @@
+import os
+import re
+import time
+import hashlib
+from collections import deque
+
+# ffmpeg stderr 的有界采集：只在内存里保留最后若干行，完整内容可选写入按大小轮转的任务日志，
+# 同时统计常见错误，失败时给出简短摘要而不是把几百 MB 的输出塞进对话框
+
+MAX_TAIL_LINES = 40
+MAX_LINE_LENGTH = 500
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 2
+
+# (正则, 说明)，按顺序匹配，一行只计入第一个命中的
+ERROR_PATTERNS = [
+    (re.compile(r'No such file or directory'), '文件不存在'),
+    (re.compile(r'Permission denied'), '没有读写权限'),
+    (re.compile(r'No space left on device'), '磁盘空间不足'),
+    (re.compile(r'Invalid data found when processing input'), '输入文件损坏或格式无法识别'),
+    (re.compile(r'moov atom not found'), '文件不完整（缺少 moov）'),
+    (re.compile(r'Unknown encoder|Encoder not found'), '找不到编码器'),
+    (re.compile(r'Could not find tag for codec|codec not currently supported in container'), '目标容器不支持该编码'),
+    (re.compile(r'Error while decoding|decode_slice|error while decoding MB|concealing \d+ DC'), '解码错误（数据损坏）'),
+    (re.compile(r'Non-monotonous DTS|non monotonically increasing dts'), '时间戳不连续'),
+    (re.compile(r'Error initializing output stream|Error while opening encoder'), '编码器初始化失败'),
+    (re.compile(r'Stream map .* matches no streams|Invalid stream specifier'), '轨道映射无效'),
+    (re.compile(r'Conversion failed!'), '转换失败'),
+]
+
+
+def default_log_dir():
+    path = os.environ.get('CONVERTER_LOG_DIR')
+    if path:
+        return None if path.lower() == 'off' else path
+    return os.path.join(os.path.expanduser('~'), '.converter', 'logs')
+
+
+def job_log_path(output_file):
+    # 每个输出文件一个日志，CONVERTER_LOG_DIR=off 时不写日志；文件名后加完整路径的短哈希，
+    # 不同文件夹里同名的输出（批量、监视文件夹）不会写进同一个日志、互相轮转
+    log_dir = default_log_dir()
+    if not log_dir:
+        return None
+    name = os.path.basename(output_file) or 'ffmpeg'
+    digest = hashlib.blake2b(os.path.abspath(output_file).encode(), digest_size=4).hexdigest()
+    return os.path.join(log_dir, f"{name}.{digest}.log")
+
+
+class StderrCapture:
+    def __init__(self, log_path=None, max_lines=MAX_TAIL_LINES, log_max_bytes=LOG_MAX_BYTES,
+                 log_backups=LOG_BACKUPS):
+        self.tail = deque(maxlen=max_lines)
+        self.counts = {}
+        self.first_match = {}
+        self.total_lines = 0
+        self.total_bytes = 0
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.log_backups = log_backups
+        self._partial = b''
+        self._log = None
+        self._log_size = 0
+        if log_path:
+            try:
+                os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+                self._open_log()
+            except OSError:
+                self.log_path = None  # 日志写不了不影响任务本身
+
+    def _open_log(self):
+        self._rotate()
+        self._log = open(self.log_path, 'ab')
+        self._log_size = 0
+        self._log.write(f"==== {time.strftime('%Y-%m-%d %H:%M:%S')} ====\n".encode())
+
+    def _rotate(self):
+        if not os.path.exists(self.log_path):
+            return
+        for i in range(self.log_backups, 0, -1):
+            src = self.log_path if i == 1 else f"{self.log_path}.{i - 1}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.log_path}.{i}")
+
+    def _write_log(self, chunk):
+        if self._log is None:
+            return
+        try:
+            if self._log_size + len(chunk) > self.log_max_bytes:
+                self._log.close()
+                self._open_log()
+            self._log.write(chunk)
+            self._log_size += len(chunk)
+        except OSError:
+            self._log = None
+
+    def feed(self, chunk):
+        self.total_bytes += len(chunk)
+        self._write_log(chunk)
+        data = self._partial + chunk
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+        if len(self._partial) > MAX_LINE_LENGTH * 4:
+            # 没有换行的超长输出，截断后当作一行处理
+            lines.append(self._partial)
+            self._partial = b''
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, raw):
+        line = raw.rstrip(b'\r').decode(errors='ignore').strip()
+        if not line:
+            return
+        self.total_lines += 1
+        if len(line) > MAX_LINE_LENGTH:
+            line = line[:MAX_LINE_LENGTH] + '…'
+        self.tail.append(line)
+        for pattern, desc in ERROR_PATTERNS:
+            if pattern.search(line):
+                self.counts[desc] = self.counts.get(desc, 0) + 1
+                self.first_match.setdefault(desc, line)
+                break
+
+    def close(self):
+        if self._partial:
+            self._add_line(self._partial)
+            self._partial = b''
+        if self._log is not None:
+            try:
+                self._log.close()
+            except OSError:
+                pass
+            self._log = None
+
+    def text(self):
+        return "\n".join(self.tail)
+
+    def last_line(self):
+        return self.tail[-1] if self.tail else ''
+
+    def summary(self, tail_lines=10):
+        parts = []
+        if self.counts:
+            parts.append("错误摘要：")
+            for desc, count in sorted(self.counts.items(), key=lambda kv: -kv[1]):
+                parts.append(f"  {desc} ×{count}：{self.first_match[desc]}")
+        lines = list(self.tail)[-tail_lines:]
+        if lines:
+            skipped = self.total_lines - len(lines)
+            parts.append(f"最后 {len(lines)} 行输出" + (f"（省略前 {skipped} 行）：" if skipped > 0 else "："))
+            parts.extend(lines)
+        if self.log_path:
+            parts.append(f"完整日志：{self.log_path}")
+        return "\n".join(parts)
+
+    def __str__(self):
+        return self.summary()
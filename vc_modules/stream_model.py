@@ -0,0 +1,162 @@
+import os
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+
+# 多个文件的轨道表：数据是 StreamRecord 列表，显示文字在记录里预先算好，data() 只取字段。
+# 行按需加入视图（fetchMore），上万条轨道时打开和追加都不会卡；勾选状态存在模型里，可跨文件批量勾选。
+
+COLUMNS = ["文件", "类型", "#", "编码", "语言", "详情", "码率"]
+FETCH_BATCH = 500
+
+
+class StreamTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._records = []
+        self._names = []        # 文件名，和记录一一对应，同一文件共用一个字符串
+        self._checked = bytearray()
+        self._loaded = 0        # 已经告诉视图的行数
+        self._eager = False     # 排序或筛选过之后，新追加的行也立即加入
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._records)
+
+    def fetchMore(self, parent=QModelIndex()):
+        self._load(min(len(self._records), self._loaded + FETCH_BATCH))
+
+    def _load(self, end):
+        if end <= self._loaded:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, end - 1)
+        self._loaded = end
+        self.endInsertRows()
+
+    def fetch_all(self):
+        # 排序和筛选需要看到全部行
+        self._eager = True
+        self._load(len(self._records))
+
+    def append(self, records):
+        # 探测完一个文件追加一批；视图还没填满一屏时直接显示，其余等滚动到底部再加入
+        if not records:
+            return
+        name = os.path.basename(records[0].path)
+        self._records.extend(records)
+        self._names.extend([name] * len(records))
+        self._checked.extend(bytes(len(records)))
+        if self._eager:
+            self._load(len(self._records))
+        elif self._loaded < FETCH_BATCH:
+            self._load(min(len(self._records), FETCH_BATCH))
+
+    def clear(self):
+        self.beginResetModel()
+        self._records = []
+        self._names = []
+        self._checked = bytearray()
+        self._loaded = 0
+        self._eager = False
+        self.endResetModel()
+
+    def record(self, row):
+        return self._records[row]
+
+    def total(self):
+        return len(self._records)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        r = self._records[row]
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return self._names[row]
+            return (None, r.type_name, r.index, r.codec, r.language, r.detail, r.bitrate_text)[col]
+        if role == Qt.CheckStateRole and col == 0:
+            return Qt.Checked if self._checked[row] else Qt.Unchecked
+        if role == Qt.ToolTipRole and col == 0:
+            return r.path
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == 0 and not self._records[index.row()].is_picture:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        self._checked[index.row()] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def set_checked(self, rows, checked=True):
+        # 批量勾选只发一次 dataChanged
+        rows = [row for row in rows if not self._records[row].is_picture]
+        if not rows:
+            return
+        for row in rows:
+            self._checked[row] = checked
+        first, last = min(rows), max(rows)
+        if first < self._loaded:
+            self.dataChanged.emit(self.index(first, 0), self.index(min(last, self._loaded - 1), 0),
+                                  [Qt.CheckStateRole])
+
+    def clear_checked(self):
+        self.set_checked(range(len(self._records)), False)
+
+    def checked_records(self):
+        return [r for r, c in zip(self._records, self._checked) if c]
+
+    def sort_key(self, row, col):
+        r = self._records[row]
+        return (self._names[row], r.codec_type, r.index, r.codec, r.language, r.detail, r.bitrate)[col]
+
+
+class StreamFilterModel(QSortFilterProxyModel):
+    # 按轨道类型和编码/语言筛选；直接读记录字段，不经过 data()
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.codec_type = ''
+        self.terms = []
+
+    def set_filter(self, codec_type='', text=''):
+        self.codec_type = codec_type
+        self.terms = [t.lower() for t in text.replace(',', ' ').split()]
+        if self.codec_type or self.terms:
+            self.sourceModel().fetch_all()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        r = self.sourceModel().record(source_row)
+        if self.codec_type and r.codec_type != self.codec_type:
+            return False
+        # 多个词之间是“或”：输入 "jpn chi" 显示日语和中文轨道
+        return not self.terms or any(t == r.language.lower() or t in r.codec.lower() for t in self.terms)
+
+    def lessThan(self, left, right):
+        source = self.sourceModel()
+        return source.sort_key(left.row(), left.column()) < source.sort_key(right.row(), right.column())
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column >= 0:
+            self.sourceModel().fetch_all()
+        super().sort(column, order)
+
+    def source_rows(self):
+        # 没有筛选时取全部行：视图里可能只加载了前几批（fetchMore），筛选时 set_filter 已经加载了全部
+        if not self.codec_type and not self.terms:
+            return list(range(self.sourceModel().total()))
+        return [self.mapToSource(self.index(row, 0)).row() for row in range(self.rowCount())]
@@ -0,0 +1,62 @@
+# 轨道记录：每条流的显示文字、排序键在创建时算好一次，列表和表格重绘时只读字段，不再重新格式化。
+# 用 __slots__ 存放，批量导入上万条轨道时每条只占几百字节。
+
+TYPE_NAMES = {'video': '视频', 'audio': '音频', 'subtitle': '字幕'}
+PICTURE_CODECS = ('mjpeg', 'png', 'bmp')
+
+
+def frame_rate(value):
+    # r_frame_rate 形如 "24000/1001"，分母为 0 或无法解析时返回 0
+    try:
+        if value and '/' in value:
+            num, den = value.split('/')
+            return float(num) / float(den) if float(den) != 0 else 0.0
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def bit_rate(stream):
+    # 流本身没有 bit_rate 时（mkv 常见）取 tags.BPS；返回 (bps 或 0, 显示文字)
+    br = stream.get('bit_rate', '') or stream.get('tags', {}).get('BPS', '')
+    if not br:
+        return 0, ''
+    try:
+        bps = int(br)
+    except ValueError:
+        return 0, str(br)
+    return bps, f"{bps // 1000} kbps"
+
+
+class StreamRecord:
+    __slots__ = ('path', 'index', 'codec_type', 'codec', 'language', 'detail', 'bitrate', 'bitrate_text',
+                 'desc', 'is_picture')
+
+    def __init__(self, path, stream):
+        self.path = path
+        self.index = stream.get('index', -1)
+        self.codec_type = stream.get('codec_type', '')
+        self.codec = stream.get('codec_name', '未知')
+        self.language = stream.get('tags', {}).get('language', '')
+        self.bitrate, self.bitrate_text = bit_rate(stream)
+        if self.codec_type == 'video':
+            self.detail = (f"{stream.get('width', '')}x{stream.get('height', '')} "
+                           f"{frame_rate(stream.get('r_frame_rate', '')):.2f}fps")
+        elif self.codec_type == 'audio':
+            self.detail = f"{stream.get('sample_rate', '')}Hz {stream.get('channels', '')}ch"
+        else:
+            self.detail = ''
+            self.bitrate_text = ''  # 字幕只显示编码和语言
+        self.desc = ' '.join(p for p in (f"#{self.index}", self.codec, self.language, self.detail,
+                                         self.bitrate_text) if p)
+        # 封面图等图片流，不能当作视频轨道打包
+        self.is_picture = (self.codec_type == 'video' and
+                           (self.codec in PICTURE_CODECS or stream.get('disposition', {}).get('attached_pic') == 1))
+
+    @property
+    def type_name(self):
+        return TYPE_NAMES.get(self.codec_type, self.codec_type)
+
+
+def stream_records(path, streams):
+    return [StreamRecord(path, stream) for stream in streams]
@@ -0,0 +1,155 @@
+import os
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import threading
+
+from vc_modules.binaries import get_bin_path
+from vc_modules.output_cache import fingerprint
+
+# 视频轨道预览条：在时长上均匀取几个时间点，每个点只解码 -ss 之后的第一个关键帧（-skip_frame nokey），
+# 缩小后存成 jpg。几个时间点同时截取，4K HEVC 也只需要解码几帧。
+# 结果按 (文件指纹, 流序号, 张数, 宽度) 存在 ~/.converter/thumbnails，再次打开同一个文件直接读取；
+# CONVERTER_THUMB_CACHE 可改路径或设为 off（此时写到临时目录，读出图片数据后删除，不复用）。
+# 返回的是 jpg 数据而不是路径，界面不用关心文件什么时候被删除或淘汰。
+
+THUMB_COUNT = 6
+THUMB_WIDTH = 160
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def timestamps(duration, count=THUMB_COUNT):
+    # 每段的中点，避开片头片尾的黑场
+    if not duration or duration <= 0:
+        return [0.0]
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+
+def thumbnail_cmd(ffmpeg_path, input_file, video_subidx, timestamp, width, output_file):
+    # -ss 放在 -i 前面按关键帧跳转；-skip_frame nokey 让解码器丢掉所有非关键帧
+    return [ffmpeg_path, '-v', 'error', '-y', '-threads', '1', '-skip_frame', 'nokey',
+            '-ss', f'{timestamp:.3f}', '-i', input_file, '-map', f'0:v:{video_subidx}',
+            '-an', '-sn', '-dn', '-frames:v', '1', '-vf', f'scale={width}:-2:flags=fast_bilinear',
+            '-q:v', '5', output_file]
+
+
+class ThumbnailCache:
+    def __init__(self, root, max_bytes=MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, path, stream_index, count, width):
+        parts = f"{fingerprint(path)}|{stream_index}|{count}|{width}"
+        return hashlib.blake2b(parts.encode(), digest_size=16).hexdigest()
+
+    def lookup(self, key):
+        # 返回缓存的图片路径列表，没有时返回 None
+        entry = os.path.join(self.root, key)
+        try:
+            names = sorted(n for n in os.listdir(entry) if n.endswith('.jpg'))
+            os.utime(entry)  # 更新最近使用时间，供淘汰
+        except OSError:
+            return None
+        return [os.path.join(entry, n) for n in names] or None
+
+    def store(self, key, tmp_dir):
+        # 临时目录整体改名为缓存条目；别的窗口同时生成了同一条目时保留先到的
+        entry = os.path.join(self.root, key)
+        try:
+            os.replace(tmp_dir, entry)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+        return self.lookup(key) or []
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.startswith('.'):
+                    continue
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(path))
+                    entries.append((os.stat(path).st_mtime, size, path))
+                except OSError:
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+def get_thumbnail_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            root = os.environ.get('CONVERTER_THUMB_CACHE')
+            if root and root.lower() == 'off':
+                _cache = False
+            else:
+                root = root or os.path.join(os.path.expanduser('~'), '.converter', 'thumbnails')
+                try:
+                    _cache = ThumbnailCache(root)
+                except OSError:
+                    _cache = False
+        return _cache or None
+
+
+def read_images(paths):
+    images = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                images.append(f.read())
+        except OSError:
+            continue
+    return images
+
+
+async def video_strip(engine, info, stream_index, count=THUMB_COUNT, width=THUMB_WIDTH):
+    # 返回一条视频轨道的预览图 jpg 数据列表（按时间顺序）；截取失败的时间点跳过
+    cache = get_thumbnail_cache()
+    key = None
+    if cache is not None:
+        try:
+            key = await engine.run_blocking(cache.key, info.path, stream_index, count, width)
+        except OSError:
+            key = None
+        cached = await engine.run_blocking(cache.lookup, key) if key else None
+        if cached:
+            images = await engine.run_blocking(read_images, cached)
+            if images:
+                return images
+    root = cache.root if cache is not None else None
+    tmp_dir = tempfile.mkdtemp(prefix='.thumbs_', dir=root)
+    try:
+        ffmpeg_path = get_bin_path('ffmpeg')
+        subidx = info.subidx(stream_index, 'video')
+        try:
+            duration = float(info.format.get('duration', 0))
+        except (TypeError, ValueError):
+            duration = 0.0
+        cmds = [thumbnail_cmd(ffmpeg_path, info.path, subidx, ts, width, os.path.join(tmp_dir, f'{i:02d}.jpg'))
+                for i, ts in enumerate(timestamps(duration, count))]
+        # 每张图一个进程，占 probe 名额：都是很短的读取，同时跑几个主要是在等磁盘和网络
+        results = await asyncio.gather(*(engine.run_process(cmd, span_name='thumbnail', file=info.path)
+                                         for cmd in cmds))
+        paths = sorted(os.path.join(tmp_dir, n) for n in os.listdir(tmp_dir) if n.endswith('.jpg'))
+        if not paths:
+            errors = [err.decode(errors='ignore').strip() for _, _, err in results]
+            raise RuntimeError(next((e for e in errors if e), "无法生成预览"))
+        if key is None:
+            return await engine.run_blocking(read_images, paths)
+        return await engine.run_blocking(read_images, await engine.run_blocking(cache.store, key, tmp_dir))
+    finally:
+        # 存进缓存后临时目录已经改名；没有缓存或失败时在这里删掉
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import atexit
+import functools
+import itertools
+import threading
+
+# 分阶段计时：ffprobe/ffmpeg 进程、JSON 解析、轨道规划、界面回调等都包在 span 里，
+# 导出为 Chrome trace-event JSON，可以直接拖进 Perfetto (ui.perfetto.dev) 或 chrome://tracing 查看。
+# 设置 CONVERTER_TRACE=输出文件 开启，程序退出时写出；命令行也可以用 --trace。
+# 未开启时 span() 返回一个共享的空对象，只多一次布尔判断。
+
+MAX_EVENTS = 200000  # 超过后丢弃新事件，避免长时间运行时内存无限增长
+
+_enabled = False
+_path = None
+_events = []
+_lock = threading.Lock()
+_thread_names = {}
+_dropped = 0
+_async_ids = itertools.count(1)
+
+
+class _NullArgs(dict):
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NullSpan:
+    args = _NullArgs()
+
+    def __enter__(self):
+        return self.args
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _now_us():
+    return time.perf_counter_ns() // 1000
+
+
+def _record(event):
+    global _dropped
+    tid = threading.get_ident()
+    event['pid'] = os.getpid()
+    event['tid'] = tid
+    with _lock:
+        if len(_events) >= MAX_EVENTS:
+            _dropped += 1
+            return
+        if tid not in _thread_names:
+            _thread_names[tid] = threading.current_thread().name
+        _events.append(event)
+
+
+class _Span:
+    __slots__ = ('name', 'cat', 'args', 'start')
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _record({'name': self.name, 'cat': self.cat, 'ph': 'X', 'ts': self.start,
+                 'dur': _now_us() - self.start, 'args': self.args})
+        return False
+
+
+class _AsyncSpan(_Span):
+    # 协程里的 span 会在同一个事件循环线程上互相交错，用 b/e 异步事件记录，每个 span 单独一行
+    __slots__ = ('id',)
+
+    def __enter__(self):
+        self.id = next(_async_ids)
+        _record({'name': self.name, 'cat': self.cat, 'ph': 'b', 'id': self.id, 'ts': _now_us(), 'args': {}})
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _record({'name': self.name, 'cat': self.cat, 'ph': 'e', 'id': self.id, 'ts': _now_us(), 'args': self.args})
+        return False
+
+
+def span(name, cat='app', **args):
+    # with span('ffmpeg', cat='process', file=path) as s: s['returncode'] = rc
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def async_span(name, cat='app', **args):
+    if not _enabled:
+        return _NULL_SPAN
+    return _AsyncSpan(name, cat, args)
+
+
+def instant(name, cat='app', **args):
+    if _enabled:
+        _record({'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': _now_us(), 'args': args})
+
+
+def traced(name=None, cat='ui'):
+    # 装饰界面回调等函数；是否记录在调用时判断，运行中开启也有效
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(label, cat, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def command_line(cmd):
+    # 命令行太长时截断，避免 trace 文件膨胀
+    text = ' '.join(str(c) for c in cmd)
+    return text if len(text) <= 1000 else text[:1000] + '…'
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(path=None):
+    global _enabled, _path
+    _path = path or _path
+    if not _enabled:
+        _enabled = True
+        atexit.register(_export_at_exit)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def export(path=None):
+    path = path or _path
+    if not path:
+        return None
+    with _lock:
+        events = list(_events)
+        names = dict(_thread_names)
+        dropped = _dropped
+    pid = os.getpid()
+    meta = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'Converter'}}]
+    meta += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': n}} for tid, n in names.items()]
+    data = {'traceEvents': meta + events, 'displayTimeUnit': 'ms', 'otherData': {'dropped_events': dropped}}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def _export_at_exit():
+    try:
+        export()
+    except OSError:
+        pass
+
+
+if os.environ.get('CONVERTER_TRACE'):
+    enable(os.environ['CONVERTER_TRACE'])
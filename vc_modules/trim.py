@@ -0,0 +1,230 @@
+import os
+import shutil
+import asyncio
+import tempfile
+
+from vc_modules.binaries import get_bin_path
+from vc_modules.capabilities import SOFTWARE_H264_PRESET, get_capabilities
+from vc_modules.engine import ENCODE, IO, PROBE
+from vc_modules.planner import TRANSCODE, plan_stream
+
+# 按时间剪切打包，两种方式：
+#   关键帧剪切：开始时间向前取到最近的关键帧，全部轨道直接复制，速度只受磁盘限制
+#   智能剪切：切点所在的不完整 GOP 重新编码，中间完整的 GOP 直接复制，再用 concat 拼成一条视频，
+#            和其他轨道一起按原来的 -map 打包。只处理视频，音频和字幕本来就可以在任意包处切开
+# 视频轨道本来就要转码时（如 h264 放进 avi），两种方式都是精确剪切。
+
+KEYFRAME_MODE = 'keyframe'
+SMART_MODE = 'smart'
+MODES = [(KEYFRAME_MODE, "关键帧剪切（直接复制）"), (SMART_MODE, "智能剪切（只重新编码切点附近）")]
+
+# 智能剪切时切点附近用的编码器，要和源视频同一种编码才能无损拼接
+EDGE_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+EDGE_CRF = '16'
+
+KEYFRAME_WINDOW = 20  # 在切点后多少秒内找关键帧
+EPSILON = 0.001
+
+
+def parse_time(text):
+    # 支持 "90"、"1:30"、"01:02:03.5"；空白返回 None
+    text = (text or '').strip()
+    if not text:
+        return None
+    seconds = 0.0
+    for part in text.split(':'):
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(text)
+    return seconds
+
+
+def format_time(seconds):
+    minutes, sec = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{sec:06.3f}"
+
+
+def parse_range(start_text, end_text, duration=None):
+    # 返回 (开始, 结束或 None)；两个都为空时返回 None 表示不剪切
+    try:
+        start, end = parse_time(start_text), parse_time(end_text)
+    except ValueError:
+        raise ValueError("时间格式应为 秒、分:秒 或 时:分:秒")
+    if start is None and end is None:
+        return None
+    start = start or 0.0
+    if duration and end is not None and end >= duration:
+        end = None
+    if end is not None and end <= start:
+        raise ValueError("结束时间必须晚于开始时间")
+    if duration and start >= duration:
+        raise ValueError(f"开始时间超过了文件时长 {format_time(duration)}")
+    return start, end
+
+
+def keyframe_cmd(ffprobe_path, input_file, video_subidx, intervals):
+    # 只读切点附近的包头，不解码
+    read = ','.join(f'{a:.3f}%{b:.3f}' for a, b in intervals)
+    return [ffprobe_path, '-v', 'error', '-select_streams', f'v:{video_subidx}', '-read_intervals', read,
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_file]
+
+
+def parse_keyframes(out, offset=0.0):
+    times = set()
+    for line in out.decode(errors='ignore').splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags:
+            try:
+                times.add(float(pts) - offset)
+            except ValueError:
+                continue
+    return sorted(times)
+
+
+async def keyframe_times(engine, info, video_idx, start, end):
+    # ffprobe 的 -read_intervals 用文件里的绝对时间，ffmpeg 的 -ss 从文件开头算，差一个 start_time
+    try:
+        offset = float(info.format.get('start_time', 0) or 0)
+    except (TypeError, ValueError):
+        offset = 0.0
+    intervals = [(offset + start, offset + start + KEYFRAME_WINDOW)]
+    if end is not None:
+        intervals.append((offset + max(start, end - KEYFRAME_WINDOW), offset + end))
+    cmd = keyframe_cmd(get_bin_path('ffprobe'), info.path, info.subidx(video_idx, 'video'), intervals)
+    returncode, out, err = await engine.run_process(cmd, slot=PROBE, span_name='keyframes', file=info.path)
+    if returncode != 0:
+        raise RuntimeError(err.decode(errors='ignore').strip() or "无法读取关键帧")
+    return parse_keyframes(out, offset)
+
+
+def snap_start(keyframes, start):
+    # 开始时间之前（含）最近的关键帧；找不到时用原时间
+    before = [k for k in keyframes if k <= start + EPSILON]
+    return before[-1] if before else start
+
+
+def smart_segments(keyframes, start, end):
+    # 返回 [(encode/copy, 开始, 结束或 None)]；结束为 None 表示到文件末尾
+    k1 = next((k for k in keyframes if k >= start - EPSILON), None)
+    if end is None:
+        if k1 is None:
+            return [('encode', start, None)]
+        head = [('encode', start, k1)] if k1 > start + EPSILON else []
+        return head + [('copy', k1, None)]
+    after = [k for k in keyframes if k <= end + EPSILON]
+    k2 = after[-1] if after else None
+    if k1 is None or k2 is None or k1 >= end - EPSILON:
+        return [('encode', start, end)]
+    segments = []
+    if k1 > start + EPSILON:
+        segments.append(('encode', start, k1))
+    if k2 > k1 + EPSILON:
+        segments.append(('copy', k1, k2))
+    if k2 < end - EPSILON:
+        segments.append(('encode', k2, end))
+    return segments
+
+
+def segment_cmd(ffmpeg_path, info, video_idx, action, start, end, output_file):
+    # 每段只取视频，写成 mpegts：参数集随关键帧重复，拼接后新旧编码器的画面都能解码
+    stream = info.stream(video_idx) or {}
+    cmd = [ffmpeg_path, '-y', '-ss', f'{start:.3f}', '-i', info.path]
+    if end is not None:
+        cmd += ['-t', f'{end - start:.3f}']
+    cmd += ['-map', f'0:v:{info.subidx(video_idx, "video")}', '-an', '-sn', '-dn']
+    if action == 'copy':
+        cmd += ['-c:v', 'copy']
+    else:
+        cmd += ['-c:v', EDGE_ENCODERS[info.codec_of(video_idx)], '-crf', EDGE_CRF, '-preset', SOFTWARE_H264_PRESET]
+        if stream.get('pix_fmt'):
+            cmd += ['-pix_fmt', stream['pix_fmt']]
+    return cmd + ['-f', 'mpegts', output_file]
+
+
+def _write_concat_list(path, parts):
+    with open(path, 'w', encoding='utf-8') as f:
+        for part, length in parts:
+            escaped = part.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+            if length is not None:
+                f.write(f"duration {length:.6f}\n")
+
+
+async def run_trim(engine, info, output_file, build_cmd, target_format, video_idx, start, end, mode,
+                   on_progress=None, on_status=None):
+    # build_cmd(trim, video_input) 按窗口里选中的轨道生成打包命令；video_idx 为 None 表示没有选视频。
+    # 返回 (成功, 输出文件或错误信息)
+    ffmpeg_path = get_bin_path('ffmpeg')
+    try:
+        duration = float(info.format.get('duration', 0)) or None
+    except (TypeError, ValueError):
+        duration = None
+    length = (end if end is not None else duration or start) - start or None
+
+    video_plan = None
+    if video_idx is not None:
+        video_plan = plan_stream(info.stream(video_idx) or {'codec_type': 'video'}, target_format,
+                                 info.format.get('format_name', ''))
+    if video_plan is None or video_plan.action == TRANSCODE:
+        # 视频要重新编码，或者只有音频、字幕：ffmpeg 本身就能精确剪切
+        cmd = build_cmd((start, end), None)
+        slot = ENCODE if video_plan is not None else IO
+        ok, result, _ = await engine.run_job('trim', cmd, output_file, input_file=info.path, slot=slot,
+                                             duration=length, on_progress=on_progress)
+        return ok, result
+
+    if on_status is not None:
+        on_status("正在查找关键帧...")
+    keyframes = await keyframe_times(engine, info, video_idx, start, end)
+    segments = smart_segments(keyframes, start, end) if mode == SMART_MODE else []
+    if mode != SMART_MODE or all(action == 'copy' for action, _, _ in segments):
+        # 关键帧剪切，或者两个切点正好都在关键帧上
+        cut_start = snap_start(keyframes, start) if mode != SMART_MODE else start
+        cmd = build_cmd((cut_start, end), None)
+        ok, result, _ = await engine.run_job('trim', cmd, output_file, input_file=info.path, slot=IO,
+                                             duration=length, on_progress=on_progress)
+        return ok, result
+
+    codec = info.codec_of(video_idx)
+    encoder = EDGE_ENCODERS.get(codec)
+    if encoder is None:
+        raise ValueError(f"智能剪切暂不支持 {codec} 视频，请使用关键帧剪切")
+    if encoder not in (await engine.run_blocking(get_capabilities))['encoders']:
+        raise ValueError(f"智能剪切需要 {encoder} 编码器，当前 ffmpeg 不可用，请使用关键帧剪切")
+
+    work_dir = tempfile.mkdtemp(prefix='.trim_', dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        if on_status is not None:
+            on_status("正在重新编码切点附近的画面...")
+        parts = []
+        steps = []
+        for i, (action, a, b) in enumerate(segments):
+            part = os.path.join(work_dir, f'part_{i:02d}.ts')
+            parts.append((part, b - a if b is not None else None))
+            slot = ENCODE if action == 'encode' else IO
+            cmd = segment_cmd(ffmpeg_path, info, video_idx, action, a, b, part)
+            steps.append(asyncio.ensure_future(_run_segment(engine, cmd, slot)))
+        try:
+            await asyncio.gather(*steps)
+        finally:
+            # 一段失败时结束其他段，等进程退出后再删临时目录
+            for step in steps:
+                step.cancel()
+            await asyncio.gather(*steps, return_exceptions=True)
+        list_file = os.path.join(work_dir, 'list.txt')
+        await engine.run_blocking(_write_concat_list, list_file, parts)
+        cmd = build_cmd((start, end), ['-f', 'concat', '-safe', '0', '-i', list_file])
+        # 命令里有临时文件，不进输出缓存
+        ok, result, _ = await engine.run_job('trim', cmd, output_file, input_file=info.path, slot=IO,
+                                             duration=length, on_progress=on_progress, use_cache=False)
+        return ok, result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def _run_segment(engine, cmd, slot):
+    async with engine.slots[slot].lease() as lease:
+        returncode, stderr = await engine.run_ffmpeg(cmd, lease=lease)
+    if returncode != 0:
+        raise RuntimeError(stderr.summary())
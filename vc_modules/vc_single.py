@@ -1,15 +1,16 @@
 import sys
 import os
-import subprocess, json
-def get_bin_path(bin_name):
-    import sys, os
-    if getattr(sys, 'frozen', False):
-        return os.path.join(sys._MEIPASS, 'bin', bin_name)
-    else:
-        return os.path.join(os.path.dirname(__file__), '..', 'bin', bin_name)
+from collections import deque
+from vc_modules.binaries import get_bin_path
+from vc_modules.probe import probe
+from vc_modules.engine import IO, stop_engine
+from vc_modules.engine_qt import JobTask, TrimTask
+from vc_modules.commands import build_single_remux_cmd
+from vc_modules.tracing import traced
+from vc_modules.trim import MODES, parse_range
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem,
-    QMessageBox, QFileDialog, QApplication
+    QMessageBox, QFileDialog, QApplication, QProgressBar, QLineEdit, QComboBox
 )
 from PyQt5.QtCore import Qt
 
@@ -21,6 +22,8 @@ class window1(QWidget):
         self.input_file = input_file
         self.target_format = target_format
         self.output_file = None
+        self.remux_queue = deque()  # 还没开始的任务，正在运行时新的打包排队等待
+        self.remux_task = None
 
         self.video_list = QListWidget()
         self.audio_list = QListWidget()
@@ -46,6 +49,21 @@ class window1(QWidget):
         tracks_line.addLayout(video_col)
         tracks_line.addLayout(audio_col)
 
+        # 按时间剪切，两个都留空时打包整个文件
+        self.trim_start = QLineEdit()
+        self.trim_start.setPlaceholderText("开始，如 1:30")
+        self.trim_end = QLineEdit()
+        self.trim_end.setPlaceholderText("结束，留空到结尾")
+        self.trim_mode = QComboBox()
+        for mode, name in MODES:
+            self.trim_mode.addItem(name, mode)
+        trim_line = QHBoxLayout()
+        trim_line.addWidget(QLabel("剪切："))
+        trim_line.addWidget(self.trim_start)
+        trim_line.addWidget(QLabel("到"))
+        trim_line.addWidget(self.trim_end)
+        trim_line.addWidget(self.trim_mode)
+
         self.select_output_btn = QPushButton("选择输出文件")
         self.select_output_btn.clicked.connect(self.select_output_file)
         self.output_label = QLabel("未选择输出文件")
@@ -53,71 +71,38 @@ class window1(QWidget):
         self.confirm_btn = QPushButton("开始打包")
         self.confirm_btn.clicked.connect(self.remux)
 
+        self.cancel_btn = QPushButton("取消当前任务")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_remux)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_label = QLabel("")
+
         layout = QVBoxLayout()
         layout.addWidget(file_label)
         layout.addWidget(format_label)
         layout.addLayout(tracks_line)
+        layout.addLayout(trim_line)
         layout.addWidget(self.select_output_btn)
         layout.addWidget(self.output_label)
         layout.addWidget(self.confirm_btn)
+        layout.addWidget(self.cancel_btn)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_label)
         layout.addStretch()
         self.setLayout(layout)
 
     def load_tracks(self):
         self.video_list.clear()
         self.audio_list.clear()
-        ffprobe_path = get_bin_path('ffprobe')
-        cmd = [ffprobe_path, '-v', 'error', '-show_streams', '-print_format', 'json', self.input_file]
         try:
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            info = json.loads(result.stdout.decode(errors='ignore'))
-            for stream in info.get('streams', []):
-                idx = stream.get('index', -1)
-                codec = stream.get('codec_name', '未知')
-                lang = stream.get('tags', {}).get('language', '')
-                if stream['codec_type'] == 'video':
-                    fr = stream.get('r_frame_rate', '')
-                    try:
-                        if fr and '/' in fr:
-                            num, den = fr.split('/')
-                            fr_val = float(num) / float(den) if float(den) != 0 else 0
-                        else:
-                            fr_val = float(fr) if fr else 0
-                    except:
-                        fr_val = 0
-                    width = stream.get('width', '')
-                    height = stream.get('height', '')
-                    br = stream.get('bit_rate', '')
-                    if not br:
-                        br = stream.get('tags', {}).get('BPS', '')
-                    if br:
-                        try:
-                            br_disp = f"{int(br)//1000} kbps"
-                        except:
-                            br_disp = str(br)
-                    else:
-                        br_disp = ''
-                    desc = f"#{idx} {codec} {lang} {width}x{height} {fr_val:.2f}fps {br_disp}".strip()
-                    item = QListWidgetItem(desc)
-                    item.setData(Qt.UserRole, idx)
-                    self.video_list.addItem(item)
-                elif stream['codec_type'] == 'audio':
-                    sr = stream.get('sample_rate', '')
-                    ch = stream.get('channels', '')
-                    br = stream.get('bit_rate', '')
-                    if not br:
-                        br = stream.get('tags', {}).get('BPS', '')
-                    if br:
-                        try:
-                            br_disp = f"{int(br)//1000} kbps"
-                        except:
-                            br_disp = str(br)
-                    else:
-                        br_disp = ''
-                    desc = f"#{idx} {codec} {lang} {sr}Hz {ch}ch {br_disp}".strip()
-                    item = QListWidgetItem(desc)
-                    item.setData(Qt.UserRole, idx)
-                    self.audio_list.addItem(item)
+            info = probe(self.input_file)
+            lists = {'video': self.video_list, 'audio': self.audio_list}
+            for record in info.records():
+                if record.codec_type in lists:
+                    item = QListWidgetItem(record.desc)
+                    item.setData(Qt.UserRole, record.index)
+                    lists[record.codec_type].addItem(item)
         except Exception as e:
             err_msg = str(e)
             if hasattr(e, 'stderr') and e.stderr:
@@ -141,79 +126,92 @@ class window1(QWidget):
             return
         v_idx = video_items[0].data(Qt.UserRole)
         a_idx = audio_items[0].data(Qt.UserRole)
-        ffprobe_path = get_bin_path('ffprobe')
-        cmd_probe = [ffprobe_path, '-v', 'error', '-show_streams', '-print_format', 'json', self.input_file]
+        # 允许在上一个任务运行时继续排队，但不能写同一个输出文件
+        busy_outputs = [t.output_file for t in self.remux_queue]
+        if self.remux_task is not None:
+            busy_outputs.append(self.remux_task.output_file)
+        if self.output_file in busy_outputs:
+            QMessageBox.warning(self, "提示", "该输出文件已在打包队列中，请选择其他输出文件")
+            return
         try:
-            result = subprocess.run(cmd_probe, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            info = json.loads(result.stdout.decode(errors='ignore'))
-            v_codec = None
-            a_codec = None
-            for stream in info.get('streams', []):
-                if stream['codec_type'] == 'video' and stream.get('index', -1) == v_idx:
-                    v_codec = stream.get('codec_name', '').lower()
-                if stream['codec_type'] == 'audio' and stream.get('index', -1) == a_idx:
-                    a_codec = stream.get('codec_name', '').lower()
-            target_fmt = self.target_format.lower()
-            need_vcodec = None
-            need_acodec = None
-            if target_fmt == 'avi':
-                if v_codec not in ('mpeg4', 'msmpeg4v2', 'msmpeg4v3', 'xvid', 'divx'):
-                    need_vcodec = 'mpeg4'
-                if a_codec not in ('mp3', 'ac3'):
-                    need_acodec = 'mp3'
-            elif target_fmt == 'wmv':
-                if v_codec not in ('wmv1', 'wmv2', 'wmv3'):
-                    need_vcodec = 'wmv2'
-                if a_codec not in ('wmav1', 'wmav2'):
-                    need_acodec = 'wmav2'
-            ffmpeg_path = get_bin_path('ffmpeg')
-            cmd = [
-                ffmpeg_path, '-y', '-i', self.input_file,
-                '-map', f'0:v:{self._stream_subidx(v_idx, "video")}',
-                '-map', f'0:a:{self._stream_subidx(a_idx, "audio")}'
-            ]
-            if need_vcodec:
-                cmd += ['-c:v', need_vcodec]
-            else:
-                cmd += ['-c:v', 'copy']
-            if need_acodec:
-                cmd += ['-c:a', need_acodec]
+            info = probe(self.input_file)
+            ffmpeg_path, input_file, output_file = get_bin_path('ffmpeg'), self.input_file, self.output_file
+
+            def build_cmd(trim=None, video_input=None):
+                return build_single_remux_cmd(ffmpeg_path, input_file, output_file, info, v_idx, a_idx,
+                                              self.target_format, trim, video_input)
+
+            cmd = build_cmd()  # 先检查轨道和格式，有问题直接提示
+            trim = parse_range(self.trim_start.text(), self.trim_end.text(), float(info.format.get('duration', 0) or 0))
+            if trim is None:
+                task = JobTask('remux', cmd, output_file, slot=IO)
             else:
-                cmd += ['-c:a', 'copy']
-            cmd += [self.output_file]
-            try:
-                ret = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                if ret.returncode == 0:
-                    QMessageBox.information(self, "成功", "打包完成！")
-                else:
-                    QMessageBox.warning(self, "失败", f"打包失败，请检查文件和格式。\n{ret.stderr.decode(errors='ignore')}")
-            except Exception as e2:
-                QMessageBox.warning(self, "错误", f"ffmpeg执行出错：{e2}")
+                task = TrimTask(info, output_file, build_cmd, self.target_format, v_idx, trim[0], trim[1],
+                                self.trim_mode.currentData())
+            self.remux_queue.append(task)
+            self.start_next_remux()
         except Exception as e:
             err_msg = str(e)
             if hasattr(e, 'stderr') and e.stderr:
                 err_msg += f"\nffprobe stderr:\n{e.stderr.decode(errors='ignore') if hasattr(e.stderr, 'decode') else str(e.stderr)}"
             QMessageBox.warning(self, "错误", f"打包出错：{err_msg}")
 
-    def _stream_subidx(self, idx, typ):
-        ffprobe_path = get_bin_path('ffprobe')
-        cmd = [ffprobe_path, '-v', 'error', '-show_streams', '-print_format', 'json', self.input_file]
-        try:
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            info = json.loads(result.stdout.decode(errors='ignore'))
-            subidx = -1
-            for stream in info.get('streams', []):
-                if stream['codec_type'] == typ:
-                    subidx += 1
-                if stream.get('index', -1) == idx:
-                    return subidx
-            return 0
-        except:
-            return 0
+    def start_next_remux(self):
+        if self.remux_task is not None:
+            self.update_queue_label()
+            return
+        if not self.remux_queue:
+            self.cancel_btn.setEnabled(False)
+            return
+        self.remux_task = self.remux_queue.popleft()
+        self.remux_task.progress.connect(self.on_remux_progress)
+        self.remux_task.finished.connect(self.on_remux_finished)
+        self.progress_bar.setValue(0)
+        self.cancel_btn.setEnabled(True)
+        self.update_queue_label()
+        self.remux_task.start()
+
+    def update_queue_label(self, text=""):
+        if self.remux_queue:
+            text = f"{text}  （排队中 {len(self.remux_queue)} 个）".strip()
+        self.progress_label.setText(text)
+
+    @traced(cat='ui')
+    def on_remux_progress(self, percent, text):
+        if percent >= 0:
+            self.progress_bar.setValue(int(percent))
+        self.update_queue_label(text)
+
+    def cancel_remux(self):
+        if self.remux_task is not None:
+            self.remux_task.cancel()
+
+    @traced(cat='ui')
+    def on_remux_finished(self, success, info):
+        task = self.remux_task
+        task.wait()
+        self.remux_task = None
+        self.start_next_remux()
+        if success:
+            self.progress_bar.setValue(100)
+            QMessageBox.information(self, "成功", f"打包完成！\n{info}")
+        elif task.cancelled:
+            self.progress_bar.setValue(0)
+            self.update_queue_label("已取消，未完成的输出文件已删除")
+        else:
+            QMessageBox.warning(self, "失败", f"打包失败，请检查文件和格式。\n{info}")
+
+    def closeEvent(self, event):
+        self.remux_queue.clear()
+        if self.remux_task is not None:
+            self.remux_task.cancel()
+            self.remux_task.wait()
+        super().closeEvent(event)
 
 # 测试用
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(stop_engine)
     w = window1("test.mkv", "avi")
     w.show()
     sys.exit(app.exec_())
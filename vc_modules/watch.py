@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import time
+import errno
+import select
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from vc_modules.binaries import get_bin_path
+from vc_modules.journal import get_journal
+from vc_modules.commands import build_convert_cmd, build_remux_cmd, convert_output_kwargs, default_remux_selection
+from vc_modules.engine import ENCODE, IO, get_engine
+from vc_modules.media_index import VIDEO_EXTENSIONS, list_media
+from vc_modules.scheduler import BACKGROUND
+
+# 监视文件夹：新文件的大小和修改时间在 settle 秒内不再变化（拷贝完成）后自动转换或重新打包，
+# 输出按相对路径放到输出目录下。Linux 上用 inotify，其他系统或 inotify 不可用时定时扫描。
+# 处理过的文件记录在输出目录的状态文件里，重启后不会重复处理，也不会重新探测。
+
+STATE_FILE = '.converter_watch.json'
+RESCAN_SECONDS = 60  # inotify 模式下也定期全量扫描一次，防止事件队列溢出时漏掉文件
+
+# inotify 事件掩码
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    # 通过 ctypes 直接调用 libc 的 inotify，不依赖第三方库
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self.watches = {}  # wd -> 目录
+        self.overflowed = False
+
+    def add_tree(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            self.add(dirpath)
+
+    def add(self, path):
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd >= 0:
+            self.watches[wd] = path
+
+    def read(self, timeout):
+        # 返回发生变化的路径；新建的子目录自动加入监视
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        paths = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                    paths.extend(_scan(path))
+            else:
+                paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _scan(root):
+    return list_media([root])
+
+
+def select_tracks(info, target_format, rule='all', languages=None):
+    # rule: all 全部可用轨道 / first 只要第一条视频和音频；languages 不为空时按语言过滤音轨和字幕，
+    # 一条都匹配不上时保留全部，避免输出没有声音
+    videos, audios, subtitles = default_remux_selection(info, target_format)
+    if languages:
+        def filter_lang(idxs):
+            keep = [i for i in idxs if (info.stream(i) or {}).get('tags', {}).get('language', '') in languages]
+            return keep or idxs
+        audios = filter_lang(audios)
+        subtitles = [i for i in subtitles
+                     if (info.stream(i) or {}).get('tags', {}).get('language', '') in languages]
+    if rule == 'first':
+        return videos[:1], audios[:1], []
+    return videos, audios, subtitles
+
+
+class WatchFolder:
+    def __init__(self, input_dir, output_dir, target_format, action='convert', rule='all', languages=None,
+                 threads=None, jobs=1, settle=5.0, poll_interval=2.0, use_inotify=True, log=None):
+        self.input_dir = os.path.abspath(input_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.target_format = target_format.lower()
+        self.action = action
+        self.rule = rule
+        self.languages = set(languages or [])
+        self.threads = threads
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.log = log or (lambda msg: print(msg, flush=True))
+        self.state_path = os.path.join(self.output_dir, STATE_FILE)
+        self.state = self._load_state()  # 路径 -> {size, mtime_ns, status}
+        self.pending = {}   # 路径 -> (size, mtime_ns, 最后一次变化的时间)
+        self.running = set()
+        self.known = {}     # 路径 -> (size, mtime_ns)，轮询时用于发现变化
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, jobs))
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        with self._lock:
+            data = dict(self.state)
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def output_path(self, input_file):
+        rel = os.path.relpath(input_file, self.input_dir)
+        return os.path.join(self.output_dir, os.path.splitext(rel)[0] + '.' + self.target_format)
+
+    def _already_done(self, path, size, mtime_ns):
+        entry = self.state.get(path)
+        return entry is not None and entry['size'] == size and entry['mtime_ns'] == mtime_ns
+
+    def notice(self, path):
+        # 发现新文件或文件有变化：记录当前大小和时间，等它稳定
+        if os.path.splitext(path)[1].lower() not in VIDEO_EXTENSIONS or os.path.basename(path).startswith('.'):
+            return
+        if path.startswith(self.output_dir + os.sep):
+            return  # 输出目录在输入目录里面时，不处理自己的输出
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)
+            return
+        sig = (st.st_size, st.st_mtime_ns)
+        self.known[path] = sig
+        if path in self.running or self._already_done(path, *sig):
+            return
+        old = self.pending.get(path)
+        if old is None or old[:2] != sig:
+            self.pending[path] = (sig[0], sig[1], time.monotonic())
+
+    def check_pending(self):
+        # 大小和修改时间在 settle 秒内没变的文件交给线程池
+        now = time.monotonic()
+        for path, (size, mtime_ns, changed) in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self.pending[path] = (st.st_size, st.st_mtime_ns, now)
+                continue
+            if now - changed < self.settle or size == 0:
+                continue
+            del self.pending[path]
+            self.running.add(path)
+            self._pool.submit(self._process, path, size, mtime_ns)
+
+    def rescan(self):
+        for path in _scan(self.input_dir):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if self.known.get(path) != (st.st_size, st.st_mtime_ns):
+                self.notice(path)
+
+    def build_cmd(self, input_file, output_file):
+        ffmpeg_path = get_bin_path('ffmpeg')
+        if self.action == 'convert':
+            return build_convert_cmd(ffmpeg_path, input_file, output_file,
+                                     convert_output_kwargs(self.target_format, self.threads))
+        from vc_modules.probe import probe
+        info = probe(input_file)
+        videos, audios, subtitles = select_tracks(info, self.target_format, self.rule, self.languages)
+        return build_remux_cmd(ffmpeg_path, input_file, output_file, info, videos, audios, subtitles,
+                               self.target_format)
+
+    def _process(self, path, size, mtime_ns):
+        output_file = self.output_path(path)
+        started = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            cmd = self.build_cmd(path, output_file)
+            # 作为后台任务交给引擎：输出缓存、任务日志和临时文件照旧，ffmpeg 降低优先级，机器忙时暂缓启动
+            engine = get_engine()
+            slot = ENCODE if self.action == 'convert' else IO
+            ok, info, stderr = engine.submit(engine.run_job('watch', cmd, output_file, path, slot=slot,
+                                                            priority=BACKGROUND)).result()
+            status = 'done' if ok else 'failed'
+            if ok:
+                detail = output_file if stderr is not None else f"{output_file}（缓存）"
+            else:
+                detail = stderr.last_line() if stderr is not None and stderr.last_line() else info
+        except Exception as e:
+            status, detail = 'failed', str(e)
+        elapsed = time.monotonic() - started
+        self.log(f"[{'完成' if status == 'done' else '失败'}] {path} ({elapsed:.1f}s): {detail}")
+        with self._lock:
+            # 失败的也记下来，文件没变就不反复重试；重新拷贝一次即可再次触发
+            self.state[path] = {'size': size, 'mtime_ns': mtime_ns, 'status': status}
+            self.running.discard(path)
+        try:
+            self._save_state()
+        except OSError as e:
+            self.log(f"[警告] 状态文件写入失败: {e}")
+
+    def run(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        os.makedirs(self.output_dir, exist_ok=True)
+        journal = get_journal()
+        if journal is not None:
+            # 上次异常退出时没做完的文件不在状态文件里，扫描时会重新处理；旧的任务记录直接关闭，
+            # 免得以后主页或 resume 清理时删掉新任务正在写的同名临时文件
+            stale = journal.discard(('watch',))
+            if stale:
+                self.log(f"[提示] 关闭了 {len(stale)} 个上次没有完成的监视任务记录")
+        inotify = None
+        if self.use_inotify and sys.platform.startswith('linux'):
+            try:
+                inotify = Inotify()
+                inotify.add_tree(self.input_dir)
+            except OSError as e:
+                self.log(f"[提示] inotify 不可用（{e}），改为每 {self.poll_interval}s 扫描一次")
+                inotify = None
+        self.log(f"[监视] {self.input_dir} -> {self.output_dir}（{self.action} {self.target_format}，"
+                 f"{'inotify' if inotify else '轮询'}）")
+        self.rescan()
+        last_scan = time.monotonic()
+        try:
+            while not stop_event.is_set():
+                if inotify is not None:
+                    # 有文件等待稳定时缩短等待时间，按时检查
+                    timeout = min(self.poll_interval, self.settle) if self.pending else self.poll_interval
+                    for path in inotify.read(timeout):
+                        self.notice(path)
+                    if inotify.overflowed or time.monotonic() - last_scan >= RESCAN_SECONDS:
+                        inotify.overflowed = False
+                        self.rescan()
+                        last_scan = time.monotonic()
+                else:
+                    stop_event.wait(self.poll_interval)
+                    self.rescan()
+                self.check_pending()
+        finally:
+            if inotify is not None:
+                inotify.close()
+            self._pool.shutdown(wait=True)
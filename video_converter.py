@@ -1,38 +1,92 @@
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout,
-    QFileDialog, QComboBox, QMessageBox, QHBoxLayout
+    QFileDialog, QComboBox, QMessageBox, QHBoxLayout, QProgressBar, QCheckBox, QListWidget, QListWidgetItem
 )
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import Qt
 # import assets.ffmpeg as ffmpeg
 import os
+import asyncio
+import threading
 
-import subprocess
-
-class ConvertThread(QThread):
-    finished = pyqtSignal(bool, str)
+from vc_modules.binaries import get_bin_path
+from vc_modules.capabilities import cached_capabilities, get_capabilities
+from vc_modules.commands import (
+    RENDITION_HEIGHTS, build_convert_cmd, build_rendition_cmd, convert_output_kwargs, convert_output_path,
+    rendition_output_path
+)
+from vc_modules.engine import ENCODE, get_engine, stop_engine
+from vc_modules.engine_qt import EngineTask
+from vc_modules.journal import JournaledJob
+from vc_modules.segmented import convert_segmented
+from vc_modules.tracing import traced
 
-    def __init__(self, input_file, output_file, output_kwargs):
-        super().__init__()
+class ConvertTask(EngineTask):
+    def __init__(self, input_file, output_file, output_kwargs, segmented=False, workers=None):
+        super().__init__(output_file)
         self.input_file = input_file
-        self.output_file = output_file
         self.output_kwargs = output_kwargs
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.ffmpeg_path = os.path.join(base_dir, "assets", "ffmpeg")
+        self.segmented = segmented
+        self.workers = workers
+        self.ffmpeg_path = get_bin_path('ffmpeg')
 
-    def run(self):
+    async def run(self):
+        engine = get_engine()
+        cmd = build_convert_cmd(self.ffmpeg_path, self.input_file, self.output_file, self.output_kwargs)
+        if not self.segmented:
+            ok, info, stderr = await engine.run_job('convert', cmd, self.output_file, self.input_file,
+                                                    on_progress=self.report)
+            if ok and stderr is None:
+                self.progress.emit(100.0, "已使用缓存的结果")
+            return ok, info
+        # 分段并行：按关键帧切段，多进程同时编码后无损拼接到临时文件；整个分段任务占一个编码名额
+        journal = JournaledJob('convert', cmd, self.output_file, {'segmented': True})
+        journal.running()
+        output_format = os.path.splitext(self.output_file)[1].lstrip('.').lower()
+        cancel_event = threading.Event()
+        step = asyncio.ensure_future(engine.run_blocking(convert_segmented, self.input_file, journal.tmp, output_format,
+                                                         self.output_kwargs, self.workers, self.progress.emit,
+                                                         cancel_event, slot=ENCODE))
         try:
-            cmd = [self.ffmpeg_path, '-i', self.input_file]
-            # 添加输出参数
-            if 'vcodec' in self.output_kwargs:
-                cmd += ['-vcodec', self.output_kwargs['vcodec']]
-            if 'threads' in self.output_kwargs:
-                cmd += ['-threads', str(self.output_kwargs['threads'])]
-            cmd += [self.output_file]
-            subprocess.run(cmd, check=True)
-            self.finished.emit(True, self.output_file)
+            success, info = await asyncio.shield(step)
+        except asyncio.CancelledError:
+            # 线程里的编码不会随协程取消，通知它结束各段进程，等它退出后再删临时文件、记为已取消
+            cancel_event.set()
+            await asyncio.gather(step, return_exceptions=True)
+            journal.finish(False, cancelled=True)
+            raise
         except Exception as e:
-            self.finished.emit(False, str(e))
+            journal.finish(False, error=str(e))
+            raise
+        success, error = journal.finish(success, error='' if success else info)
+        return success, self.output_file if success else error
+
+
+class CapabilityTask(EngineTask):
+    # 第一次运行或换了 ffmpeg 时能力检测要试编码，放到引擎里做；返回可用的硬件 H.264 编码器
+    async def run(self):
+        caps = await get_engine().run_blocking(get_capabilities)
+        return True, (caps['hardware_h264'] or [''])[0]
+
+
+class RenditionTask(EngineTask):
+    # 一次解码写出多个版本：renditions 为 [(输出文件, 格式, 高度或 None)]，第一个是主输出
+    def __init__(self, input_file, renditions, threads=None):
+        super().__init__(renditions[0][0])
+        self.input_file = input_file
+        self.renditions = renditions
+        self.threads = threads
+
+    async def run(self):
+        engine = get_engine()
+        info = await engine.probe(self.input_file)
+        cmd = build_rendition_cmd(get_bin_path('ffmpeg'), self.input_file, info, self.renditions, self.threads)
+        outputs = [r[0] for r in self.renditions]
+        ok, result, stderr = await engine.run_job('convert', cmd, outputs[0], self.input_file,
+                                                  on_progress=self.report, extra_outputs=outputs[1:])
+        if ok and stderr is None:
+            self.progress.emit(100.0, "已使用缓存的结果")
+        return ok, "\n".join(outputs) if ok else result
 
 class VideoConverter(QWidget):
     def __init__(self):
@@ -44,6 +98,7 @@ class VideoConverter(QWidget):
 
         self.input_file = ""
         self.output_file = ""
+        self.task = None
 
         self.label = QLabel("选择要转换的视频文件")
         self.select_btn = QPushButton("选择文件")
@@ -60,9 +115,30 @@ class VideoConverter(QWidget):
         core_count = os.cpu_count() or 1
         self.corenumber_combo.addItems([str(i) for i in range(1, core_count + 1)])
 
+        self.segmented_check = QCheckBox("分段并行转码（长视频，按核心数同时编码多段）")
+
+        # 同一次解码同时写出其他格式、分辨率（如 mkv 母版 + 720p 代理）
+        self.extra_label = QLabel("同时输出")
+        self.extra_format_combo = QComboBox()
+        self.extra_format_combo.addItems(self.supported_formats)
+        self.extra_height_combo = QComboBox()
+        self.extra_height_combo.addItem("原始分辨率", 0)
+        for height in RENDITION_HEIGHTS:
+            self.extra_height_combo.addItem(f"{height}p", height)
+        self.add_extra_btn = QPushButton("添加")
+        self.add_extra_btn.clicked.connect(self.add_extra_output)
+        self.remove_extra_btn = QPushButton("删除选中")
+        self.remove_extra_btn.clicked.connect(self.remove_extra_output)
+        self.extra_list = QListWidget()
+        self.extra_list.setMaximumHeight(90)
+
         self.convert_btn = QPushButton("开始转换")
         self.convert_btn.clicked.connect(self.convert_video)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_label = QLabel("")
+
 
         # lines:
         file_input_line = QHBoxLayout()
@@ -78,29 +154,76 @@ class VideoConverter(QWidget):
         core_counter_line.addWidget(self.corenumber_label)
         core_counter_line.addWidget(self.corenumber_combo)
 
+        extra_line = QHBoxLayout()
+        extra_line.addWidget(self.extra_label)
+        extra_line.addWidget(self.extra_format_combo)
+        extra_line.addWidget(self.extra_height_combo)
+        extra_line.addWidget(self.add_extra_btn)
+        extra_line.addWidget(self.remove_extra_btn)
+
         layout = QVBoxLayout()
         # layout.addWidget(self.label)
         layout.addLayout(file_input_line)
         layout.addLayout(file_output_type_line)
         layout.addLayout(core_counter_line)
+        layout.addWidget(self.segmented_check)
+        layout.addLayout(extra_line)
+        layout.addWidget(self.extra_list)
         layout.addWidget(self.convert_btn)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_label)
         layout.addStretch()  # 让控件都靠上，剩余空间在底部
         self.setLayout(layout)
 
 
+        caps = cached_capabilities()
+        self.hardware_encoder = (caps['hardware_h264'] or [None])[0] if caps is not None else None
+        self.caps_task = None
+        if caps is None:
+            # 还没有检测结果：先按软件编码显示，检测完再更新；检测完之前不能开始转换，
+            # 否则选编码器时要在界面线程里等检测，还可能和界面上显示的选项不一致
+            self.convert_btn.setEnabled(False)
+            self.convert_btn.setText("正在检测编码器...")
+            self.caps_task = CapabilityTask()
+            self.caps_task.finished.connect(self.on_capabilities_ready)
+            self.caps_task.start()
         self.update_core_options(self.format_combo.currentText())  # 初始化时调用
         
     def update_core_options(self, format_text):
-        if format_text in ["mp4", "mov"]:
+        # 只有本机确实有硬件 H.264 编码器时才锁定为硬件加速，否则用 libx264 多线程
+        if format_text in ["mp4", "mov"] and self.hardware_encoder:
             self.corenumber_combo.clear()
             self.corenumber_combo.addItem("硬件加速")
             self.corenumber_combo.setEnabled(False)
+            self.segmented_check.setChecked(False)
+            self.segmented_check.setEnabled(False)
         else:
             self.corenumber_combo.setEnabled(True)
+            self.segmented_check.setEnabled(True)
             self.corenumber_combo.clear()
             self.corenumber_combo.addItems([str(i) for i in range(1, 11)])
 
 
+    def on_capabilities_ready(self, success, encoder):
+        self.caps_task = None
+        self.hardware_encoder = (encoder or None) if success else None
+        self.update_core_options(self.format_combo.currentText())
+        self.convert_btn.setText("开始转换")
+        self.convert_btn.setEnabled(True)
+
+    def add_extra_output(self):
+        rendition = (self.extra_format_combo.currentText(), self.extra_height_combo.currentData() or None)
+        existing = [self.extra_list.item(i).data(Qt.UserRole) for i in range(self.extra_list.count())]
+        if rendition in existing:
+            return
+        item = QListWidgetItem(f"{rendition[0]}  {rendition[1]}p" if rendition[1] else f"{rendition[0]}  原始分辨率")
+        item.setData(Qt.UserRole, rendition)
+        self.extra_list.addItem(item)
+
+    def remove_extra_output(self):
+        for item in self.extra_list.selectedItems():
+            self.extra_list.takeItem(self.extra_list.row(item))
+
     def select_file(self):
         file, _ = QFileDialog.getOpenFileName(self, "选择视频文件", "", "视频文件 (*.mp4 *.avi *.mov *.mkv *.flv *.wmv)")
         if file:
@@ -114,27 +237,55 @@ class VideoConverter(QWidget):
             return
 
         output_format = self.format_combo.currentText()
-        base, _ = os.path.splitext(self.input_file)
-        self.output_file = f"{base}_converted.{output_format}"
+        self.output_file = convert_output_path(self.input_file, output_format)
 
         # 使用硬件加速和多线程
-        output_kwargs = {}
-        if output_format in ["mp4", "mov"]:
-            output_kwargs = {
-                'vcodec': 'h264_videotoolbox',
-                # 'threads': self.corenumber_combo.currentText(),
-            }
-        else:
-            output_kwargs = {    
-                # 'vcodec': 'libx264',
-                'threads': self.corenumber_combo.currentText(),
-            }
+        output_kwargs = convert_output_kwargs(output_format, self.corenumber_combo.currentText())
 
+        extras = [self.extra_list.item(i).data(Qt.UserRole) for i in range(self.extra_list.count())]
+        if extras:
+            self.convert_renditions(output_format, extras)
+            return
+
+        self.convert_btn.setEnabled(False)
+        segmented = self.segmented_check.isChecked()
+        workers = int(self.corenumber_combo.currentText()) if segmented else None
+        if segmented:
+            # 每段单线程编码，核心数即同时运行的进程数
+            output_kwargs.pop('threads', None)
+        self.task = ConvertTask(self.input_file, self.output_file, output_kwargs, segmented, workers)
+        self.task.finished.connect(self.on_convert_finished)
+        self.task.progress.connect(self.on_progress)
+        self.progress_bar.setValue(0)
+        self.progress_label.setText("")
+        self.task.start()
+
+    def convert_renditions(self, output_format, extras):
+        # 主输出加上附加的版本，一个 ffmpeg 进程只解码一次
+        if self.segmented_check.isChecked():
+            QMessageBox.warning(self, "警告", "分段并行转码不能同时输出多个版本，请取消其中一项")
+            return
+        renditions = [(self.output_file, output_format, None)]
+        for fmt, height in extras:
+            output_file = rendition_output_path(self.input_file, fmt, height)
+            if output_file not in [r[0] for r in renditions]:
+                renditions.append((output_file, fmt, height))
+        threads = self.corenumber_combo.currentText()
         self.convert_btn.setEnabled(False)
-        self.thread = ConvertThread(self.input_file, self.output_file, output_kwargs)
-        self.thread.finished.connect(self.on_convert_finished)
-        self.thread.start()
+        self.task = RenditionTask(self.input_file, renditions, threads if threads.isdigit() else None)
+        self.task.finished.connect(self.on_convert_finished)
+        self.task.progress.connect(self.on_progress)
+        self.progress_bar.setValue(0)
+        self.progress_label.setText("")
+        self.task.start()
+
+    @traced(cat='ui')
+    def on_progress(self, percent, text):
+        if percent >= 0:
+            self.progress_bar.setValue(int(percent))
+        self.progress_label.setText(text)
 
+    @traced(cat='ui')
     def on_convert_finished(self, success, info):
         self.convert_btn.setEnabled(True)
         if success:
@@ -142,10 +293,18 @@ class VideoConverter(QWidget):
         else:
             QMessageBox.critical(self, "错误", f"转换失败：{info}")
 
+    def closeEvent(self, event):
+        # 关闭窗口时取消正在进行的转换，等 ffmpeg 退出、临时文件删除后再关
+        if self.task is not None and self.task.isRunning():
+            self.task.cancel()
+            self.task.wait()
+        super().closeEvent(event)
+
 # ...existing code...
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(stop_engine)
     window = VideoConverter()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
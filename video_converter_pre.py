@@ -1,21 +1,52 @@
 
-def get_ffprobe_path():
-    import sys, os
-    if getattr(sys, 'frozen', False):
-        # PyInstaller打包后
-        return os.path.join(sys._MEIPASS, 'bin', 'ffprobe')
-    else:
-        # 开发环境
-        return os.path.join(os.path.dirname(__file__), 'bin', 'ffprobe')
-    
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout,
-    QFileDialog, QComboBox, QMessageBox, QHBoxLayout, QListWidget, QGroupBox
+    QFileDialog, QComboBox, QMessageBox, QHBoxLayout, QListWidget, QGroupBox,
+    QTableView, QAbstractItemView, QHeaderView, QLineEdit, QListWidgetItem
 )
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QSize
+from PyQt5.QtGui import QIcon, QPixmap
 # import ffmpeg
 import os
+import time
+from vc_modules.binaries import get_bin_path
+from vc_modules.commands import build_remux_cmd, remux_output_path
+from vc_modules.engine import IO, stop_engine
+from vc_modules.scheduler import BACKGROUND
+from vc_modules.engine_qt import BulkProbeTask, JobTask, ProbeTask, ThumbnailTask
+from vc_modules.stream_model import StreamFilterModel, StreamTableModel
+from vc_modules.thumbnails import THUMB_WIDTH
+from vc_modules.media_index import get_index
+from vc_modules.tracing import traced
+
+
+class IndexScanThread(QThread):
+    # 增量扫描整个媒体库文件夹，结果写入 SQLite 索引，之后打开这些文件不再调用 ffprobe
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, folder):
+        super().__init__()
+        self.folder = folder
+
+    def run(self):
+        try:
+            index = get_index()
+            if index is None:
+                self.finished.emit(False, "媒体库索引不可用")
+                return
+            start = time.perf_counter()
+            stats = index.rescan(self.folder, workers=min(16, (os.cpu_count() or 1) * 2), progress=self.progress.emit)
+            msg = (f"共 {stats['scanned']} 个文件，新探测 {stats['probed']} 个，"
+                   f"失败 {len(stats['failed'])} 个，移除 {stats['removed']} 条，"
+                   f"耗时 {time.perf_counter() - start:.1f}s")
+            self.finished.emit(True, msg)
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+TYPE_FILTERS = [("全部轨道", ''), ("视频", 'video'), ("音频", 'audio'), ("字幕", 'subtitle')]
+
 
 class vc_pre(QWidget):
     def __init__(self):
@@ -28,13 +59,68 @@ class vc_pre(QWidget):
         self.multi_track_formats = ["mp4", "mov", "mkv"]
 
         self.input_file = None 
+        self._probe_generation = 0
+        self._probe_task = None
+        self._probe_tasks = []  # 被取消但还没结束的探测也要保留引用，等它在引擎里退出
+        self._import_task = None
+        self._import_tasks = []
+        self._import_failed = []  # [(路径, 错误信息)]
+        self._import_total = 0
+        self._import_done = 0
+        self._batch_tasks = []
+        self._batch_failed = []
+        self._batch_done = 0  # 已经收到 finished 的任务数
+        self._keep_batch = False  # 进入下一步时关闭窗口，不取消批量打包
+        self._import_infos = {}  # 路径 -> 导入时的探测结果，批量打包直接用，不再调用 ffprobe
 
         self.input_select_instruction = QLabel("选择要转换的视频文件")
         self.input_select_btn = QPushButton("选择文件")
         self.input_select_btn.clicked.connect(self.select_file)
         self.input_select_result = QLabel("未选择文件")
+        self.scan_btn = QPushButton("扫描媒体库文件夹")
+        self.scan_btn.clicked.connect(self.scan_library)
+        self.import_btn = QPushButton("导入文件夹")
+        self.import_btn.clicked.connect(self.import_folder)
         self.input_select_result.setWordWrap(True)
 
+        # 批量导入的所有文件的轨道表：可以把文件或文件夹拖进窗口，探测完一个显示一个；
+        # 点击某一行查看该文件，勾选的轨道可以一次批量打包
+        self.setAcceptDrops(True)
+        self.stream_model = StreamTableModel(self)
+        self.stream_filter = StreamFilterModel(self)
+        self.stream_filter.setSourceModel(self.stream_model)
+        self.stream_table = QTableView()
+        self.stream_table.setModel(self.stream_filter)
+        self.stream_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.stream_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.stream_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.stream_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.stream_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.stream_table.setSortingEnabled(True)
+        self.stream_table.verticalHeader().setVisible(False)
+        self.stream_table.verticalHeader().setDefaultSectionSize(22)  # 固定行高，不用逐行计算
+        self.stream_table.selectionModel().currentRowChanged.connect(self.on_import_selected)
+
+        self.type_filter = QComboBox()
+        for label, _ in TYPE_FILTERS:
+            self.type_filter.addItem(label)
+        self.type_filter.currentIndexChanged.connect(self.apply_stream_filter)
+        self.text_filter = QLineEdit()
+        self.text_filter.setPlaceholderText("按编码或语言筛选，如 aac jpn")
+        self.text_filter.textChanged.connect(self.apply_stream_filter)
+        self.check_btn = QPushButton("勾选筛选结果")
+        self.check_btn.clicked.connect(lambda: self.stream_model.set_checked(self.stream_filter.source_rows()))
+        self.uncheck_btn = QPushButton("清除勾选")
+        self.uncheck_btn.clicked.connect(self.stream_model.clear_checked)
+        self.batch_btn = QPushButton("批量打包勾选的轨道")
+        self.batch_btn.clicked.connect(self.remux_checked)
+        self.filter_line = QHBoxLayout()
+        for w in (self.type_filter, self.text_filter, self.check_btn, self.uncheck_btn, self.batch_btn):
+            self.filter_line.addWidget(w)
+        self.stream_table.setVisible(False)
+        self._set_filter_visible(False)
+        self.import_label = QLabel("")
+
         # 新增：视频总信息显示区
         self.summary_label = QLabel("")
         self.summary_label.setWordWrap(True)
@@ -48,6 +134,21 @@ class vc_pre(QWidget):
         self.audio_list = QListWidget()
         self.subtitle_list = QListWidget()
 
+        # 选中的视频轨道的关键帧预览条
+        self.video_list.currentItemChanged.connect(self.show_thumbnails)
+        self.thumb_label = QLabel("")
+        self.thumb_strip = QListWidget()
+        self.thumb_strip.setViewMode(QListWidget.IconMode)
+        self.thumb_strip.setFlow(QListWidget.LeftToRight)
+        self.thumb_strip.setWrapping(False)
+        self.thumb_strip.setMovement(QListWidget.Static)
+        self.thumb_strip.setIconSize(QSize(THUMB_WIDTH, THUMB_WIDTH * 9 // 16))
+        self.thumb_strip.setFixedHeight(THUMB_WIDTH * 9 // 16 + 30)
+        self.thumb_strip.setVisible(False)
+        self._thumb_task = None
+        self._thumb_tasks = []
+        self._thumbs = {}  # 流序号 -> [jpg 数据] 或错误信息
+
         self.confirm_btn = QPushButton("确认")
         self.confirm_btn.clicked.connect(self.go_to_confirm_page)
 
@@ -79,6 +180,8 @@ class vc_pre(QWidget):
         file_input_line = QHBoxLayout()
         file_input_line.addWidget(self.input_select_instruction)
         file_input_line.addWidget(self.input_select_btn)
+        file_input_line.addWidget(self.import_btn)
+        file_input_line.addWidget(self.scan_btn)
 
         output_format_line = QHBoxLayout()
         output_format_line.addWidget(self.format_label)
@@ -87,8 +190,13 @@ class vc_pre(QWidget):
         layout = QVBoxLayout()
         layout.addLayout(file_input_line)
         layout.addWidget(self.input_select_result)
+        layout.addLayout(self.filter_line)
+        layout.addWidget(self.stream_table)
+        layout.addWidget(self.import_label)
         layout.addWidget(self.summary_label)  # 新增：总信息显示区
         layout.addLayout(tracks_line)
+        layout.addWidget(self.thumb_label)
+        layout.addWidget(self.thumb_strip)
         layout.addLayout(output_format_line)
         layout.addWidget(self.confirm_btn)
         layout.addStretch()
@@ -102,25 +210,210 @@ class vc_pre(QWidget):
             self.input_select_result.setText(f"已选择文件: {os.path.abspath(file)}")
             self.update_track_lists(file)
 
+    def import_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择要导入的文件夹")
+        if folder:
+            self.import_paths([folder])
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            event.acceptProposedAction()
+            self.import_paths(paths)
+
+    def _set_filter_visible(self, visible):
+        for i in range(self.filter_line.count()):
+            self.filter_line.itemAt(i).widget().setVisible(visible)
+
+    def import_paths(self, paths):
+        # 上一次导入还没结束时取消，没探测的文件不再探测
+        if self._import_task is not None:
+            self._import_task.cancel()
+        self.stream_model.clear()
+        self._import_infos = {}
+        self._import_failed = []
+        self._import_total = self._import_done = 0
+        self.import_label.setText("正在查找视频文件...")
+        task = BulkProbeTask(paths)
+        task.listed.connect(self.on_import_listed)
+        task.probed.connect(self.on_import_probed)
+        task.failed.connect(self.on_import_failed)
+        task.done.connect(self.on_import_done)
+        self._import_tasks = [t for t in self._import_tasks if t.isRunning()] + [task]
+        self._import_task = task
+        task.start()
+
+    def _is_current_import(self):
+        return self.sender() is self._import_task
+
+    @traced(cat='ui')
+    def on_import_listed(self, files):
+        if not self._is_current_import():
+            return
+        self._import_total = len(files)
+        self.stream_table.setVisible(bool(files))
+        self._set_filter_visible(bool(files))
+        self.import_label.setText(f"共 {len(files)} 个视频文件，正在探测..." if files else "没有找到视频文件")
+
+    def _update_import_label(self, elapsed=None):
+        text = f"已探测 {self._import_done}/{self._import_total} 个文件，共 {self.stream_model.total()} 条轨道"
+        if self._import_failed:
+            text += f"，{len(self._import_failed)} 个无法读取（鼠标悬停查看）"
+        if elapsed is not None:
+            text += f"，用时 {elapsed:.1f}s"
+        self.import_label.setText(text)
+        self.import_label.setToolTip("\n".join(f"{os.path.basename(p)}: {e.splitlines()[0] if e else ''}"
+                                               for p, e in self._import_failed[:50]))
+
+    @traced(cat='ui')
+    def on_import_probed(self, path, info):
+        if not self._is_current_import():
+            return
+        self._import_done += 1
+        self._import_infos[info.path] = info
+        self.stream_model.append(info.records())
+        self._update_import_label()
+
+    @traced(cat='ui')
+    def on_import_failed(self, path, err_msg):
+        if not self._is_current_import():
+            return
+        self._import_done += 1
+        self._import_failed.append((path, err_msg))
+        self._update_import_label()
+
+    @traced(cat='ui')
+    def on_import_done(self, ok, failed, elapsed):
+        if not self._is_current_import():
+            return
+        self._import_task = None
+        self._update_import_label(elapsed)
+
+    def apply_stream_filter(self):
+        self.stream_filter.set_filter(TYPE_FILTERS[self.type_filter.currentIndex()][1], self.text_filter.text())
+
+    def on_import_selected(self, current, previous):
+        if not current.isValid():
+            return
+        path = self.stream_model.record(self.stream_filter.mapToSource(current).row()).path
+        if path == self.input_file:
+            return
+        # 导入时已经探测过，这里直接命中缓存
+        self.input_file = path
+        self.input_select_result.setText(f"已选择文件: {os.path.abspath(path)}")
+        self.update_track_lists(path)
+
+    def remux_checked(self):
+        # 每个文件按勾选的轨道打包成一个输出，交给引擎按 io 名额排队运行；
+        # 作为后台任务运行，其他窗口里的打包、转换会优先
+        records = self.stream_model.checked_records()
+        if not records:
+            QMessageBox.warning(self, "提示", "请先勾选要打包的轨道")
+            return
+        if self._batch_done < len(self._batch_tasks):
+            QMessageBox.warning(self, "提示", "上一批打包还没有完成")
+            return
+        target_format = self.format_combo.currentText().lower()
+        by_file = {}
+        for r in records:
+            by_file.setdefault(r.path, {}).setdefault(r.codec_type, []).append(r.index)
+        self._batch_tasks = []
+        self._batch_failed = []
+        self._batch_done = 0
+        for path, idxs in by_file.items():
+            output_file = remux_output_path(path, target_format)
+            try:
+                cmd = build_remux_cmd(get_bin_path('ffmpeg'), path, output_file, self._import_infos[path], idxs.get('video', []),
+                                      idxs.get('audio', []), idxs.get('subtitle', []), target_format)
+            except Exception as e:
+                self._batch_failed.append(f"{os.path.basename(path)}: {e}")
+                continue
+            task = JobTask('remux', cmd, output_file, slot=IO, priority=BACKGROUND)
+            task.finished.connect(self.on_batch_remux_finished)
+            self._batch_tasks.append(task)
+        for task in self._batch_tasks:
+            task.start()
+        self._update_batch_label()
+
+    def _update_batch_label(self):
+        # 按收到的 finished 计数：isRunning() 在信号送到界面线程之前就变了，会提前或重复弹出汇总
+        done = self._batch_done
+        self.batch_btn.setText(f"批量打包 {done}/{len(self._batch_tasks)}" if done < len(self._batch_tasks)
+                               else "批量打包勾选的轨道")
+        if done == len(self._batch_tasks):
+            if self._batch_failed:
+                QMessageBox.warning(self, "批量打包", f"{len(self._batch_failed)} 个文件失败：\n" +
+                                    "\n".join(self._batch_failed[:20]))
+            elif self._batch_tasks:
+                QMessageBox.information(self, "批量打包", f"{len(self._batch_tasks)} 个文件打包完成")
+
+    @traced(cat='ui')
+    def on_batch_remux_finished(self, success, info):
+        task = self.sender()
+        if task not in self._batch_tasks:
+            return
+        self._batch_done += 1
+        if not success:
+            self._batch_failed.append(f"{os.path.basename(task.output_file)}: {info.splitlines()[0] if info else ''}")
+        self._update_batch_label()
+
+    def scan_library(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择媒体库文件夹")
+        if not folder:
+            return
+        self.scan_btn.setEnabled(False)
+        self.scan_btn.setText("扫描中...")
+        self.scan_thread = IndexScanThread(folder)
+        self.scan_thread.progress.connect(lambda done, total: self.scan_btn.setText(f"扫描中 {done}/{total}"))
+        self.scan_thread.finished.connect(self.on_scan_finished)
+        self.scan_thread.start()
+
+    @traced(cat='ui')
+    def on_scan_finished(self, success, info):
+        self.scan_btn.setEnabled(True)
+        self.scan_btn.setText("扫描媒体库文件夹")
+        if success:
+            QMessageBox.information(self, "完成", f"媒体库索引已更新：{info}")
+        else:
+            QMessageBox.warning(self, "错误", f"扫描失败：{info}")
+
     def update_track_lists(self, file):
-        import subprocess, json
+        if self._thumb_task is not None:
+            self._thumb_task.cancel()
+            self._thumb_task = None
+        self._thumbs = {}
+        self.thumb_strip.clear()
+        self.thumb_strip.setVisible(False)
+        self.thumb_label.setText("")
         self.video_list.clear()
         self.audio_list.clear()
         self.subtitle_list.clear()
-        self.summary_label.setText("")
-        ffprobe_path = get_ffprobe_path()
-        cmd_streams = [ffprobe_path, '-v', 'error', '-show_streams', '-print_format', 'json', file]
-        cmd_format = [ffprobe_path, '-v', 'error', '-show_format', '-print_format', 'json', file]
+        self.summary_label.setText("正在读取轨道信息...")
+        # 用户快速换文件时，取消还没结束的旧探测
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+        self._probe_generation += 1
+        task = ProbeTask(self._probe_generation, file)
+        task.probed.connect(self.on_probe_finished)
+        task.failed.connect(self.on_probe_failed)
+        self._probe_tasks = [t for t in self._probe_tasks if t.isRunning()] + [task]
+        self._probe_task = task
+        task.start()
+
+    @traced(cat='ui')
+    def on_probe_finished(self, generation, info, elapsed_ms):
+        if generation != self._probe_generation:
+            return
+        self._probe_task = None
         try:
-            # 获取流信息
-            result_streams = subprocess.run(cmd_streams, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            info_streams = json.loads(result_streams.stdout.decode(errors='ignore'))
-            # 获取文件整体信息
-            result_format = subprocess.run(cmd_format, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            info_format = json.loads(result_format.stdout.decode(errors='ignore'))
+            summary_info = info.summary()
 
             # 总比特率
-            overall_bitrate = info_format.get('format', {}).get('bit_rate', '')
+            overall_bitrate = summary_info['bit_rate']
             if overall_bitrate:
                 try:
                     overall_bitrate_disp = f"{int(overall_bitrate)//1000} kbps"
@@ -130,24 +423,10 @@ class vc_pre(QWidget):
                 overall_bitrate_disp = ''
 
             # 分辨率和色彩深度（取第一个视频流）
-            width = height = pix_fmt = color_depth = ''
-            for stream in info_streams.get('streams', []):
-                if stream.get('codec_type') == 'video':
-                    width = stream.get('width', '')
-                    height = stream.get('height', '')
-                    pix_fmt = stream.get('pix_fmt', '')
-                    color_depth = stream.get('bits_per_raw_sample', '')
-                    break
-
-            # 色彩深度补充（部分视频流可能没有 bits_per_raw_sample）
-            if not color_depth and pix_fmt:
-                # 常见像素格式推断色深
-                pix_fmt_map = {
-                    'yuv420p': '8', 'yuv422p': '8', 'yuv444p': '8',
-                    'yuv420p10le': '10', 'yuv422p10le': '10', 'yuv444p10le': '10',
-                    'yuv420p12le': '12', 'yuv422p12le': '12', 'yuv444p12le': '12',
-                }
-                color_depth = pix_fmt_map.get(pix_fmt, '')
+            width = summary_info['width']
+            height = summary_info['height']
+            pix_fmt = summary_info['pix_fmt']
+            color_depth = summary_info['color_depth']
 
             summary = f"总比特率: {overall_bitrate_disp}"
             if width and height:
@@ -156,62 +435,92 @@ class vc_pre(QWidget):
                 summary += f"  色深: {color_depth}bit"
             if pix_fmt:
                 summary += f"  像素格式: {pix_fmt}"
+            summary += f"  探测耗时: {elapsed_ms:.0f} ms"
             self.summary_label.setText(summary)
 
-            for stream in info_streams.get('streams', []):
-                codec = stream.get('codec_name', '未知')
-                idx = stream.get('index', -1)
-                lang = stream.get('tags', {}).get('language', '')
-                if stream['codec_type'] == 'video':
-                    fr = stream.get('r_frame_rate', '')
-                    try:
-                        if fr and '/' in fr:
-                            num, den = fr.split('/')
-                            fr_val = float(num) / float(den) if float(den) != 0 else 0
-                        else:
-                            fr_val = float(fr) if fr else 0
-                    except:
-                        fr_val = 0
-                    width = stream.get('width', '')
-                    height = stream.get('height', '')
-                    br = stream.get('bit_rate', '')
-                    if not br:
-                        br = stream.get('tags', {}).get('BPS', '')
-                    if br:
-                        try:
-                            br_disp = f"{int(br)//1000} kbps"
-                        except:
-                            br_disp = str(br)
-                    else:
-                        br_disp = ''
-                    desc = f"#{idx} {codec} {lang} {width}x{height} {fr_val:.2f}fps {br_disp}".strip()
-                    self.video_list.addItem(desc)
-                elif stream['codec_type'] == 'audio':
-                    sr = stream.get('sample_rate', '')
-                    ch = stream.get('channels', '')
-                    br = stream.get('bit_rate', '')
-                    if not br:
-                        br = stream.get('tags', {}).get('BPS', '')
-                    if br:
-                        try:
-                            br_disp = f"{int(br)//1000} kbps"
-                        except:
-                            br_disp = str(br)
-                    else:
-                        br_disp = ''
-                    desc = f"#{idx} {codec} {lang} {sr}Hz {ch}ch {br_disp}".strip()
-                    self.audio_list.addItem(desc)
-                elif stream['codec_type'] == 'subtitle':
-                    desc = f"#{idx} {codec} {lang}".strip()
-                    self.subtitle_list.addItem(desc)
+            lists = {'video': self.video_list, 'audio': self.audio_list, 'subtitle': self.subtitle_list}
+            for record in info.records():
+                if record.codec_type in lists:
+                    item = QListWidgetItem(record.desc)
+                    item.setData(Qt.UserRole, record.index)
+                    lists[record.codec_type].addItem(item)
+            self.start_thumbnails(info)
         except Exception as e:
-            err_msg = str(e)
-            if hasattr(e, 'stderr') and e.stderr:
-                err_msg += f"\nffprobe stderr:\n{e.stderr.decode(errors='ignore') if hasattr(e.stderr, 'decode') else str(e.stderr)}"
-            elif isinstance(e, subprocess.CalledProcessError):
-                err_msg += f"\nffprobe stderr:\n{e.stderr.decode(errors='ignore') if hasattr(e.stderr, 'decode') else str(e.stderr)}"
             self.summary_label.setText("")
-            QMessageBox.warning(self, "错误", f"无法解析轨道信息：{err_msg}")
+            QMessageBox.warning(self, "错误", f"无法解析轨道信息：{e}")
+
+    def start_thumbnails(self, info):
+        videos = [r.index for r in info.records_of('video') if not r.is_picture]
+        if not videos:
+            return
+        task = ThumbnailTask(info, videos)
+        task.ready.connect(self.on_thumbnails_ready)
+        task.failed.connect(self.on_thumbnails_failed)
+        self._thumb_tasks = [t for t in self._thumb_tasks if t.isRunning()] + [task]
+        self._thumb_task = task
+        self.thumb_label.setText("正在生成预览...")
+        task.start()
+        self.video_list.setCurrentRow(0)
+
+    def _current_video_index(self):
+        item = self.video_list.currentItem()
+        return item.data(Qt.UserRole) if item is not None else None
+
+    @traced(cat='ui')
+    def on_thumbnails_ready(self, stream_index, images):
+        if self.sender() is not self._thumb_task:
+            return
+        self._thumbs[stream_index] = images
+        if stream_index == self._current_video_index():
+            self.show_thumbnails()
+
+    @traced(cat='ui')
+    def on_thumbnails_failed(self, stream_index, err_msg):
+        if self.sender() is not self._thumb_task:
+            return
+        self._thumbs[stream_index] = err_msg
+        if stream_index == self._current_video_index():
+            self.show_thumbnails()
+
+    def show_thumbnails(self, *args):
+        self.thumb_strip.clear()
+        thumbs = self._thumbs.get(self._current_video_index())
+        if thumbs is None:
+            self.thumb_strip.setVisible(False)
+            self.thumb_label.setText("正在生成预览..." if self._thumb_task is not None else "")
+            return
+        if isinstance(thumbs, str):
+            self.thumb_strip.setVisible(False)
+            self.thumb_label.setText(f"无法生成预览：{thumbs.splitlines()[0] if thumbs else ''}")
+            return
+        self.thumb_label.setText("视频预览（关键帧）")
+        for data in thumbs:
+            pixmap = QPixmap()
+            pixmap.loadFromData(data)
+            self.thumb_strip.addItem(QListWidgetItem(QIcon(pixmap), ""))
+        self.thumb_strip.setVisible(True)
+
+    @traced(cat='ui')
+    def on_probe_failed(self, generation, err_msg):
+        if generation != self._probe_generation:
+            return
+        self._probe_task = None
+        self.summary_label.setText("")
+        QMessageBox.warning(self, "错误", f"无法解析轨道信息：{err_msg}")
+
+    def closeEvent(self, event):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+        if self._import_task is not None:
+            self._import_task.cancel()
+        if self._thumb_task is not None:
+            self._thumb_task.cancel()
+        if not self._keep_batch:
+            for task in self._batch_tasks:
+                task.cancel()
+            self._batch_tasks = []
+            self._batch_done = 0
+        super().closeEvent(event)
 
     def go_to_confirm_page(self):
         if not hasattr(self, "input_file") or not self.input_file:
@@ -232,11 +541,15 @@ class vc_pre(QWidget):
         #     self.next_page = PageTranscode(self.input_file, target_format)
 
         self.next_page.show()
+        # 只是换到下一步的窗口，还在运行的批量打包继续，完成后照常提示
+        self._keep_batch = True
         self.close()
+        self._keep_batch = False
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(stop_engine)
     window = vc_pre()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file